@@ -14,106 +14,423 @@
 #    under the License.
 from datetime import datetime
 from app.cosight.agent.actor.instance.actor_agent_instance import create_actor_instance
-from llm import llm_for_plan, llm_for_act, llm_for_tool, llm_for_vision
+from llm import get_llm
 from app.cosight.task.plan_report_manager import plan_report_event_manager
 
 
+import asyncio
 import os
 import time
+import threading
+import uuid
+from concurrent.futures import TimeoutError as FutureTimeoutError, wait
+from queue import Empty, Queue
 
 from app.cosight.agent.actor.task_actor_agent import TaskActorAgent
 from app.cosight.agent.planner.instance.planner_agent_instance import create_planner_instance
 from app.cosight.agent.planner.task_plannr_agent import TaskPlannerAgent
+from app.cosight.llm.usage_tracker import UsageTracker
 from app.cosight.task.task_manager import TaskManager
-from app.cosight.task.todolist import Plan
+from app.cosight.task.deadline import Deadline
+from app.cosight.task.plan_journal import PlanJournal
+from app.cosight.task.plan_timeline import PlanTimeline
+from app.cosight.task.step_executor import StepExecutor
+from app.cosight.task.step_prefetcher import StepPrefetcher
+from app.cosight.task.step_priority import StepPrioritizer, get_step_duration_history
+from app.cosight.task.tool_executor import get_tool_executor
+from app.cosight.task.todolist import Plan, TERMINAL_STATUSES
 from app.cosight.task.time_record_util import time_record
+from app.cosight.tool.tool_cache import release_plan_tool_cache
 from app.common.logger_util import logger
+from config.config import get_deadline_config, get_step_executor_config
 
 class CoSight:
-    def __init__(self, plan_llm, act_llm, tool_llm, vision_llm, work_space_path: str = None):
+    def __init__(self, plan_llm, act_llm, tool_llm, vision_llm, work_space_path: str = None,
+                 step_executor: StepExecutor = None):
         self.work_space_path = work_space_path or os.getenv("WORKSPACE_PATH") or os.getcwd()
-        self.plan_id = f"plan_{int(time.time())}"
+        # 同一秒内创建的多个计划也需要不同的 id
+        self.plan_id = f"plan_{int(time.time())}_{uuid.uuid4().hex[:8]}"
         self.plan = Plan(work_space_path=self.work_space_path)
+        self.plan.attach_journal(PlanJournal(self.work_space_path))
         TaskManager.set_plan(self.plan_id, self.plan)
         self.task_planner_agent = TaskPlannerAgent(create_planner_instance("task_planner_agent"), plan_llm,
                                                    self.plan_id)
         self.act_llm = act_llm  # Store llm for later use
         self.tool_llm = tool_llm
         self.vision_llm = vision_llm
+        # 步骤执行线程池：服务端可传入进程共享的线程池，否则由当前实例持有
+        self._owns_step_executor = step_executor is None
+        self.step_executor = step_executor or StepExecutor(name=f"{self.plan_id}-step-worker")
+        # 单个计划同时执行的步骤数上限；共享线程池的线程数是所有计划的总上限
+        self.max_concurrent_steps = min(self.step_executor.max_workers, get_step_executor_config()["max_workers"])
+        # 计划总时长预算与单步骤时间片
+        deadline_config = get_deadline_config()
+        self.plan_timeout = deadline_config["plan_timeout"]
+        self.step_timeout = deadline_config["step_timeout"]
+        self.shutdown_grace = deadline_config["shutdown_grace"]
+        # 每个工作线程复用一个TaskActorAgent，避免每个步骤重复构建工具与技能
+        self._actor_local = threading.local()
 
     @time_record
     def execute(self, question, output_format=""):
-        create_task = question
-        retry_count = 0
-        while not self.plan.get_ready_steps() and retry_count < 3:
-            create_result = self.task_planner_agent.create_plan(create_task, output_format)
-            create_task += f"\nThe plan creation result is: {create_result}\nCreation failed, please carefully review the plan creation rules and select the create_plan tool to create the plan"
-            retry_count += 1
-        while True:
-            ready_steps = self.plan.get_ready_steps()
-            if not ready_steps:
-                logger.info("No more ready steps to execute")
-                break
-            logger.info(f"Found {ready_steps} ready steps to execute")
-
-            results = self.execute_steps(question, ready_steps)
-            logger.info(f"All steps completed with results: {results}")
-            # 可配置是否只在堵塞的时候再重规划，提高效率
-            # todo 这里没有实时上报
+        self.plan.journal.append("task", question=question, output_format=output_format)
+        TaskManager.mark_running(self.plan_id)
+        try:
+            create_task = question
+            retry_count = 0
+            while not self.plan.get_ready_steps() and retry_count < 3:
+                create_result = self.task_planner_agent.create_plan(create_task, output_format)
+                create_task += f"\nThe plan creation result is: {create_result}\nCreation failed, please carefully review the plan creation rules and select the create_plan tool to create the plan"
+                retry_count += 1
+            self.run_plan(question)
+            return self.task_planner_agent.finalize_plan(question, output_format)
+        finally:
+            TaskManager.mark_finished(self.plan_id)
+            UsageTracker.save(self.plan_id, self.work_space_path)
+            release_plan_tool_cache(self.plan_id)
+
+    @time_record
+    def resume(self, work_space_path=None):
+        """从工作空间中的计划日志恢复中断的计划，已完成的步骤不再重复执行"""
+        work_space_path = work_space_path or self.work_space_path
+        journal = PlanJournal(work_space_path)
+        state = journal.replay()
+        task = state["task"]
+        if not task:
+            raise ValueError(f"No plan journal found in {work_space_path}")
+
+        self.work_space_path = work_space_path
+        self.plan.work_space_path = work_space_path
+        self.plan.attach_journal(journal)
+        question, output_format = task["question"], task["output_format"]
+        if not state["plan"] or not state["plan"]["steps"]:
+            # 计划尚未创建成功，从头执行
+            logger.info(f"No plan to resume in {work_space_path}, execute from scratch")
+            return self.execute(question, output_format)
+
+        TaskManager.mark_running(self.plan_id)
+        try:
+            self.plan.restore(state["plan"])
+            reset_steps = self.plan.reset_unfinished_steps()
+            logger.info(f"Resume plan from {work_space_path}, progress: {self.plan.get_progress()}, "
+                        f"steps to re-run: {reset_steps}")
             plan_report_event_manager.publish("plan_process", self.plan)
-            # re_plan_result = self.task_planner_agent.re_plan(question, output_format)
-            # logger.info(f"re-plan_result is {re_plan_result}")
-        return self.task_planner_agent.finalize_plan(question, output_format)
+            self.run_plan(question)
+            return self.task_planner_agent.finalize_plan(question, output_format)
+        finally:
+            TaskManager.mark_finished(self.plan_id)
+            UsageTracker.save(self.plan_id, self.work_space_path)
+            release_plan_tool_cache(self.plan_id)
 
-    def execute_steps(self, question, ready_steps):
-        from threading import Thread, Semaphore
-        from queue import Queue
+    def run_plan(self, question):
+        """事件驱动调度：某个步骤的依赖全部结束后立即启动该步骤，不再按批次等待整批线程结束"""
+        completion_queue = Queue()
+        self.plan.subscribe_completion(completion_queue)
+        timeline = PlanTimeline(self.plan_id, self.max_concurrent_steps)
+        # 就绪步骤多于空闲槽位时，剩余关键路径最长的步骤先执行
+        prioritizer = StepPrioritizer(self.plan)
+        # 可选：为依赖正在执行的检索类步骤提前预取搜索结果
+        prefetcher = StepPrefetcher(self.plan, self.plan_id)
+        plan_deadline = Deadline(self.plan_timeout, "plan")
+        running = set()
+        dispatched = set()
+        futures = {}
+        try:
+            while True:
+                if plan_deadline.expired():
+                    # 计划超时：不再派发新步骤，先停止已派发的步骤，再将未结束的步骤全部标记为受阻
+                    self._stop_steps(futures)
+                    futures.clear()
+                    blocked_steps = self.plan.block_unfinished_steps(
+                        f"plan exceeded its time budget of {self.plan_timeout:.0f}s")
+                    logger.warning(f"Plan {self.plan_id} deadline exceeded, blocked steps: {blocked_steps}")
+                    plan_report_event_manager.publish("plan_process", self.plan)
+                    break
 
-        results = {}
-        result_queue = Queue()
-        semaphore = Semaphore(min(5, len(ready_steps)))
+                for step_index in prioritizer.sort(self.plan.get_ready_steps()):
+                    if step_index in dispatched:
+                        continue
+                    timeline.step_ready(step_index, self.plan.steps[step_index])
+                    if len(running) >= self.max_concurrent_steps:
+                        continue
+                    logger.info(f"Dispatching ready step {step_index}")
+                    dispatched.add(step_index)
+                    running.add(step_index)
+                    future = self.step_executor.submit(self._run_step, question, step_index, timeline,
+                                                       plan_deadline, priority=prioritizer.priority(step_index))
+                    future.add_done_callback(lambda _, index=step_index: completion_queue.put((index, None)))
+                    futures[step_index] = future
+                prefetcher.schedule(running)
 
-        def execute_step(step_index):
-            semaphore.acquire()
-            try:
-                logger.info(f"Starting execution of step {step_index}")
-                # 每个线程创建独立的TaskActorAgent实例
-                task_actor_agent = TaskActorAgent(
-                    create_actor_instance(f"actor_for_step_{step_index}", self.work_space_path),
-                    self.act_llm,
-                    self.vision_llm,
-                    self.tool_llm,
-                    self.plan_id,
-                    work_space_path=self.work_space_path
-                )
-                result = task_actor_agent.act(question=question, step_index=step_index)
-                logger.info(f"Completed execution of step {step_index} with result: {result}")
-                result_queue.put((step_index, result))
-            finally:
-                semaphore.release()
-
-        # 为每个ready_step创建并执行线程
-        threads = []
-        for step_index in ready_steps:
-            thread = Thread(target=execute_step, args=(step_index,))
-            thread.start()
-            threads.append(thread)
-
-        # 等待所有线程完成
-        for thread in threads:
-            thread.join()
-
-        # 收集结果
-        while not result_queue.empty():
-            step_index, result = result_queue.get()
-            results[step_index] = result
+                if not running:
+                    logger.info("No more ready steps to execute")
+                    break
+
+                # 等待任意步骤结束：mark_step 投递 (index, status)，执行线程退出时投递 (index, None)
+                try:
+                    step_index, step_status = completion_queue.get(timeout=plan_deadline.remaining())
+                except Empty:
+                    continue
+                if step_status is None:
+                    running.discard(step_index)
+                else:
+                    logger.info(f"Step {step_index} finished with status {step_status}")
+                    plan_report_event_manager.publish("plan_process", self.plan)
+        finally:
+            # 异常退出时同样先停止已派发的步骤，再释放时间线与文件索引
+            self._stop_steps(futures)
+            prefetcher.stop()
+            self.plan.unsubscribe_completion(completion_queue)
+            timeline.finish()
+            timeline.save(self.work_space_path, self.plan.dependencies)
+            self.plan.release_file_index()
+            logger.info(f"step executor metrics: {self.step_executor.metrics()}")
+            logger.info(f"tool executor metrics: {get_tool_executor().metrics()}")
+
+    def _stop_steps(self, futures):
+        """取消尚未开始的步骤，并在有限时间内等待执行中的步骤退出，仍未退出的步骤被冻结"""
+        for future in futures.values():
+            future.cancel()
+        pending = [future for future in futures.values() if not future.done()]
+        if pending:
+            wait(pending, timeout=self.shutdown_grace)
+        still_running = [step_index for step_index, future in futures.items() if not future.done()]
+        if still_running:
+            logger.warning(f"Plan {self.plan_id} steps {still_running} still running after "
+                           f"{self.shutdown_grace:.0f}s, freeze them")
+            self.plan.freeze_steps(still_running)
 
+    def _get_actor_agent(self):
+        task_actor_agent = getattr(self._actor_local, "agent", None)
+        if task_actor_agent is None:
+            task_actor_agent = TaskActorAgent(
+                create_actor_instance(f"actor_for_{threading.current_thread().name}", self.work_space_path),
+                self.act_llm,
+                self.vision_llm,
+                self.tool_llm,
+                self.plan_id,
+                work_space_path=self.work_space_path
+            )
+            self._actor_local.agent = task_actor_agent
+        return task_actor_agent
+
+    def _run_step(self, question, step_index, timeline=None, plan_deadline=None):
+        if timeline:
+            timeline.step_started(step_index)
+        start_time = time.time()
+        # 步骤时间片不超过计划剩余时间
+        step_deadline = (plan_deadline or Deadline(self.plan_timeout, "plan")).child(self.step_timeout,
+                                                                                     f"step {step_index}")
+        try:
+            logger.info(f"Starting execution of step {step_index}")
+            step_deadline.check()
+            task_actor_agent = self._get_actor_agent()
+            result = task_actor_agent.act(question=question, step_index=step_index, deadline=step_deadline)
+            logger.info(f"Completed execution of step {step_index} with result: {result}")
+            return result
+        except Exception as e:
+            logger.error(f"Step {step_index} execution error: {str(e)}", exc_info=True)
+            # 保证异常步骤进入终态，避免后继步骤永远无法调度
+            if self.plan.get_step_status(step_index) not in TERMINAL_STATUSES:
+                self.plan.mark_step(step_index, step_status="blocked", step_notes=str(e))
+            return str(e)
+        finally:
+            step_status = self.plan.get_step_status(step_index)
+            if step_status == "completed":
+                get_step_duration_history().record(self.plan.steps[step_index], time.time() - start_time)
+            if timeline:
+                timeline.step_finished(step_index, step_status)
+
+    def execute_steps(self, question, ready_steps):
+        """在步骤线程池中执行一批步骤并等待全部结束，最多等待计划的时间预算"""
+        plan_deadline = Deadline(self.plan_timeout, "plan")
+        futures = {step_index: self.step_executor.submit(self._run_step, question, step_index, None, plan_deadline)
+                   for step_index in ready_steps}
+        results = {}
+        for step_index, future in futures.items():
+            try:
+                results[step_index] = future.result(timeout=plan_deadline.remaining())
+            except FutureTimeoutError:
+                note = f"plan exceeded its time budget of {self.plan_timeout:.0f}s"
+                if self.plan.get_step_status(step_index) not in TERMINAL_STATUSES:
+                    self.plan.mark_step(step_index, step_status="blocked", step_notes=note)
+                results[step_index] = note
         return results
 
+    def close(self):
+        """释放当前实例持有的步骤线程池，共享线程池不受影响"""
+        if self._owns_step_executor:
+            self.step_executor.shutdown(wait=False)
+
+
+class AsyncCoSight:
+    """在单个事件循环中执行计划的异步版本，多个计划可共享同一事件循环而无需每个计划占用一个线程
+
+    plan_llm 与 act_llm 需为 AsyncChatLLM，tool_llm 与 vision_llm 仅用于构建工具配置。
+    """
+
+    def __init__(self, plan_llm, act_llm, tool_llm, vision_llm, work_space_path: str = None,
+                 max_concurrent_steps: int = None):
+        self.work_space_path = work_space_path or os.getenv("WORKSPACE_PATH") or os.getcwd()
+        # 同一秒内创建的多个计划也需要不同的 id
+        self.plan_id = f"plan_{int(time.time())}_{uuid.uuid4().hex[:8]}"
+        self.plan = Plan(work_space_path=self.work_space_path)
+        self.plan.attach_journal(PlanJournal(self.work_space_path))
+        TaskManager.set_plan(self.plan_id, self.plan)
+        self.plan_llm = plan_llm
+        self.act_llm = act_llm
+        self.tool_llm = tool_llm
+        self.vision_llm = vision_llm
+        self.max_concurrent_steps = max_concurrent_steps or get_step_executor_config()["max_workers"]
+        deadline_config = get_deadline_config()
+        self.plan_timeout = deadline_config["plan_timeout"]
+        self.step_timeout = deadline_config["step_timeout"]
+        self.shutdown_grace = deadline_config["shutdown_grace"]
+        self.task_planner_agent = None
+        # 空闲的执行者，步骤结束后归还以供后续步骤复用
+        self._idle_actors = []
+
+    async def _get_planner_agent(self):
+        if self.task_planner_agent is None:
+            # 构建智能体时会同步加载MCP工具，放到线程中执行
+            self.task_planner_agent = await asyncio.to_thread(
+                TaskPlannerAgent, create_planner_instance("task_planner_agent"), self.plan_llm, self.plan_id)
+        return self.task_planner_agent
+
+    async def _acquire_actor_agent(self):
+        if self._idle_actors:
+            return self._idle_actors.pop()
+        return await asyncio.to_thread(
+            TaskActorAgent,
+            create_actor_instance(f"actor_for_{self.plan_id}", self.work_space_path),
+            self.act_llm,
+            self.vision_llm,
+            self.tool_llm,
+            self.plan_id,
+            work_space_path=self.work_space_path
+        )
+
+    async def execute(self, question, output_format=""):
+        start_time = time.time()
+        self.plan.journal.append("task", question=question, output_format=output_format)
+        TaskManager.mark_running(self.plan_id)
+        try:
+            task_planner_agent = await self._get_planner_agent()
+            create_task = question
+            retry_count = 0
+            while not self.plan.get_ready_steps() and retry_count < 3:
+                create_result = await task_planner_agent.acreate_plan(create_task, output_format)
+                create_task += f"\nThe plan creation result is: {create_result}\nCreation failed, please carefully review the plan creation rules and select the create_plan tool to create the plan"
+                retry_count += 1
+            await self.run_plan(question)
+            result = await task_planner_agent.afinalize_plan(question, output_format)
+        finally:
+            TaskManager.mark_finished(self.plan_id)
+            UsageTracker.save(self.plan_id, self.work_space_path)
+            release_plan_tool_cache(self.plan_id)
+        logger.info(f"async plan {self.plan_id} executed in {time.time() - start_time:.4f} seconds")
+        return result
+
+    async def run_plan(self, question):
+        """与 CoSight.run_plan 相同的事件驱动调度，每个步骤是一个协程任务"""
+        timeline = PlanTimeline(self.plan_id, self.max_concurrent_steps)
+        prioritizer = StepPrioritizer(self.plan)
+        prefetcher = StepPrefetcher(self.plan, self.plan_id)
+        plan_deadline = Deadline(self.plan_timeout, "plan")
+        running = {}
+        dispatched = set()
+        try:
+            while True:
+                if plan_deadline.expired():
+                    # 计划超时：先停止仍在执行的步骤，再将未结束的步骤全部标记为受阻
+                    await self._stop_steps(running)
+                    running.clear()
+                    blocked_steps = await asyncio.to_thread(
+                        self.plan.block_unfinished_steps, f"plan exceeded its time budget of {self.plan_timeout:.0f}s")
+                    logger.warning(f"Plan {self.plan_id} deadline exceeded, blocked steps: {blocked_steps}")
+                    plan_report_event_manager.publish("plan_process", self.plan)
+                    break
+
+                for step_index in prioritizer.sort(self.plan.get_ready_steps()):
+                    if step_index in dispatched:
+                        continue
+                    timeline.step_ready(step_index, self.plan.steps[step_index])
+                    if len(running) >= self.max_concurrent_steps:
+                        continue
+                    logger.info(f"Dispatching ready step {step_index}")
+                    dispatched.add(step_index)
+                    running[asyncio.create_task(
+                        self._run_step(question, step_index, timeline, plan_deadline))] = step_index
+                prefetcher.schedule(running.values())
+
+                if not running:
+                    logger.info("No more ready steps to execute")
+                    break
+
+                done, _ = await asyncio.wait(running, timeout=plan_deadline.remaining(),
+                                             return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    step_index = running.pop(task)
+                    logger.info(f"Step {step_index} finished with status "
+                                f"{self.plan.get_step_status(step_index)}")
+                plan_report_event_manager.publish("plan_process", self.plan)
+        finally:
+            prefetcher.stop()
+            await self._stop_steps(running)
+            timeline.finish()
+            timeline.save(self.work_space_path, self.plan.dependencies)
+            self.plan.release_file_index()
+
+    async def _stop_steps(self, running):
+        """取消执行中的步骤任务并在有限时间内等待其退出。
+
+        取消任务不会中断已提交到线程中的工具或模型调用，这些步骤随后仍可能调用 mark_step，因此全部冻结。
+        """
+        if not running:
+            return
+        for task in running:
+            task.cancel()
+        await asyncio.wait(list(running), timeout=self.shutdown_grace)
+        self.plan.freeze_steps(list(running.values()))
+
+    async def _run_step(self, question, step_index, timeline, plan_deadline):
+        timeline.step_started(step_index)
+        start_time = time.time()
+        step_deadline = plan_deadline.child(self.step_timeout, f"step {step_index}")
+        task_actor_agent = None
+        try:
+            logger.info(f"Starting async execution of step {step_index}")
+            task_actor_agent = await self._acquire_actor_agent()
+            result = await task_actor_agent.aact(question=question, step_index=step_index, deadline=step_deadline)
+            logger.info(f"Completed async execution of step {step_index} with result: {result}")
+            return result
+        except Exception as e:
+            logger.error(f"Step {step_index} async execution error: {str(e)}", exc_info=True)
+            if self.plan.get_step_status(step_index) not in TERMINAL_STATUSES:
+                await asyncio.to_thread(self.plan.mark_step, step_index, step_status="blocked", step_notes=str(e))
+            return str(e)
+        finally:
+            if task_actor_agent is not None:
+                self._idle_actors.append(task_actor_agent)
+            step_status = self.plan.get_step_status(step_index)
+            if step_status == "completed":
+                get_step_duration_history().record(self.plan.steps[step_index], time.time() - start_time)
+            timeline.step_finished(step_index, step_status)
+
 
 if __name__ == '__main__':
+    import sys
+
     # 配置工作区
     BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+    if len(sys.argv) > 2 and sys.argv[1] == '--resume':
+        # 从中断的工作空间恢复：python CoSight.py --resume /xxx/work_space/work_space_时间戳
+        work_space_path = os.path.abspath(sys.argv[2])
+        cosight = CoSight(get_llm("plan"), get_llm("act"), get_llm("tool"), get_llm("vision"), work_space_path)
+        result = cosight.resume()
+        logger.info(f"final result is {result}")
+        sys.exit(0)
+
     # 获取当前时间并格式化
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
     # 构造路径：/xxx/xxx/work_space/work_space_时间戳
@@ -121,7 +438,7 @@ if __name__ == '__main__':
     os.makedirs(work_space_path, exist_ok=True)
 
     # 配置CoSight
-    cosight = CoSight(llm_for_plan, llm_for_act, llm_for_tool, llm_for_vision, work_space_path)
+    cosight = CoSight(get_llm("plan"), get_llm("act"), get_llm("tool"), get_llm("vision"), work_space_path)
 
     # 运行CoSight
     result = cosight.execute("帮我写一篇中兴通讯的分析报告")
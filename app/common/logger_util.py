@@ -14,20 +14,38 @@
 #    under the License.
 
 # coding=utf-8
+import atexit
+import bisect
 import gzip
+import itertools
 import logging as origin_logging
 import os
+import queue
 import re
+import reprlib
+import shutil
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from logging.handlers import RotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+from config.config import get_logging_config
 
 FORMATTER = origin_logging.Formatter(
     "[%(asctime)s.%(msecs)03d][%(process)d][%(thread)d][%(levelname)1s][%(filename)1s:%(lineno)1s] %(message)s",
     "%Y-%m-%d %H:%M:%S")
 
+# 大体量调试内容（完整消息历史、模型响应、计划详情等）的日志标记，按采样策略记录：
+# logger.info("messages: %s", messages, extra=PAYLOAD)
+PAYLOAD = {"payload": True}
 
 
 class CompressedRotatingFileHandler(RotatingFileHandler):
+    """按大小滚动的日志文件，滚动时切换到新文件，旧文件在后台线程中分块压缩到 bak 目录
+
+    bak 目录中的归档只在启动时扫描一次，之后按内存中的列表保留最近 backup_count 个。
+    """
 
     def __init__(self, filename, max_bytes, backup_count):
         # 记录原始输入的文件名，用于每次构造日志文件名使用
@@ -46,6 +64,10 @@ class CompressedRotatingFileHandler(RotatingFileHandler):
         if not os.path.exists(self.backup_dir):
             os.makedirs(self.backup_dir, mode=0o750)
 
+        # 已有归档按文件名（即时间）排序
+        self._archives = self._scan_archives()
+        self._archives_lock = threading.Lock()
+
         # 清理历史残留的未归档的log文件，修改时间超12小时未修改，则认为是残留文件
         self._backup_remains()
 
@@ -53,7 +75,7 @@ class CompressedRotatingFileHandler(RotatingFileHandler):
         filename = os.fspath(self.input_filename)
         return "%s-%s.log" % (os.path.abspath(filename), datetime.strftime(datetime.now(), "%Y%m%d%H%M%S"))
 
-    def get_files_to_delete(self):
+    def _scan_archives(self):
         result = []
         for f in os.listdir(self.backup_dir):
             fullname = os.path.join(self.backup_dir, f)
@@ -61,51 +83,135 @@ class CompressedRotatingFileHandler(RotatingFileHandler):
                 continue
             suffix = f.replace(os.path.basename(self.input_filename), "")
             if self.extMatch.match(suffix):
-                result.append(os.path.join(self.backup_dir, f))
+                result.append(fullname)
         result.sort()
-        if len(result) < self.backupCount:
-            result = []
-        else:
-            result = result[:len(result) - self.backupCount]
         return result
 
+    def get_files_to_delete(self):
+        with self._archives_lock:
+            if len(self._archives) <= self.backupCount:
+                return []
+            result = self._archives[:len(self._archives) - self.backupCount]
+            del self._archives[:len(result)]
+            return result
+
     def _backup_remains(self):
         dir_name = os.path.dirname(self.baseFilename)
         for f in os.listdir(dir_name):
             fullname = os.path.join(dir_name, f)
-            if not os.path.isfile(fullname):
+            if not os.path.isfile(fullname) or fullname == self.baseFilename:
                 continue
             suffix = f.replace(os.path.basename(self.input_filename), "")
             if not self.extMatch.match(suffix):
                 continue
             if datetime.fromtimestamp(os.path.getmtime(fullname)) < (datetime.now() - timedelta(hours=12)):
-                dfn = os.path.join(self.backup_dir, os.path.basename(f) + ".gz")
-                if os.path.exists(dfn):
-                    os.remove(dfn)
-                self.rotate(fullname, dfn)
+                self._archive(fullname)
+
+    def _archive(self, source):
+        """提交到后台线程压缩，调用线程不等待"""
+        dfn = os.path.join(self.backup_dir, os.path.basename(source) + ".gz")
+        try:
+            _compress_executor.submit(self._compress_and_prune, source, dfn)
+        except RuntimeError:
+            # 进程退出阶段压缩线程已停止，在当前线程完成归档
+            self._compress_and_prune(source, dfn)
+
+    def _compress_and_prune(self, source, dest):
+        try:
+            self.rotate(source, dest)
+        except Exception as e:
+            # 日志处理器内部不能再写日志，直接输出到标准错误
+            print(f"failed to archive log file {source}: {e}", file=sys.stderr)
+            return
+        with self._archives_lock:
+            if dest not in self._archives:
+                bisect.insort(self._archives, dest)
+        if self.backupCount > 0:
+            for f in self.get_files_to_delete():
+                try:
+                    os.remove(f)
+                except OSError:
+                    pass
 
     # overwrite
     def rotate(self, source, dest):
-        with open(source, 'rb') as sf, gzip.open(dest, 'wb') as df:
-            df.write(sf.read())
+        # 分块压缩到临时文件后原子替换，避免把整个日志文件读入内存，也不会留下不完整的归档
+        tmp = dest + ".tmp"
+        with open(source, 'rb') as sf, gzip.open(tmp, 'wb') as df:
+            shutil.copyfileobj(sf, df, 1024 * 1024)
+        os.replace(tmp, dest)
         os.remove(source)
 
     # overwrite
     def doRollover(self):
+        # 在持有处理器锁的情况下只做文件切换，压缩与归档清理交给后台线程
         if self.stream:
             self.stream.close()
             self.stream = None
-        self._backup_remains()
-        dfn = os.path.join(self.backup_dir, os.path.basename(self.baseFilename) + ".gz")
-        if os.path.exists(dfn):
-            os.remove(dfn)
-        self.rotate(self.baseFilename, dfn)
+        source = self.baseFilename
         self.baseFilename = self._get_filename()
-        if self.backupCount > 0:
-            for s in self.get_files_to_delete():
-                os.remove(s)
+        if self.baseFilename == source:
+            # 同一秒内再次滚动时继续写当前文件，避免压缩正在写入的文件
+            if not self.delay:
+                self.stream = self._open()
+            return
         if not self.delay:
             self.stream = self._open()
+        self._archive(source)
+
+
+# 日志归档压缩线程；线程池在进程退出时等待已提交的压缩完成
+_compress_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="log-compress")
+
+
+class BoundedQueueHandler(QueueHandler):
+    """在调用线程中把日志记录整理为定长文本后放入队列，由后台监听线程写文件与控制台
+
+    - 单条日志超过 max_chars 时截断并附加截断标记
+    - 带 PAYLOAD 标记的记录每 sample_every 条完整记录一条，其余只保留前 head_chars 个字符，
+      参数按 reprlib 的受限长度格式化，不再生成完整的字符串
+    """
+
+    def __init__(self, log_queue, max_chars: int, sample_every: int, head_chars: int):
+        super().__init__(log_queue)
+        self.max_chars = max_chars
+        self.sample_every = max(1, sample_every)
+        self.head_chars = head_chars
+        self._payload_counter = itertools.count()
+        self._repr = reprlib.Repr()
+        self._repr.maxstring = self._repr.maxother = head_chars
+        self._repr.maxlist = self._repr.maxdict = self._repr.maxlevel = 4
+
+    def _get_message(self, record, sampled: bool) -> str:
+        if sampled or not record.args:
+            return record.getMessage()
+        args = record.args if isinstance(record.args, tuple) else (record.args,)
+        try:
+            return str(record.msg) % tuple(self._repr.repr(arg) for arg in args)
+        except (TypeError, ValueError):
+            return record.getMessage()
+
+    def prepare(self, record):
+        payload = getattr(record, "payload", False)
+        sampled = not payload or next(self._payload_counter) % self.sample_every == 0
+        message = self._get_message(record, sampled)
+        limit = self.max_chars if sampled else min(self.max_chars or self.head_chars, self.head_chars)
+        if limit and len(message) > limit:
+            marker = "sampled" if not sampled else "truncated"
+            message = f"{message[:limit]}...[{marker} {len(message) - limit} chars]"
+        # 异常堆栈在调用线程中格式化，避免队列中持有栈帧
+        if record.exc_info:
+            message = f"{message}\n{FORMATTER.formatException(record.exc_info)}"
+        if record.stack_info:
+            message = f"{message}\n{FORMATTER.formatStack(record.stack_info)}"
+        record = origin_logging.makeLogRecord(record.__dict__)
+        record.msg = message
+        record.message = message
+        record.args = None
+        record.exc_info = None
+        record.exc_text = None
+        record.stack_info = None
+        return record
 
 
 def get_logger(name="core-sight"):
@@ -113,13 +219,28 @@ def get_logger(name="core-sight"):
     log.setLevel(origin_logging.INFO)
 
     if not log.handlers:
-        log.addHandler(get_file_handler(name))
+        handlers = [get_file_handler(name)]
 
         # 可选：同时输出到控制台
         stream_handler = origin_logging.StreamHandler()
         stream_handler.setLevel(origin_logging.DEBUG)
         stream_handler.setFormatter(FORMATTER)
-        log.addHandler(stream_handler)
+        handlers.append(stream_handler)
+
+        config = get_logging_config()
+        if not config["async"]:
+            for handler in handlers:
+                log.addHandler(handler)
+            return log
+
+        # 日志写入放到后台线程，调用线程只做格式化与入队，不因磁盘或控制台阻塞
+        log_queue = queue.SimpleQueue()
+        log.addHandler(BoundedQueueHandler(log_queue, config["max_record_chars"], config["payload_sample_every"],
+                                           config["payload_head_chars"]))
+        listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+        listener.start()
+        # 进程退出前写完队列中剩余的日志
+        atexit.register(listener.stop)
 
     return log
 
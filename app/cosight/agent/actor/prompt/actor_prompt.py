@@ -21,11 +21,12 @@ from app.common.logger_util import logger
 
 # Add path to import llm.py
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../../../../")))
-from llm import llm_for_act
+from llm import get_llm
 
 def actor_system_prompt(work_space_path: str):
     # Check if llm_for_act is using OpenRouter Claude
     is_openrouter_claude = False
+    llm_for_act = get_llm("act")
     if hasattr(llm_for_act, 'model') and isinstance(llm_for_act.model, str):
         if 'claude' in llm_for_act.model:
             is_openrouter_claude = True
@@ -125,6 +126,7 @@ def actor_execute_task_prompt(task, step_index, plan, workspace_path: str):
     
     # Check if llm_for_act is using OpenRouter Claude
     is_openrouter_claude = False
+    llm_for_act = get_llm("act")
     if hasattr(llm_for_act, 'model') and isinstance(llm_for_act.model, str):
         if 'openrouter_claude' in llm_for_act.model:
             is_openrouter_claude = True
@@ -222,6 +224,7 @@ Follow the general task execution rules above.
 def actor_system_prompt_zh(work_space_path):
     # 检查 llm_for_act 是否使用 OpenRouter Claude
     is_openrouter_claude = False
+    llm_for_act = get_llm("act")
     if hasattr(llm_for_act, 'model') and isinstance(llm_for_act.model, str):
         if 'claude' in llm_for_act.model:
             is_openrouter_claude = True
@@ -322,6 +325,7 @@ def actor_execute_task_prompt_zh(task, step_index, plan, workspace_path):
 
     # 检查 llm_for_act 是否使用 OpenRouter Claude
     is_openrouter_claude = False
+    llm_for_act = get_llm("act")
     if hasattr(llm_for_act, 'model') and isinstance(llm_for_act.model, str):
         if 'openrouter_claude' in llm_for_act.model:
             is_openrouter_claude = True
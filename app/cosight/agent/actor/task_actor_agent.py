@@ -13,6 +13,7 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import asyncio
 import os
 import re
 from typing import Dict
@@ -50,6 +51,7 @@ class TaskActorAgent(BaseAgent):
                  functions: Dict = None,
                  work_space_path: str = None):
         self.work_space_path = work_space_path if work_space_path else os.environ.get("WORKSPACE_PATH") or os.getcwd()
+        self.plan_id = plan_id
         self.plan = TaskManager.get_plan(plan_id)
         self.question = None  # Store the question for later use
         act_toolkit = ActToolkit(self.plan)
@@ -121,8 +123,10 @@ class TaskActorAgent(BaseAgent):
         self.history.append({"role": "system", "content": sys_prompt})
 
     @time_record
-    def act(self, question, step_index):
+    def act(self, question, step_index, deadline=None):
         self.question = question  # Store the question for use in tools
+        # 同一个执行者会被复用于多个步骤，每个步骤只保留系统提示词重新开始
+        del self.history[1:]
         self.plan.mark_step(step_index, step_status="in_progress")
         plan_report_event_manager.publish("plan_process", self.plan)
         is_chinese = bool(re.search(r'[\u4e00-\u9fff]', self.question)) if self.question else True
@@ -134,11 +138,37 @@ class TaskActorAgent(BaseAgent):
         self.history.append(
             {"role": "user", "content": task_prompt})
         try:
-            result = self.execute(self.history, step_index=step_index)
-            if self.plan.step_statuses.get(self.plan.steps[step_index], "") == "in_progress":
+            result = self.execute(self.history, step_index=step_index, deadline=deadline)
+            if self.plan.get_step_status(step_index) == "in_progress":
                 self.plan.mark_step(step_index, step_status="completed", step_notes=str(result))
             return result
         except Exception as e:
             logger.error(f'act agent execute error: {str(e)}', exc_info=True)
             self.plan.mark_step(step_index, step_status="blocked", step_notes=str(e))
             return str(e)
+
+    async def aact(self, question, step_index, deadline=None):
+        """act 的协程版本，self.llm 需为 AsyncChatLLM"""
+        self.question = question
+        del self.history[1:]
+        self.plan.mark_step(step_index, step_status="in_progress")
+        plan_report_event_manager.publish("plan_process", self.plan)
+        is_chinese = bool(re.search(r'[\u4e00-\u9fff]', self.question)) if self.question else True
+        if is_chinese:
+            task_prompt = actor_execute_task_prompt_zh(question, step_index, self.plan, self.work_space_path)
+        else:
+            task_prompt = actor_execute_task_prompt(question, step_index, self.plan, self.work_space_path)
+
+        self.history.append(
+            {"role": "user", "content": task_prompt})
+        try:
+            result = await self.aexecute(self.history, step_index=step_index, deadline=deadline)
+            if self.plan.get_step_status(step_index) == "in_progress":
+                # 备注处理会扫描工作空间，放到线程中执行
+                await asyncio.to_thread(self.plan.mark_step, step_index, step_status="completed",
+                                        step_notes=str(result))
+            return result
+        except Exception as e:
+            logger.error(f'act agent async execute error: {str(e)}', exc_info=True)
+            await asyncio.to_thread(self.plan.mark_step, step_index, step_status="blocked", step_notes=str(e))
+            return str(e)
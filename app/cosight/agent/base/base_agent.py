@@ -13,19 +13,27 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import functools
 import inspect
 import json
-import sys
-from typing import List, Dict, Any
+from contextvars import copy_context
+from typing import List, Dict, Any, Optional
 
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import wait
 from app.agent_dispatcher.domain.plan.action.skill.mcp.engine import MCPEngine
 from app.agent_dispatcher.infrastructure.entity.AgentInstance import AgentInstance
+from app.cosight.agent.base.conversation_compactor import ConversationCompactor
 from app.cosight.agent.base.skill_to_tool import convert_skill_to_tool,get_mcp_tools,convert_mcp_tools
 from app.cosight.llm.chat_llm import ChatLLM
+from app.cosight.llm.usage_tracker import usage_scope
+from app.cosight.task.deadline import Deadline, DeadlineExceeded
+from app.cosight.task.loop_runner import run_coroutine
+from app.cosight.task.plan_report_manager import StreamReporter
 from app.cosight.task.time_record_util import time_record
-from app.common.logger_util import logger
+from app.cosight.task.tool_executor import MCP_LANE, ToolCallTimeout, get_tool_executor, get_tool_lane
+from app.cosight.tool.tool_cache import get_plan_tool_cache, get_tool_result_ttl, is_error_result, make_tool_call_key
+from app.common.logger_util import logger, PAYLOAD
 
 
 class BaseAgent:
@@ -40,6 +48,7 @@ class BaseAgent:
         self.tools.extend(convert_mcp_tools(self.mcp_tools))
         self.functions = functions
         self.history = []
+        self.compactor = ConversationCompactor(getattr(self, "work_space_path", None))
 
     def find_mcp_tool(self, tool_name):
         for tool in self.mcp_tools:
@@ -48,23 +57,165 @@ class BaseAgent:
                     return tool, func.name
         return None
 
-    def execute(self, messages: List[Dict[str, Any]], step_index=None, max_iteration=10):
-        for i in range(max_iteration):
-            logger.info(f'act agent call with tools message: {messages}')
-            response = self.llm.create_with_tools(messages, self.tools)
-            logger.info(f'act agent call with tools response: {response}')
+    def execute(self, messages: List[Dict[str, Any]], step_index=None, max_iteration=10,
+                deadline: Optional[Deadline] = None):
+        """deadline 为步骤的截止时间，每次迭代前检查，超时抛出 DeadlineExceeded"""
+        # 本次执行中的模型调用记到当前计划、步骤与智能体名下
+        with self._usage_scope(step_index):
+            for i in range(max_iteration):
+                if deadline:
+                    deadline.check()
+                self.compactor.compact(messages)
+                logger.info('act agent call with tools message: %s', messages, extra=PAYLOAD)
+                stream_reporter = self._stream_reporter(step_index)
+                response = self.llm.create_with_tools(messages, self.tools, on_delta=stream_reporter,
+                                                      deadline=deadline)
+                if stream_reporter:
+                    stream_reporter.flush()
+                logger.info('act agent call with tools response: %s', response, extra=PAYLOAD)
 
-            # Process initial response
-            result = self._process_response(response, messages, step_index)
-            logger.info(f'iter {i} for {self.agent_instance.instance_name} call tools result: {result}')
-            if result:
-                return result
+                # Process initial response
+                result = self._process_response(response, messages, step_index, deadline)
+                logger.info(f'iter {i} for {self.agent_instance.instance_name} call tools result: {result}')
+                if result:
+                    return result
 
-        if max_iteration > 1:
-            return self._handle_max_iteration(messages, step_index)
-        return messages[-1].get("content")
+            if max_iteration > 1:
+                return self._handle_max_iteration(messages, step_index, deadline)
+            return messages[-1].get("content")
+
+    async def aexecute(self, messages: List[Dict[str, Any]], step_index=None, max_iteration=10,
+                       deadline: Optional[Deadline] = None):
+        """execute 的协程版本，self.llm 需为 AsyncChatLLM"""
+        with self._usage_scope(step_index):
+            for i in range(max_iteration):
+                if deadline:
+                    deadline.check()
+                self.compactor.compact(messages)
+                logger.info('act agent async call with tools message: %s', messages, extra=PAYLOAD)
+                stream_reporter = self._stream_reporter(step_index)
+                response = await self._await_before_deadline(
+                    self.llm.create_with_tools(messages, self.tools, on_delta=stream_reporter, deadline=deadline),
+                    deadline)
+                if stream_reporter:
+                    stream_reporter.flush()
+                logger.info('act agent async call with tools response: %s', response, extra=PAYLOAD)
+
+                result = await self._aprocess_response(response, messages, step_index, deadline)
+                logger.info(f'iter {i} for {self.agent_instance.instance_name} call tools result: {result}')
+                if result:
+                    return result
+
+            if max_iteration > 1:
+                return await self._ahandle_max_iteration(messages, step_index, deadline)
+            return messages[-1].get("content")
+
+    def _usage_scope(self, step_index=None):
+        return usage_scope(getattr(self, "plan_id", None), step_index, self.agent_instance.instance_name)
+
+    def _stream_reporter(self, step_index=None) -> Optional[StreamReporter]:
+        """大模型为流式模式时，返回将文本增量以 plan_stream 事件推送给前端的回调"""
+        if not getattr(self.llm, "stream", False):
+            return None
+        return StreamReporter(getattr(self, "plan_id", None), self.agent_instance.instance_name, step_index)
+
+    @staticmethod
+    async def _await_before_deadline(awaitable, deadline: Optional[Deadline]):
+        """在截止时间内等待协程，超时则取消并抛出 DeadlineExceeded"""
+        if deadline is None or deadline.remaining() is None:
+            return await awaitable
+        try:
+            return await asyncio.wait_for(awaitable, timeout=deadline.remaining())
+        except asyncio.TimeoutError:
+            raise DeadlineExceeded(f"{deadline.name} exceeded its time budget of {deadline.timeout:.0f}s")
+
+    def _process_response(self, response, messages, step_index, deadline: Optional[Deadline] = None):
+        if not response.tool_calls:
+            messages.append({"role": "assistant", "content": response.content})
+            return response.content
+
+        messages.append({
+            "role": "assistant",
+            "content": response.content,
+            "tool_calls": response.tool_calls
+        })
+
+        results = self._execute_tool_calls(response.tool_calls, step_index, deadline)
+        messages.extend(results)
+        if deadline:
+            # 工具调用超时被放弃后，结果已写入对话，步骤以超时结束
+            deadline.check()
+
+        # Check for termination conditions
+        for result in results:
+            if result["name"] in ["terminate", "mark_step"]:
+                return result["content"]
+        return None
+
+    def _execute_tool_calls(self, tool_calls, step_index, deadline: Optional[Deadline] = None):
+        results = []
+        # 工具调用按类别提交到进程共享的线程池，不再为每次模型响应创建线程池
+        executor = get_tool_executor()
+        futures = []
+        for tool_call in tool_calls:
+            function_name = tool_call.function.name
+            function_args = tool_call.function.arguments
+
+            if function_name in self.functions:
+                # 复制上下文，工具内部发起的模型调用仍记到当前步骤名下
+                futures.append(executor.submit(get_tool_lane(function_name), functools.partial(
+                    copy_context().run,
+                    self._execute_tool_call,
+                    function_name=function_name,
+                    function_args=function_args,
+                    tool_call_id=tool_call.id,
+                    step_index=step_index,
+                    deadline=deadline
+                )))
+            else:
+                futures.append(executor.submit(MCP_LANE, functools.partial(
+                    copy_context().run,
+                    self._execute_mcp_tool_call,
+                    function_name=function_name,
+                    function_args=function_args,
+                    tool_call_id=tool_call.id
+                )))
+
+        # 最多等到截止时间，未完成的工具调用被放弃，不再阻塞当前步骤：排队中的取消，执行中的不再占用线程名额
+        _, not_done = wait(futures, timeout=deadline.remaining() if deadline else None)
+        for future in not_done:
+            executor.abandon(future)
+        for tool_call, future in zip(tool_calls, futures):
+            if future in not_done:
+                logger.warning(f"tool call {tool_call.function.name} abandoned after {deadline.name} deadline")
+                results.append({
+                    "role": "tool",
+                    "name": tool_call.function.name,
+                    "tool_call_id": tool_call.id,
+                    "content": f"Execution timeout: {deadline.name} exceeded its time budget"
+                })
+                continue
+            try:
+                results.append(future.result())
+            except ToolCallTimeout as e:
+                logger.warning(f"tool call {tool_call.function.name} abandoned: {str(e)}")
+                results.append({
+                    "role": "tool",
+                    "name": tool_call.function.name,
+                    "tool_call_id": tool_call.id,
+                    "content": f"Execution timeout: {str(e)}"
+                })
+            except Exception as e:
+                logger.error(f"Unhandled exception: {e}", exc_info=True)
+                results.append({
+                    "role": "tool",
+                    "name": tool_call.function.name,
+                    "tool_call_id": tool_call.id,
+                    "content": f"Execution error: {str(e)}"
+                })
+        return results
 
-    def _process_response(self, response, messages, step_index):
+    async def _aprocess_response(self, response, messages, step_index, deadline: Optional[Deadline] = None):
         if not response.tool_calls:
             messages.append({"role": "assistant", "content": response.content})
             return response.content
@@ -75,8 +226,10 @@ class BaseAgent:
             "tool_calls": response.tool_calls
         })
 
-        results = self._execute_tool_calls(response.tool_calls, step_index)
+        results = await self._aexecute_tool_calls(response.tool_calls, step_index, deadline)
         messages.extend(results)
+        if deadline:
+            deadline.check()
 
         # Check for termination conditions
         for result in results:
@@ -84,56 +237,128 @@ class BaseAgent:
                 return result["content"]
         return None
 
-    def _execute_tool_calls(self, tool_calls, step_index):
+    async def _aexecute_tool_calls(self, tool_calls, step_index, deadline: Optional[Deadline] = None):
+        coroutines = []
+        for tool_call in tool_calls:
+            if tool_call.function.name in self.functions:
+                coroutines.append(self._aexecute_tool_call(
+                    function_name=tool_call.function.name,
+                    function_args=tool_call.function.arguments,
+                    tool_call_id=tool_call.id,
+                    step_index=step_index,
+                    deadline=deadline
+                ))
+            else:
+                coroutines.append(self._aexecute_mcp_tool_call(
+                    function_name=tool_call.function.name,
+                    function_args=tool_call.function.arguments,
+                    tool_call_id=tool_call.id
+                ))
+
+        # 每个工具调用最多等到截止时间，超时的被取消（线程中的同步工具被放弃）
+        if deadline and deadline.remaining() is not None:
+            coroutines = [asyncio.wait_for(coroutine, timeout=deadline.remaining()) for coroutine in coroutines]
         results = []
-        with ThreadPoolExecutor() as executor:
-            futures = []
-            for tool_call in tool_calls:
-                function_name = tool_call.function.name
-                function_args = tool_call.function.arguments
-
-                if function_name in self.functions:
-                    futures.append(executor.submit(
-                        self._execute_tool_call,
-                        function_name=function_name,
-                        function_args=function_args,
-                        tool_call_id=tool_call.id,
-                        step_index=step_index
-                    ))
-                else:
-                    futures.append(executor.submit(
-                        self._execute_mcp_tool_call,
-                        function_name=function_name,
-                        function_args=function_args,
-                        tool_call_id=tool_call.id
-                    ))
-
-            for future in futures:
-                try:
-                    results.append(future.result())
-                except Exception as e:
-                    logger.error(f"Unhandled exception: {e}", exc_info=True)
-                    results.append({
-                        "role": "tool",
-                        "name": function_name,
-                        "tool_call_id": tool_call.id,
-                        "content": f"Execution error: {str(e)}"
-                    })
+        for tool_call, result in zip(tool_calls, await asyncio.gather(*coroutines, return_exceptions=True)):
+            if isinstance(result, asyncio.TimeoutError):
+                logger.warning(f"tool call {tool_call.function.name} abandoned after {deadline.name} deadline")
+                result = {
+                    "role": "tool",
+                    "name": tool_call.function.name,
+                    "tool_call_id": tool_call.id,
+                    "content": f"Execution timeout: {deadline.name} exceeded its time budget"
+                }
+            elif isinstance(result, BaseException):
+                logger.error(f"Unhandled exception: {result}", exc_info=result)
+                result = {
+                    "role": "tool",
+                    "name": tool_call.function.name,
+                    "tool_call_id": tool_call.id,
+                    "content": f"Execution error: {str(result)}"
+                }
+            results.append(result)
         return results
 
-    def _handle_max_iteration(self, messages, step_index):
+    def _handle_max_iteration(self, messages, step_index, deadline: Optional[Deadline] = None):
         messages.append({"role": "user", "content": "Summarize the above conversation, use mark_step to mark the step"})
+        self.compactor.compact(messages)
         mark_step_tools = [tool for tool in self.tools if tool['function']['name'] == 'mark_step']
-        response = self.llm.create_with_tools(messages, mark_step_tools)
+        stream_reporter = self._stream_reporter(step_index)
+        response = self.llm.create_with_tools(messages, mark_step_tools, on_delta=stream_reporter,
+                                              deadline=deadline)
+        if stream_reporter:
+            stream_reporter.flush()
 
-        result = self._process_response(response, messages, step_index)
+        result = self._process_response(response, messages, step_index, deadline)
         if result:
             return result
 
         return messages[-1].get("content")
 
+    async def _ahandle_max_iteration(self, messages, step_index, deadline: Optional[Deadline] = None):
+        messages.append({"role": "user", "content": "Summarize the above conversation, use mark_step to mark the step"})
+        self.compactor.compact(messages)
+        mark_step_tools = [tool for tool in self.tools if tool['function']['name'] == 'mark_step']
+        stream_reporter = self._stream_reporter(step_index)
+        response = await self._await_before_deadline(
+            self.llm.create_with_tools(messages, mark_step_tools, on_delta=stream_reporter, deadline=deadline),
+            deadline)
+        if stream_reporter:
+            stream_reporter.flush()
+
+        result = await self._aprocess_response(response, messages, step_index, deadline)
+        if result:
+            return result
+
+        return messages[-1].get("content")
+
+    def _call_tool(self, function_name: str, args_dict: dict):
+        function_to_call = self.functions[function_name]
+        # 检查是否是异步函数
+        if inspect.iscoroutinefunction(function_to_call):
+            # 在常驻事件循环上执行异步函数，不再为每次调用创建和关闭事件循环
+            return run_coroutine(function_to_call(**args_dict))
+        # 同步函数直接调用
+        return function_to_call(**args_dict)
+
+    def _call_tool_cached(self, function_name: str, args_dict: dict, deadline: Optional[Deadline] = None):
+        """幂等工具的结果在计划内按参数缓存，其他步骤线程中并发的相同调用等待同一次执行的结果"""
+        ttl = get_tool_result_ttl(function_name)
+        if ttl is None:
+            return self._call_tool(function_name, args_dict)
+        key = make_tool_call_key(function_name, self.functions[function_name], args_dict)
+        return get_plan_tool_cache(getattr(self, "plan_id", None)).get_or_compute(
+            key, lambda: self._call_tool(function_name, args_dict),
+            lambda result: not is_error_result(result), ttl, deadline)
+
+    async def _acall_tool(self, function_name: str, args_dict: dict):
+        function_to_call = self.functions[function_name]
+        if inspect.iscoroutinefunction(function_to_call):
+            # 原生异步工具直接在当前事件循环中等待
+            return await function_to_call(**args_dict)
+        # 同步工具放到共享的工具线程池中执行，避免阻塞事件循环
+        executor = get_tool_executor()
+        future = executor.submit(get_tool_lane(function_name),
+                                 functools.partial(copy_context().run, function_to_call, **args_dict))
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            # 步骤截止时协程被取消，执行中的同步工具不再占用所在类别的线程名额
+            executor.abandon(future)
+            raise
+
+    async def _acall_tool_cached(self, function_name: str, args_dict: dict, deadline: Optional[Deadline] = None):
+        ttl = get_tool_result_ttl(function_name)
+        if ttl is None:
+            return await self._acall_tool(function_name, args_dict)
+        key = make_tool_call_key(function_name, self.functions[function_name], args_dict)
+        return await get_plan_tool_cache(getattr(self, "plan_id", None)).aget_or_compute(
+            key, lambda: self._acall_tool(function_name, args_dict),
+            lambda result: not is_error_result(result), ttl, deadline)
+
     @time_record
-    def _execute_tool_call(self, function_name="", function_args="", tool_call_id="", step_index=None):
+    def _execute_tool_call(self, function_name="", function_args="", tool_call_id="", step_index=None,
+                           deadline: Optional[Deadline] = None):
         try:
             # Clean and validate JSON
             cleaned_args = function_args.replace('\\\'', '\'')
@@ -142,20 +367,7 @@ class BaseAgent:
             if step_index is not None and 'step_index' not in args_dict and function_name in ['mark_step']:
                 args_dict['step_index'] = step_index
 
-            function_to_call = self.functions[function_name]
-
-            # 检查是否是异步函数
-            if inspect.iscoroutinefunction(function_to_call):
-                # 创建新的事件循环来运行异步函数
-                loop = asyncio.new_event_loop()
-                try:
-                    asyncio.set_event_loop(loop)
-                    result = loop.run_until_complete(function_to_call(**args_dict))
-                finally:
-                    loop.close()
-            else:
-                # 同步函数直接调用
-                result = function_to_call(**args_dict)
+            result = self._call_tool_cached(function_name, args_dict, deadline)
 
             return {
                 "role": "tool",
@@ -174,23 +386,14 @@ class BaseAgent:
 
     @time_record
     def _execute_mcp_tool_call(self, function_name="", function_args="", tool_call_id=""):
-        loop = None
         try:
             mcp_tool, tool_name = self.find_mcp_tool(function_name)
             if mcp_tool and tool_name:
                 cleaned_args = function_args.replace('\\\'', '\'')
                 args_dict = json.loads(cleaned_args or "{}")
-                # Windows系统需要特殊处理
-                if sys.platform == "win32":
-                    from asyncio import ProactorEventLoop
-                    loop = ProactorEventLoop()
-                else:
-                    loop = asyncio.new_event_loop()
-
-                asyncio.set_event_loop(loop)
 
-                # 执行异步调用
-                result = loop.run_until_complete(
+                # 在常驻事件循环上执行异步调用
+                result = run_coroutine(
                     MCPEngine.invoke_mcp_tool(
                         mcp_tool['mcp_name'],
                         mcp_tool['mcp_config'],
@@ -219,8 +422,63 @@ class BaseAgent:
                 "tool_call_id": tool_call_id,
                 "content": f"Execution error: {str(e)}"
             }
-        finally:
-            # 清理事件循环
-            if loop:
-                loop.close()
-                asyncio.set_event_loop(None)
+
+    async def _aexecute_tool_call(self, function_name="", function_args="", tool_call_id="", step_index=None,
+                                  deadline: Optional[Deadline] = None):
+        try:
+            cleaned_args = function_args.replace('\\\'', '\'')
+            args_dict = json.loads(cleaned_args or "{}")
+
+            if step_index is not None and 'step_index' not in args_dict and function_name in ['mark_step']:
+                args_dict['step_index'] = step_index
+
+            result = await self._acall_tool_cached(function_name, args_dict, deadline)
+
+            return {
+                "role": "tool",
+                "name": function_name,
+                "content": str(result),
+                "tool_call_id": tool_call_id
+            }
+        except Exception as e:
+            logger.error(f"Unhandled exception: {e}", exc_info=True)
+            return {
+                "role": "tool",
+                "name": function_name,
+                "tool_call_id": tool_call_id,
+                "content": f"Execution error: {str(e)}"
+            }
+
+    async def _aexecute_mcp_tool_call(self, function_name="", function_args="", tool_call_id=""):
+        try:
+            mcp_tool, tool_name = self.find_mcp_tool(function_name)
+            if mcp_tool and tool_name:
+                cleaned_args = function_args.replace('\\\'', '\'')
+                args_dict = json.loads(cleaned_args or "{}")
+                result = await MCPEngine.invoke_mcp_tool(
+                    mcp_tool['mcp_name'],
+                    mcp_tool['mcp_config'],
+                    tool_name,
+                    args_dict
+                )
+                return {
+                    "role": "tool",
+                    "name": function_name,
+                    "content": str(result),
+                    "tool_call_id": tool_call_id
+                }
+            else:
+                return {
+                    "role": "tool",
+                    "name": function_name,
+                    "tool_call_id": tool_call_id,
+                    "content": f"Function {function_name} not found in available functions"
+                }
+        except Exception as e:
+            logger.error(f"Unhandled exception: {e}", exc_info=True)
+            return {
+                "role": "tool",
+                "name": function_name,
+                "tool_call_id": tool_call_id,
+                "content": f"Execution error: {str(e)}"
+            }
@@ -0,0 +1,130 @@
+# Copyright 2025 ZTE Corporation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import os
+import re
+from typing import Any, Dict, List, Optional
+
+from app.common.logger_util import logger
+from app.cosight.task.todolist import WORKSPACE_META_DIR
+from config.config import get_compaction_config
+
+TOOL_OUTPUT_DIR = "tool_outputs"
+# 已压缩的工具结果以该前缀开头，避免重复压缩
+COMPACTED_MARKER = "[compacted tool output]"
+_CJK_PATTERN = re.compile(r"[\u3000-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uff00-\uffef]")
+# 每条消息的角色、分隔符等固定开销
+_MESSAGE_OVERHEAD = 4
+
+
+def estimate_tokens(text: Optional[str]) -> int:
+    """本地估算 token 数：中日韩字符约 1 个 token，其余字符约 4 个字符 1 个 token"""
+    if not text:
+        return 0
+    cjk = len(_CJK_PATTERN.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def _tool_calls_text(tool_calls) -> str:
+    parts = []
+    for tool_call in tool_calls or []:
+        function = tool_call.get("function") if isinstance(tool_call, dict) else getattr(tool_call, "function", None)
+        if isinstance(function, dict):
+            parts.append(f"{function.get('name', '')}{function.get('arguments', '')}")
+        elif function is not None:
+            parts.append(f"{function.name}{function.arguments}")
+    return "".join(parts)
+
+
+def estimate_message_tokens(message: Dict[str, Any]) -> int:
+    content = message.get("content")
+    if isinstance(content, list):
+        # 多模态消息只统计文本部分
+        content = "".join(item.get("text", "") for item in content if isinstance(item, dict))
+    return _MESSAGE_OVERHEAD + estimate_tokens(content) + estimate_tokens(_tool_calls_text(message.get("tool_calls")))
+
+
+def estimate_messages_tokens(messages: List[Dict[str, Any]]) -> int:
+    return sum(estimate_message_tokens(message) for message in messages)
+
+
+class ConversationCompactor:
+    """对话历史压缩
+
+    对话 token 估算值超过预算时，从最早的工具结果开始，将其替换为截断摘要；完整内容写入工作区
+    .cosight/tool_outputs 下的文件，摘要中给出文件路径，模型需要时可以用 file_read 读取。
+    只改写 tool 消息的内容、不删除消息，tool_calls 与 tool 结果的对应关系保持不变；
+    最近一轮工具结果（模型尚未看过）不压缩。
+    """
+
+    def __init__(self, work_space_path: Optional[str] = None, budget: Optional[int] = None,
+                 digest_chars: Optional[int] = None, keep_recent: Optional[int] = None):
+        config = get_compaction_config()
+        self.work_space_path = work_space_path
+        self.budget = budget if budget is not None else config["token_budget"]
+        self.digest_chars = digest_chars if digest_chars is not None else config["digest_chars"]
+        self.keep_recent = keep_recent if keep_recent is not None else config["keep_recent"]
+
+    def compact(self, messages: List[Dict[str, Any]]) -> int:
+        """原地压缩 messages，返回节省的 token 估算值"""
+        if not self.budget or self.budget <= 0:
+            return 0
+        total = estimate_messages_tokens(messages)
+        if total <= self.budget:
+            return 0
+
+        saved = 0
+        for index in self._candidates(messages):
+            if total - saved <= self.budget:
+                break
+            message = messages[index]
+            before = estimate_message_tokens(message)
+            message["content"] = self._digest(message)
+            saved += before - estimate_message_tokens(message)
+
+        logger.info(f"conversation compacted from ~{total} to ~{total - saved} tokens, budget {self.budget}")
+        return saved
+
+    def _candidates(self, messages: List[Dict[str, Any]]) -> List[int]:
+        """可压缩的工具结果下标（从旧到新），排除最近 keep_recent 轮工具调用的结果"""
+        rounds = [i for i, message in enumerate(messages)
+                  if message.get("role") == "assistant" and message.get("tool_calls")]
+        boundary = rounds[-self.keep_recent] if self.keep_recent and len(rounds) >= self.keep_recent else len(messages)
+        return [i for i, message in enumerate(messages[:boundary])
+                if message.get("role") == "tool" and isinstance(message.get("content"), str)
+                and not message["content"].startswith(COMPACTED_MARKER)
+                and len(message["content"]) > self.digest_chars]
+
+    def _digest(self, message: Dict[str, Any]) -> str:
+        content = message["content"]
+        pointer = self._spill(message.get("tool_call_id"), content)
+        head = content[:self.digest_chars].rstrip()
+        location = f"full output saved to {pointer}, read it with file_read if needed" if pointer \
+            else "full output dropped"
+        return f"{COMPACTED_MARKER} {message.get('name', '')}: {head}\n...[truncated {len(content) - len(head)} chars; {location}]"
+
+    def _spill(self, tool_call_id: Optional[str], content: str) -> Optional[str]:
+        if not self.work_space_path or not tool_call_id:
+            return None
+        try:
+            output_dir = os.path.join(self.work_space_path, WORKSPACE_META_DIR, TOOL_OUTPUT_DIR)
+            os.makedirs(output_dir, exist_ok=True)
+            file_path = os.path.join(output_dir, f"{re.sub(r'[^A-Za-z0-9_.-]', '_', tool_call_id)}.txt")
+            with open(file_path, "w", encoding="utf-8") as f:
+                f.write(content)
+            return file_path
+        except Exception as e:
+            logger.warning(f"failed to save tool output {tool_call_id}: {str(e)}")
+            return None
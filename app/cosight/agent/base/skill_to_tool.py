@@ -15,22 +15,9 @@
 
 from app.agent_dispatcher.domain.plan.action.skill.mcp.const import LOCAL_MCP
 from app.agent_dispatcher.domain.plan.action.skill.mcp.engine import MCPEngine
-import asyncio
-from contextlib import contextmanager
-
-
-@contextmanager
-def async_event_loop():
-    """线程安全的事件循环上下文管理器"""
-    try:
-        # 创建新的事件循环
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        yield loop
-    finally:
-        # 清理事件循环
-        loop.close()
-        asyncio.set_event_loop(None)
+from app.cosight.task.loop_runner import run_coroutine
+from app.common.logger_util import logger
+
 
 def convert_skill_to_tool(skill, lang='en') -> dict:
     """Convert skill to tool format for llm.create_with_tools
@@ -71,13 +58,12 @@ def get_mcp_tools(skills):
     for skill in skills:
         if skill.skill_type in [LOCAL_MCP]:
             try:
-                with async_event_loop() as loop:
-                    mcp_tools = loop.run_until_complete(
-                        MCPEngine.get_mcp_tools(
-                            skill.skill_name,
-                            skill.mcp_server_config
-                        )
+                mcp_tools = run_coroutine(
+                    MCPEngine.get_mcp_tools(
+                        skill.skill_name,
+                        skill.mcp_server_config
                     )
+                )
                 print(f"mcp_tools:{mcp_tools}")
                 result = {
                     "mcp_name": skill.skill_name,
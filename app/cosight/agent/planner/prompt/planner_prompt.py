@@ -19,7 +19,8 @@ def planner_system_prompt(question):
 
     # Add path to import llm.py
     sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../../../../")))
-    from llm import llm_for_plan
+    from llm import get_llm
+    llm_for_plan = get_llm("plan")
     
     # 检查是否使用Claude模型
     is_claude = False
@@ -220,7 +221,8 @@ def planner_create_plan_prompt(question, output_format=""):
     import os
     # Add path to import llm.py
     sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../../../../")))
-    from llm import llm_for_plan
+    from llm import get_llm
+    llm_for_plan = get_llm("plan")
     
     # 检查是否使用Claude模型
     is_claude = False
@@ -267,7 +269,8 @@ def planner_re_plan_prompt(question, plan, output_format=""):
     import os
     # 添加路径以导入 llm.py
     sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../../../../")))
-    from llm import llm_for_plan
+    from llm import get_llm
+    llm_for_plan = get_llm("plan")
 
     # 检查是否使用 Claude 模型
     is_claude = False
@@ -339,7 +342,8 @@ def planner_finalize_plan_prompt(question, plan, output_format=""):
     import os
     # 添加路径以导入 llm.py
     sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../../../../")))
-    from llm import llm_for_plan
+    from llm import get_llm
+    llm_for_plan = get_llm("plan")
 
     # 检查是否使用 Claude 模型
     is_claude = False
@@ -28,6 +28,7 @@ from app.cosight.tool.terminate_toolkit import TerminateToolkit
 
 class TaskPlannerAgent(BaseAgent):
     def __init__(self, agent_instance: AgentInstance, llm: ChatLLM, plan_id, functions: Dict = None):
+        self.plan_id = plan_id
         self.plan = TaskManager.get_plan(plan_id)
         plan_toolkit = PlanToolkit(self.plan)
         terminate_toolkit = TerminateToolkit()
@@ -43,6 +44,12 @@ class TaskPlannerAgent(BaseAgent):
         result = self.execute(self.history, max_iteration=1)
         return result
 
+    async def acreate_plan(self, question, output_format=""):
+        self.history.append({"role": "system", "content": planner_system_prompt(question)})
+        self.history.append({"role": "user", "content": planner_create_plan_prompt(question, output_format)})
+        result = await self.aexecute(self.history, max_iteration=1)
+        return result
+
     def re_plan(self, question, output_format=""):
         self.history.append(
             {"role": "user", "content": planner_re_plan_prompt(question, self.plan.format(), output_format)})
@@ -52,7 +59,33 @@ class TaskPlannerAgent(BaseAgent):
     def finalize_plan(self, question, output_format=""):
         self.history.append(
             {"role": "user", "content": planner_finalize_plan_prompt(question, self.plan.format(), output_format)})
-        result = self.llm.chat_to_llm(self.history)
+        # 最终总结通常较长，流式模式下边生成边推送给前端
+        stream_reporter = self._stream_reporter()
+        with self._usage_scope():
+            result = self.llm.chat_to_llm(self.history, on_delta=stream_reporter)
+        if stream_reporter:
+            stream_reporter.flush()
+        self.plan.set_plan_result(result)
+        plan_report_event_manager.publish("plan_result", self.plan)
+        return f"""
+Task:
+{question}
+
+Plan Status:
+{self.plan.format()}
+
+Summary:
+{result}
+"""
+
+    async def afinalize_plan(self, question, output_format=""):
+        self.history.append(
+            {"role": "user", "content": planner_finalize_plan_prompt(question, self.plan.format(), output_format)})
+        stream_reporter = self._stream_reporter()
+        with self._usage_scope():
+            result = await self.llm.chat_to_llm(self.history, on_delta=stream_reporter)
+        if stream_reporter:
+            stream_reporter.flush()
         self.plan.set_plan_result(result)
         plan_report_event_manager.publish("plan_result", self.plan)
         return f"""
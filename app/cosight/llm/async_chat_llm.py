@@ -0,0 +1,179 @@
+# Copyright 2025 ZTE Corporation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import asyncio
+from typing import List, Dict, Any, Optional, Callable
+
+from openai import AsyncOpenAI
+from openai.types.chat import ChatCompletionMessage
+
+from app.cosight.llm.chat_llm import ChatLLM
+from app.cosight.llm.endpoint_pool import Endpoint, EndpointPool
+from app.cosight.llm.llm_cache import get_llm_cache, LLMCacheMiss
+from app.cosight.llm.rate_limiter import acall_with_governor, is_overload_error, mark_first_token
+from app.cosight.llm.stream_accumulator import StreamAccumulator
+from app.cosight.llm.usage_tracker import UsageTracker, record_cache_hit, record_usage
+from app.cosight.task.deadline import Deadline, DeadlineExceeded
+from app.cosight.task.time_record_util import time_record
+from app.common.logger_util import logger, PAYLOAD
+
+
+class AsyncChatLLM:
+    """基于 AsyncOpenAI 的异步对话客户端，接口与 ChatLLM 保持一致，方法均为协程
+
+    与 ChatLLM 共用响应缓存、按服务地址的限流调节器、熔断状态与用量统计；等待模型返回与限流退避时不占用线程，
+    同一事件循环上可以并发大量调用。配置了备用地址时同样对冲与切换，落败的请求会被取消。
+    """
+
+    def __init__(self, base_url: str, api_key: str, model: str, client: AsyncOpenAI, max_tokens: int = 4096,
+                 temperature: float = 0.0, stream: bool = False, tools: List[Any] = None, role: Optional[str] = None,
+                 fallback_endpoints: Optional[List[Endpoint]] = None):
+        self.tools = tools or []
+        self.client = client
+        self.base_url = base_url
+        self.api_key = api_key
+        self.model = model
+        self.stream = stream
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        # 模型角色（plan/act/tool/vision），用于按角色启用响应缓存
+        self.role = role
+        self.cache = get_llm_cache(role) if role else None
+        # 备用地址的 client 需为 AsyncOpenAI
+        self.endpoint_pool = EndpointPool([Endpoint(base_url, model, client)] + fallback_endpoints) \
+            if fallback_endpoints else None
+
+    async def _complete(self, on_delta: Optional[Callable[[str], None]] = None, **request):
+        """发起一次对话补全并返回 message，缓存与用量统计同 ChatLLM._complete"""
+        with UsageTracker.track_call(self.role, self.model):
+            if self.cache is None:
+                return await self._call_model(on_delta, request)
+
+            cache_key, cached = self.cache.lookup(request)
+            if cached is not None:
+                record_cache_hit()
+                message = ChatCompletionMessage(**cached)
+                visible = (message.content or "").split('</think>')[-1].strip('\n')
+                if visible and on_delta:
+                    on_delta(visible)
+                return message
+
+            message = await self._call_model(on_delta, request)
+            self.cache.store(cache_key, message.model_dump(exclude_none=True))
+            return message
+
+    async def _call_model(self, on_delta: Optional[Callable[[str], None]], request: Dict[str, Any]):
+        if self.endpoint_pool is None:
+            return await acall_with_governor(self.base_url, self._request, self.client, on_delta, **request)
+        return await self.endpoint_pool.acall(lambda endpoint, claim: acall_with_governor(
+            endpoint.base_url, self._request, endpoint.client, on_delta, lambda: claim.check(endpoint),
+            **{**request, "model": endpoint.model}))
+
+    async def _request(self, client: AsyncOpenAI, on_delta: Optional[Callable[[str], None]] = None,
+                       claim: Optional[Callable[[], None]] = None, **request):
+        """参数同 ChatLLM._request"""
+        if not self.stream:
+            response = await client.chat.completions.create(**request)
+            if claim:
+                claim()
+            logger.info("async LLM chat completions response is %s", response, extra=PAYLOAD)
+            record_usage(response.usage)
+            return response.choices[0].message
+
+        accumulator = StreamAccumulator()
+        stream = await client.chat.completions.create(stream=True, stream_options={"include_usage": True},
+                                                      **request)
+        try:
+            async for chunk in stream:
+                mark_first_token()
+                if claim:
+                    claim()
+                    claim = None
+                visible_delta = accumulator.add(chunk)
+                if visible_delta and on_delta:
+                    on_delta(visible_delta)
+        finally:
+            # 被截止时间取消或对冲落败时及时关闭连接
+            await stream.close()
+        message = accumulator.message()
+        record_usage(accumulator.usage)
+        logger.info("async LLM chat completions stream message is %s, finish reason %s", message,
+                    accumulator.finish_reason, extra=PAYLOAD)
+        return message
+
+    @time_record
+    async def create_with_tools(self, messages: List[Dict[str, Any]], tools: List[Dict],
+                                timeout: Optional[float] = None, on_delta: Optional[Callable[[str], None]] = None,
+                                deadline: Optional[Deadline] = None):
+        """
+        Create a chat completion with support for function/tool calls
+
+        timeout: 本次调用（含重试）的超时时间（秒），为空时使用客户端默认值
+        on_delta: 流式模式（stream=True）下接收文本增量的回调
+        deadline: 步骤的截止时间，语义同 ChatLLM.create_with_tools
+        """
+        # 清洗提示词，去除None
+        messages = ChatLLM.clean_none_values(messages)
+        deadline = ChatLLM._call_deadline(timeout, deadline)
+        max_retries = 2
+        for attempt in range(max_retries):
+            try:
+                message = await self._complete(
+                    on_delta,
+                    model=self.model,
+                    messages=messages,
+                    tools=tools,
+                    tool_choice="auto",
+                    temperature=self.temperature,
+                    **ChatLLM._attempt_timeout(deadline)
+                )
+                break
+            except (LLMCacheMiss, DeadlineExceeded):
+                raise
+            except Exception as e:
+                if is_overload_error(e):
+                    raise
+                logger.warning(f"async LLM error: {e} on attempt {attempt + 1}, retrying...", exc_info=True)
+                if attempt == max_retries - 1:
+                    logger.error(f"Failed to create after {max_retries} attempts.")
+                    raise
+                await asyncio.sleep(ChatLLM._retry_delay(deadline, e))
+
+        # 去除think标签
+        content = message.content
+        if content is not None and '</think>' in content:
+            message.content = content.split('</think>')[-1].strip('\n')
+
+        return message
+
+    @time_record
+    async def chat_to_llm(self, messages: List[Dict[str, Any]], timeout: Optional[float] = None,
+                          on_delta: Optional[Callable[[str], None]] = None):
+        # 清洗提示词，去除None
+        messages = ChatLLM.clean_none_values(messages)
+        message = await self._complete(
+            on_delta,
+            model=self.model,
+            messages=messages,
+            temperature=self.temperature,
+            max_tokens=self.max_tokens,
+            **({"timeout": timeout} if timeout is not None else {})
+        )
+        # 去除think标签
+        content = message.content
+        if content is not None and '</think>' in content:
+            message.content = content.split('</think>')[-1].strip('\n')
+
+        return message.content
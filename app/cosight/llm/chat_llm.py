@@ -13,18 +13,26 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Callable
 
 from jupyter_server.auth import passwd
 from openai import OpenAI
+from openai.types.chat import ChatCompletionMessage
 
+from app.cosight.llm.endpoint_pool import Endpoint, EndpointPool, HedgeCancelled
+from app.cosight.llm.llm_cache import get_llm_cache, LLMCacheMiss
+from app.cosight.llm.rate_limiter import call_with_governor, is_overload_error, mark_first_token
+from app.cosight.llm.stream_accumulator import StreamAccumulator
+from app.cosight.llm.usage_tracker import UsageTracker, record_cache_hit, record_usage
+from app.cosight.task.deadline import Deadline, DeadlineExceeded
 from app.cosight.task.time_record_util import time_record
-from app.common.logger_util import logger
+from app.common.logger_util import logger, PAYLOAD
 
 
 class ChatLLM:
     def __init__(self, base_url: str, api_key: str, model: str, client: OpenAI, max_tokens: int = 4096,
-                 temperature: float = 0.0, stream: bool = False, tools: List[Any] = None):
+                 temperature: float = 0.0, stream: bool = False, tools: List[Any] = None, role: Optional[str] = None,
+                 fallback_endpoints: Optional[List[Endpoint]] = None):
         self.tools = tools or []
         self.client = client
         self.base_url = base_url
@@ -33,6 +41,12 @@ class ChatLLM:
         self.stream = stream
         self.temperature = temperature
         self.max_tokens = max_tokens
+        # 模型角色（plan/act/tool/vision），用于按角色启用响应缓存
+        self.role = role
+        self.cache = get_llm_cache(role) if role else None
+        # 配置了备用地址时，慢请求向备用地址对冲，失败时切换
+        self.endpoint_pool = EndpointPool([Endpoint(base_url, model, client)] + fallback_endpoints) \
+            if fallback_endpoints else None
 
     @staticmethod
     def clean_none_values(data):
@@ -49,55 +63,159 @@ class ChatLLM:
         else:
             return data
 
+    def _complete(self, on_delta: Optional[Callable[[str], None]] = None, **request):
+        """发起一次对话补全并返回 message，启用缓存时先查缓存，模型返回后写入缓存；每次调用都记入用量统计"""
+        with UsageTracker.track_call(self.role, self.model):
+            if self.cache is None:
+                return self._call_model(on_delta, request)
+
+            cache_key, cached = self.cache.lookup(request)
+            if cached is not None:
+                record_cache_hit()
+                message = ChatCompletionMessage(**cached)
+                visible = (message.content or "").split('</think>')[-1].strip('\n')
+                if visible and on_delta:
+                    on_delta(visible)
+                return message
+
+            message = self._call_model(on_delta, request)
+            self.cache.store(cache_key, message.model_dump(exclude_none=True))
+            return message
+
+    def _call_model(self, on_delta: Optional[Callable[[str], None]], request: Dict[str, Any]):
+        if self.endpoint_pool is None:
+            return call_with_governor(self.base_url, self._request, self.client, on_delta, **request)
+        return self.endpoint_pool.call(lambda endpoint, claim: call_with_governor(
+            endpoint.base_url, self._request, endpoint.client, on_delta, lambda: claim.check(endpoint),
+            **{**request, "model": endpoint.model}))
+
+    def _request(self, client: OpenAI, on_delta: Optional[Callable[[str], None]] = None,
+                 claim: Optional[Callable[[], None]] = None, **request):
+        """调用模型接口；流式模式下边接收边拼装，并将可展示的文本增量回调给 on_delta
+
+        claim: 对冲调用中取得结果归属的回调，其他地址已先应答时抛出 HedgeCancelled
+        """
+        if not self.stream:
+            response = client.chat.completions.create(**request)
+            # 非流式调用返回时生成已经完成，对冲落败的一方只能丢弃结果，无法节省连接和 token
+            if claim:
+                claim()
+            logger.info("LLM chat completions response is %s", response, extra=PAYLOAD)
+            record_usage(response.usage)
+            return response.choices[0].message
+
+        accumulator = StreamAccumulator()
+        # 流式模式下用量在最后一个 chunk 中返回
+        stream = client.chat.completions.create(stream=True, stream_options={"include_usage": True}, **request)
+        for chunk in stream:
+            mark_first_token()
+            if claim:
+                try:
+                    claim()
+                except HedgeCancelled:
+                    stream.close()
+                    raise
+                claim = None
+            visible_delta = accumulator.add(chunk)
+            if visible_delta and on_delta:
+                on_delta(visible_delta)
+        message = accumulator.message()
+        record_usage(accumulator.usage)
+        logger.info("LLM chat completions stream message is %s, finish reason %s", message, accumulator.finish_reason,
+                    extra=PAYLOAD)
+        return message
+
+    @staticmethod
+    def _call_deadline(timeout: Optional[float], deadline: Optional[Deadline]) -> Optional[Deadline]:
+        if deadline is None and timeout is not None:
+            if timeout <= 0:
+                raise DeadlineExceeded("llm call has no time budget left")
+            return Deadline(timeout, "llm call")
+        return deadline
+
+    @staticmethod
+    def _attempt_timeout(deadline: Optional[Deadline]) -> Dict[str, float]:
+        """每次尝试只使用截止时间的剩余时间作为请求超时"""
+        if deadline is None:
+            return {}
+        deadline.check()
+        remaining = deadline.remaining()
+        return {"timeout": remaining} if remaining is not None else {}
+
+    @staticmethod
+    def _retry_delay(deadline: Optional[Deadline], error: Exception, delay: float = 3) -> float:
+        """重试前的等待秒数，不超过截止时间的剩余时间；截止时间已到时不再重试"""
+        if deadline is None:
+            return delay
+        if deadline.expired():
+            raise DeadlineExceeded(f"{deadline.name} expired before retrying llm call") from error
+        remaining = deadline.remaining()
+        return delay if remaining is None else min(delay, remaining)
+
     @time_record
-    def create_with_tools(self, messages: List[Dict[str, Any]], tools: List[Dict]):
+    def create_with_tools(self, messages: List[Dict[str, Any]], tools: List[Dict], timeout: Optional[float] = None,
+                          on_delta: Optional[Callable[[str], None]] = None, deadline: Optional[Deadline] = None):
         """
         Create a chat completion with support for function/tool calls
+
+        timeout: 本次调用（含重试）的超时时间（秒），为空时使用客户端默认值
+        on_delta: 流式模式（stream=True）下接收文本增量的回调，用于向前端实时推送
+        deadline: 步骤的截止时间，每次尝试以其剩余时间作为超时，到期后不再重试
         """
         import time
         import json
         # 清洗提示词，去除None
         messages = ChatLLM.clean_none_values(messages)
+        deadline = self._call_deadline(timeout, deadline)
         max_retries = 2
         for attempt in range(max_retries):
             try:
-                response = self.client.chat.completions.create(
+                message = self._complete(
+                    on_delta,
                     model=self.model,
                     messages=messages,
                     tools=tools,
                     tool_choice="auto",
-                    temperature=self.temperature
+                    temperature=self.temperature,
+                    **self._attempt_timeout(deadline)
                 )
-                logger.info(f"LLM with tools chat completions response is {response}")
                 break
+            except (LLMCacheMiss, DeadlineExceeded):
+                # 回放模式下未命中缓存，重试没有意义；截止时间已到同样不再重试
+                raise
             except Exception as e:
+                if is_overload_error(e):
+                    # 限流已按 Retry-After 重试过，不再叠加固定间隔的重试
+                    raise
                 logger.warning(f"JSON decode error: {e} on attempt {attempt + 1}, retrying...", exc_info=True)
-                if attempt == max_retries:
+                if attempt == max_retries - 1:
                     logger.error(f"Failed to create after {max_retries + 1} attempts.")
                     raise
-                time.sleep(3)  # 增加等待时间，避免频繁重试
+                time.sleep(self._retry_delay(deadline, e))  # 增加等待时间，避免频繁重试
 
         # 去除think标签
-        content = response.choices[0].message.content
+        content = message.content
         if content is not None and '</think>' in content:
-            response.choices[0].message.content = content.split('</think>')[-1].strip('\n')
+            message.content = content.split('</think>')[-1].strip('\n')
 
-        return response.choices[0].message
+        return message
 
     @time_record
-    def chat_to_llm(self, messages: List[Dict[str, Any]]):
+    def chat_to_llm(self, messages: List[Dict[str, Any]], timeout: Optional[float] = None,
+                    on_delta: Optional[Callable[[str], None]] = None):
         # 清洗提示词，去除None
         messages = ChatLLM.clean_none_values(messages)
-        response = self.client.chat.completions.create(
+        message = self._complete(
+            on_delta,
             model=self.model,
             messages=messages,
             temperature=self.temperature,
-            max_tokens=self.max_tokens
+            max_tokens=self.max_tokens,
+            **({"timeout": timeout} if timeout is not None else {})
         )
-        logger.info(f"LLM chat completions response is {response}")
         # 去除think标签
-        content = response.choices[0].message.content
+        content = message.content
         if content is not None and '</think>' in content:
-            response.choices[0].message.content = content.split('</think>')[-1].strip('\n')
+            message.content = content.split('</think>')[-1].strip('\n')
 
-        return response.choices[0].message.content
+        return message.content
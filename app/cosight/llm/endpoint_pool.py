@@ -0,0 +1,350 @@
+# Copyright 2025 ZTE Corporation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import asyncio
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextvars import copy_context
+from threading import Lock
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.common.logger_util import logger
+from app.cosight.task.deadline import DeadlineExceeded
+from config.config import get_hedge_config
+
+# 熔断器状态
+CIRCUIT_CLOSED = "closed"
+CIRCUIT_OPEN = "open"
+CIRCUIT_HALF_OPEN = "half_open"
+# 估算时延分位数至少需要的样本数，不足时使用默认对冲延迟
+_MIN_LATENCY_SAMPLES = 10
+
+_hedge_executor = ThreadPoolExecutor(max_workers=64, thread_name_prefix="llm-hedge")
+
+
+class HedgeCancelled(Exception):
+    r"""Exception raised inside a hedged attempt after another endpoint has answered first"""
+    pass
+
+
+class CircuitBreaker:
+    """服务地址的熔断器：连续失败达到阈值后熔断，冷却时间过后放行一个探测请求，成功则恢复"""
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CIRCUIT_CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_at = 0.0
+        self._lock = Lock()
+
+    def _can_probe_locked(self, now: float) -> bool:
+        if self.state == CIRCUIT_OPEN:
+            return now - self._opened_at >= self.reset_timeout
+        # 半开状态的探测请求迟迟没有结果（例如被放弃）时，超过冷却时间后允许重新探测
+        return self.state == CIRCUIT_HALF_OPEN and now - self._probe_at >= self.reset_timeout
+
+    def available(self) -> bool:
+        """是否可以向该地址发起请求，只做判断，不占用半开状态的探测名额"""
+        with self._lock:
+            return self.state == CIRCUIT_CLOSED or self._can_probe_locked(time.monotonic())
+
+    def try_probe(self) -> bool:
+        """真正向该地址发起请求前调用：熔断冷却结束后只放行一个探测请求，由其结果决定恢复还是继续熔断"""
+        with self._lock:
+            if self.state == CIRCUIT_CLOSED:
+                return True
+            now = time.monotonic()
+            if self._can_probe_locked(now):
+                self.state = CIRCUIT_HALF_OPEN
+                self._probe_at = now
+                return True
+            return False
+
+    def release_probe(self) -> None:
+        """探测请求被放弃（对冲中输给了其他地址）时归还探测名额，下一个请求可以立即探测"""
+        with self._lock:
+            if self.state == CIRCUIT_HALF_OPEN:
+                self.state = CIRCUIT_OPEN
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state != CIRCUIT_CLOSED:
+                logger.info(f"circuit of {self.name} closed")
+            self.state = CIRCUIT_CLOSED
+            self._failures = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self.state == CIRCUIT_HALF_OPEN or self._failures >= self.failure_threshold:
+                if self.state != CIRCUIT_OPEN:
+                    logger.warning(f"circuit of {self.name} opened after {self._failures} failures")
+                self.state = CIRCUIT_OPEN
+                self._opened_at = time.monotonic()
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = Lock()
+
+
+def get_circuit_breaker(base_url: str) -> CircuitBreaker:
+    """同一服务地址在各模型角色间共享熔断状态"""
+    with _breakers_lock:
+        breaker = _breakers.get(base_url)
+        if breaker is None:
+            config = get_hedge_config()
+            breaker = _breakers[base_url] = CircuitBreaker(base_url, config["circuit_failures"],
+                                                           config["circuit_reset"])
+        return breaker
+
+
+class Endpoint:
+    """一个等价的模型服务地址：客户端、模型名与最近的调用时延"""
+
+    def __init__(self, base_url: str, model: str, client: Any, window: int = 100):
+        self.base_url = base_url
+        self.model = model
+        self.client = client
+        self.breaker = get_circuit_breaker(base_url)
+        self._latencies = deque(maxlen=window)
+        self._lock = Lock()
+
+    def record_latency(self, latency: float) -> None:
+        with self._lock:
+            self._latencies.append(latency)
+
+    def latency_percentile(self, percentile: float) -> Optional[float]:
+        with self._lock:
+            if len(self._latencies) < _MIN_LATENCY_SAMPLES:
+                return None
+            latencies = sorted(self._latencies)
+        return latencies[min(len(latencies) - 1, int(len(latencies) * percentile / 100))]
+
+
+class HedgeClaim:
+    """一次对冲调用的结果归属：最先应答的尝试取得归属，其余尝试在下一个检查点放弃"""
+
+    def __init__(self):
+        self._winner: Optional[Endpoint] = None
+        self.claimed_at: Optional[float] = None
+        self._lock = Lock()
+
+    def claim(self, endpoint: Endpoint) -> bool:
+        with self._lock:
+            if self._winner is None:
+                self._winner = endpoint
+                self.claimed_at = time.monotonic()
+            return self._winner is endpoint
+
+    def release(self, endpoint: Endpoint) -> None:
+        """取得归属的尝试随后失败时释放归属，使切换后的地址可以应答"""
+        with self._lock:
+            if self._winner is endpoint:
+                self._winner = None
+                self.claimed_at = None
+
+    def check(self, endpoint: Endpoint) -> None:
+        """已被其他地址取得归属时抛出 HedgeCancelled"""
+        if not self.claim(endpoint):
+            raise HedgeCancelled(f"{endpoint.base_url} lost the hedged race")
+
+
+def _is_endpoint_failure(exc: BaseException) -> bool:
+    # 4xx（除限流外）是请求本身的问题，换地址也不会成功，不计入熔断也不切换；
+    # 超时由步骤截止时间决定（timeout 为剩余时间），同样不切换
+    if isinstance(exc, DeadlineExceeded) or type(exc).__name__ == "APITimeoutError":
+        return False
+    status = getattr(exc, "status_code", None)
+    if status is not None:
+        return status >= 500 or status in (408, 429)
+    return True
+
+
+class EndpointPool:
+    """按顺序排列的一组等价模型服务地址
+
+    主地址超过其历史时延分位数仍未应答时，向下一个地址发送对冲请求，取最先应答的结果并放弃另一个；
+    地址失败时切换到下一个地址，连续失败的地址被熔断，冷却后再探测。
+
+    流式调用在收到首个 chunk 时决出归属，落败的请求随即关闭连接；非流式调用只有在完整响应返回后才能决出归属，
+    同步调用（call）中落败的请求无法提前取消，会一直占用连接并消耗完整的生成 token，对冲的成本相当于多一次完整调用；
+    协程调用（acall）在决出结果后取消落败的请求并关闭其连接。
+    """
+
+    def __init__(self, endpoints: List[Endpoint]):
+        config = get_hedge_config()
+        self.endpoints = endpoints
+        self.percentile = config["percentile"]
+        self.min_delay = config["min_delay"]
+        self.default_delay = config["default_delay"]
+
+    def _ordered(self) -> Tuple[List[Endpoint], bool]:
+        """返回待尝试的地址与是否忽略熔断（全部熔断时）"""
+        # 排序时只判断可用性，探测名额在真正发起请求时才占用，未被调用的地址不会卡在半开状态
+        available = [endpoint for endpoint in self.endpoints if endpoint.breaker.available()]
+        if not available:
+            # 全部熔断时仍按顺序尝试，避免直接拒绝请求
+            logger.warning("all llm endpoints are circuit-broken, try them anyway")
+            return list(self.endpoints), True
+        return available, False
+
+    def hedge_delay(self, endpoint: Endpoint) -> float:
+        latency = endpoint.latency_percentile(self.percentile)
+        return self.default_delay if latency is None else max(self.min_delay, latency)
+
+    def _attempt(self, func: Callable[[Endpoint, HedgeClaim], Any], endpoint: Endpoint, claim: HedgeClaim):
+        start = time.monotonic()
+        try:
+            result = func(endpoint, claim)
+        except HedgeCancelled:
+            endpoint.breaker.release_probe()
+            raise
+        except Exception as e:
+            claim.release(endpoint)
+            if _is_endpoint_failure(e):
+                endpoint.breaker.record_failure()
+            else:
+                endpoint.breaker.release_probe()
+            raise
+        # 流式调用在收到首个 chunk 时取得归属，以应答时延（而非生成总时长）作为对冲依据
+        endpoint.record_latency((claim.claimed_at or time.monotonic()) - start)
+        endpoint.breaker.record_success()
+        return result
+
+    def call(self, func: Callable[[Endpoint, HedgeClaim], Any]):
+        """func(endpoint, claim) 向指定地址发起请求；应答前需调用 claim.check(endpoint) 取得结果归属"""
+        endpoints, force = self._ordered()
+        claim = HedgeClaim()
+        if len(endpoints) == 1:
+            endpoints[0].breaker.try_probe()
+            return self._attempt(func, endpoints[0], claim)
+
+        pending = list(endpoints)
+        futures = {}
+        errors = []
+
+        def submit():
+            endpoint = pending.pop(0)
+            while not endpoint.breaker.try_probe() and not force and pending:
+                # 其他调用正在探测该地址，换下一个地址
+                endpoint = pending.pop(0)
+            # 复制上下文，对冲线程中的调用仍记到当前步骤的用量统计中
+            futures[_hedge_executor.submit(copy_context().run, self._attempt, func, endpoint, claim)] = endpoint
+            return endpoint
+
+        primary = submit()
+        # 下一次对冲的时间，None 表示不再对冲（只等待已发出的请求）
+        hedge_at: Optional[float] = time.monotonic() + self.hedge_delay(primary)
+        while futures:
+            timeout = max(0.0, hedge_at - time.monotonic()) if pending and hedge_at is not None else None
+            done, _ = wait(futures, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                endpoint = submit()
+                logger.info(f"{primary.base_url} slower than its p{self.percentile:.0f} latency, "
+                            f"hedge request to {endpoint.base_url}")
+                hedge_at = None
+                continue
+            for future in done:
+                endpoint = futures.pop(future)
+                try:
+                    return future.result()
+                except HedgeCancelled:
+                    continue
+                except Exception as e:
+                    errors.append(e)
+                    if not _is_endpoint_failure(e) or not pending:
+                        if not futures:
+                            raise
+                        continue
+                    logger.warning(f"llm endpoint {endpoint.base_url} failed: {str(e)}, fail over")
+                    primary = submit()
+                    hedge_at = time.monotonic() + self.hedge_delay(primary)
+        raise errors[-1] if errors else RuntimeError("no llm endpoint answered")
+
+    async def _aattempt(self, func: Callable[[Endpoint, HedgeClaim], Awaitable[Any]], endpoint: Endpoint,
+                        claim: HedgeClaim):
+        start = time.monotonic()
+        try:
+            result = await func(endpoint, claim)
+        except (HedgeCancelled, asyncio.CancelledError):
+            endpoint.breaker.release_probe()
+            raise
+        except Exception as e:
+            claim.release(endpoint)
+            if _is_endpoint_failure(e):
+                endpoint.breaker.record_failure()
+            else:
+                endpoint.breaker.release_probe()
+            raise
+        endpoint.record_latency((claim.claimed_at or time.monotonic()) - start)
+        endpoint.breaker.record_success()
+        return result
+
+    async def acall(self, func: Callable[[Endpoint, HedgeClaim], Awaitable[Any]]):
+        """call 的协程版本，func(endpoint, claim) 返回协程；取得结果后取消其余尝试"""
+        endpoints, force = self._ordered()
+        claim = HedgeClaim()
+        if len(endpoints) == 1:
+            endpoints[0].breaker.try_probe()
+            return await self._aattempt(func, endpoints[0], claim)
+
+        pending = list(endpoints)
+        tasks = {}
+        errors = []
+
+        def submit():
+            endpoint = pending.pop(0)
+            while not endpoint.breaker.try_probe() and not force and pending:
+                endpoint = pending.pop(0)
+            # 任务复制当前上下文，用量仍记到当前步骤名下
+            tasks[asyncio.ensure_future(self._aattempt(func, endpoint, claim))] = endpoint
+            return endpoint
+
+        primary = submit()
+        hedge_at: Optional[float] = time.monotonic() + self.hedge_delay(primary)
+        try:
+            while tasks:
+                timeout = max(0.0, hedge_at - time.monotonic()) if pending and hedge_at is not None else None
+                done, _ = await asyncio.wait(tasks, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    endpoint = submit()
+                    logger.info(f"{primary.base_url} slower than its p{self.percentile:.0f} latency, "
+                                f"hedge request to {endpoint.base_url}")
+                    hedge_at = None
+                    continue
+                for task in done:
+                    endpoint = tasks.pop(task)
+                    try:
+                        return task.result()
+                    except HedgeCancelled:
+                        continue
+                    except Exception as e:
+                        errors.append(e)
+                        if not _is_endpoint_failure(e) or not pending:
+                            if not tasks:
+                                raise
+                            continue
+                        logger.warning(f"llm endpoint {endpoint.base_url} failed: {str(e)}, fail over")
+                        primary = submit()
+                        hedge_at = time.monotonic() + self.hedge_delay(primary)
+            raise errors[-1] if errors else RuntimeError("no llm endpoint answered")
+        finally:
+            # 已有结果、全部失败或调用方被取消（截止时间）时，取消仍在执行的尝试
+            for task in tasks:
+                task.cancel()
@@ -0,0 +1,126 @@
+# Copyright 2025 ZTE Corporation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import asyncio
+import atexit
+import importlib.util
+from threading import Lock
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import aiohttp
+import httpx
+
+from app.common.logger_util import logger
+from config.config import get_http_pool_config
+
+# 进程级连接池注册表：同一个服务地址（scheme + host + port）、代理与 TLS/环境变量设置共用一个客户端，
+# 各模型客户端、多模态工具与深度检索共享长连接，避免每个步骤重复建立 TCP/TLS 连接
+_ClientKey = Tuple[str, Optional[str], bool, bool]
+_clients: Dict[_ClientKey, httpx.Client] = {}
+_async_clients: Dict[_ClientKey, httpx.AsyncClient] = {}
+# aiohttp 会话绑定创建它的事件循环，按事件循环区分
+_sessions: Dict[asyncio.AbstractEventLoop, aiohttp.ClientSession] = {}
+_lock = Lock()
+
+
+def _origin(base_url: str) -> str:
+    parts = urlsplit(base_url or "")
+    return f"{parts.scheme}://{parts.netloc}".lower()
+
+
+def _client_key(base_url: str, proxy: Optional[str], verify: bool, trust_env: bool) -> _ClientKey:
+    return _origin(base_url), proxy or None, verify, trust_env
+
+
+def _httpx_kwargs(proxy: Optional[str], verify: bool, trust_env: bool) -> dict:
+    config = get_http_pool_config()
+    kwargs = {
+        "limits": httpx.Limits(max_connections=config["max_connections"],
+                               max_keepalive_connections=config["max_keepalive_connections"],
+                               keepalive_expiry=config["keepalive_expiry"]),
+        "timeout": httpx.Timeout(config["timeout"], connect=config["connect_timeout"]),
+        # HTTP/2 依赖 h2 包，未安装时使用 HTTP/1.1 长连接
+        "http2": config["http2"] and importlib.util.find_spec("h2") is not None,
+        "verify": verify,
+        "trust_env": trust_env
+    }
+    if proxy:
+        kwargs["proxy"] = proxy
+    return kwargs
+
+
+def get_http_client(base_url: str, proxy: Optional[str] = None, verify: bool = True,
+                    trust_env: bool = True) -> httpx.Client:
+    """获取 base_url 所在服务共享的同步 httpx 客户端（线程安全，可直接传给 OpenAI(http_client=...)）
+
+    verify / trust_env 默认与 httpx、OpenAI 自建的客户端一致：校验证书并读取 HTTP(S)_PROXY 等环境变量
+    """
+    key = _client_key(base_url, proxy, verify, trust_env)
+    with _lock:
+        client = _clients.get(key)
+        if client is None or client.is_closed:
+            kwargs = _httpx_kwargs(proxy, verify, trust_env)
+            client = _clients[key] = httpx.Client(**kwargs)
+            logger.info(f"create pooled http client for {key[0]}, proxy: {proxy}, http2: {kwargs['http2']}")
+        return client
+
+
+def get_async_http_client(base_url: str, proxy: Optional[str] = None, verify: bool = True,
+                          trust_env: bool = True) -> httpx.AsyncClient:
+    """获取 base_url 所在服务共享的异步 httpx 客户端，供主事件循环中的 AsyncOpenAI 使用，参数同 get_http_client"""
+    key = _client_key(base_url, proxy, verify, trust_env)
+    with _lock:
+        client = _async_clients.get(key)
+        if client is None or client.is_closed:
+            client = _async_clients[key] = httpx.AsyncClient(**_httpx_kwargs(proxy, verify, trust_env))
+            logger.info(f"create pooled async http client for {key[0]}, proxy: {proxy}")
+        return client
+
+
+def get_aiohttp_session() -> aiohttp.ClientSession:
+    """获取当前事件循环共享的 aiohttp 会话，需在协程中调用；代理与证书校验（ssl=）按请求传入，因此不区分"""
+    loop = asyncio.get_running_loop()
+    with _lock:
+        # 顺带清理已关闭事件循环遗留的会话
+        for closed_loop in [item for item in _sessions if item.is_closed()]:
+            _sessions.pop(closed_loop, None)
+        session = _sessions.get(loop)
+        if session is None or session.closed:
+            config = get_http_pool_config()
+            connector = aiohttp.TCPConnector(limit=config["max_connections"],
+                                             limit_per_host=config["max_keepalive_connections"],
+                                             keepalive_timeout=config["keepalive_expiry"])
+            session = _sessions[loop] = aiohttp.ClientSession(connector=connector)
+        return session
+
+
+async def close_loop_sessions() -> None:
+    """关闭当前事件循环的 aiohttp 会话，临时事件循环在 close 之前调用"""
+    with _lock:
+        session = _sessions.pop(asyncio.get_running_loop(), None)
+    if session is not None and not session.closed:
+        await session.close()
+
+
+def close_http_clients() -> None:
+    with _lock:
+        clients = list(_clients.values())
+        _clients.clear()
+    for client in clients:
+        client.close()
+
+
+atexit.register(close_http_clients)
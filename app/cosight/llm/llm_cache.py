@@ -0,0 +1,210 @@
+# Copyright 2025 ZTE Corporation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Dict, Optional, Tuple
+
+from app.common.logger_util import logger
+from config.config import get_llm_cache_config
+
+# 缓存模式
+CACHE_OFF = "off"
+CACHE_READ_WRITE = "read_write"  # 命中直接返回，未命中调用模型并写入
+CACHE_RECORD = "record"  # 总是调用模型并覆盖写入，用于录制基准数据
+CACHE_REPLAY = "replay"  # 只读缓存，未命中直接报错，保证回放完全确定
+CACHE_MODES = (CACHE_OFF, CACHE_READ_WRITE, CACHE_RECORD, CACHE_REPLAY)
+
+# 每次运行都会变化的内容（工作区目录、计划 id），计算 key 前替换为占位符，使相同问题的重跑可以命中
+_VOLATILE_PATTERNS = [
+    (re.compile(r"work_space_[\d_]+"), "work_space_<ts>"),
+    (re.compile(r"plan_\d+_[0-9a-f]{8}"), "plan_<id>"),
+]
+
+
+class LLMCacheMiss(KeyError):
+    r"""Exception raised when a request is not found in the cache under replay mode"""
+    pass
+
+
+def _normalize(text: str) -> str:
+    for pattern, placeholder in _VOLATILE_PATTERNS:
+        text = pattern.sub(placeholder, text)
+    return text
+
+
+def make_request_key(request: Dict[str, Any]) -> str:
+    """按模型、温度、消息、工具定义等请求参数的规范化 JSON 计算内容哈希，超时等传输参数不参与"""
+    payload = {k: v for k, v in request.items() if k not in ("timeout", "stream")}
+    canonical = json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(_normalize(canonical).encode("utf-8")).hexdigest()
+
+
+class _SqliteStore:
+    """磁盘缓存，按总大小淘汰最久未访问的条目"""
+
+    def __init__(self, path: str, max_bytes: int):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.max_bytes = max_bytes
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+            "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_accessed ON llm_cache (accessed_at)")
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+        self._lock = Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            return row[0]
+
+    def set(self, key: str, value: str) -> None:
+        size = len(value.encode("utf-8"))
+        now = time.time()
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, value, size, now, now)
+            )
+            self._total_bytes += size - (old[0] if old else 0)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self) -> None:
+        # 按最近访问时间从旧到新删除，直到总大小回落到上限的 90% 以下，避免每次写入都触发淘汰
+        target = self.max_bytes * 0.9
+        evicted = 0
+        for key, size in self._conn.execute("SELECT key, size FROM llm_cache ORDER BY accessed_at").fetchall():
+            if self._total_bytes <= target:
+                break
+            self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            self._total_bytes -= size
+            evicted += 1
+        logger.info(f"llm cache evicted {evicted} entries, {self._total_bytes} bytes left")
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class LLMCache:
+    """大模型响应缓存：内存 LRU + 可选的 sqlite 磁盘存储
+
+    缓存的是序列化后的 message，每次命中都反序列化出新对象，调用方修改返回值不会影响缓存内容。
+    """
+
+    def __init__(self, path: Optional[str] = None, max_bytes: int = 512 * 1024 * 1024, memory_entries: int = 256):
+        self.memory_entries = memory_entries
+        self._memory: "OrderedDict[str, str]" = OrderedDict()
+        self._store = _SqliteStore(path, max_bytes) if path else None
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return value
+        value = self._store.get(key) if self._store else None
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._remember(key, value)
+            return value
+
+    def set(self, key: str, value: str) -> None:
+        with self._lock:
+            self._remember(key, value)
+        if self._store:
+            self._store.set(key, value)
+
+    def _remember(self, key: str, value: str) -> None:
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def metrics(self) -> Dict[str, int]:
+        with self._lock:
+            return {"memory_entries": len(self._memory), "hits": self.hits, "misses": self.misses}
+
+
+class RoleCache:
+    """某个模型角色（plan/act/tool/vision）使用的缓存视图，持有该角色的缓存模式"""
+
+    def __init__(self, cache: LLMCache, role: str, mode: str):
+        self.cache = cache
+        self.role = role
+        self.mode = mode
+
+    def lookup(self, request: Dict[str, Any]) -> Tuple[str, Optional[Dict[str, Any]]]:
+        """返回 (key, 缓存的 message 字典或 None)；replay 模式下未命中抛出 LLMCacheMiss"""
+        key = make_request_key(request)
+        if self.mode == CACHE_RECORD:
+            return key, None
+        value = self.cache.get(key)
+        if value is None:
+            if self.mode == CACHE_REPLAY:
+                raise LLMCacheMiss(f"llm cache miss in replay mode, role: {self.role}, key: {key}")
+            return key, None
+        logger.info(f"llm cache hit, role: {self.role}, key: {key}")
+        return key, json.loads(value)
+
+    def store(self, key: str, message: Dict[str, Any]) -> None:
+        # 空响应（无文本也无工具调用）通常是异常输出，不缓存
+        if not message.get("content") and not message.get("tool_calls"):
+            return
+        self.cache.set(key, json.dumps(message, ensure_ascii=False))
+
+
+_shared_cache: Optional[LLMCache] = None
+_shared_cache_lock = Lock()
+
+
+def get_llm_cache(role: str) -> Optional[RoleCache]:
+    """按配置获取某个模型角色的缓存，未启用时返回 None；各角色共享同一个存储"""
+    global _shared_cache
+    config = get_llm_cache_config()
+    mode = config["mode"]
+    if mode not in CACHE_MODES:
+        logger.warning(f"unknown LLM_CACHE_MODE {mode}, llm cache disabled")
+        return None
+    if mode == CACHE_OFF or role not in config["roles"]:
+        return None
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = LLMCache(config["path"], config["max_bytes"], config["memory_entries"])
+    logger.info(f"llm cache enabled for role {role}, mode: {mode}")
+    return RoleCache(_shared_cache, role, mode)
+
@@ -0,0 +1,360 @@
+# Copyright 2025 ZTE Corporation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import asyncio
+import random
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from email.utils import parsedate_to_datetime
+from threading import Condition, Lock
+from typing import Any, Callable, Dict, Mapping, Optional
+from urllib.parse import urlsplit
+
+from app.common.logger_util import logger
+from app.cosight.llm.usage_tracker import record_retry
+from app.cosight.task.deadline import Deadline, DeadlineExceeded
+from config.config import get_rate_limit_config
+
+# 视为网关过载的状态码：限流与服务暂不可用
+OVERLOAD_STATUS_CODES = (429, 503)
+# 两次乘性减小之间的最小间隔，避免同一批并发请求同时收到 429 时把并发度连续减半
+_DECREASE_COOLDOWN = 2.0
+
+
+def retry_after_seconds(headers: Optional[Mapping[str, str]]) -> Optional[float]:
+    """解析 Retry-After（秒数或 HTTP 日期）与 retry-after-ms 响应头"""
+    if not headers:
+        return None
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return max(0.0, float(retry_after_ms) / 1000)
+        except ValueError:
+            pass
+    retry_after = headers.get("retry-after")
+    if not retry_after:
+        return None
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _status_code(exc: BaseException) -> Optional[int]:
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+    return status
+
+
+def is_overload_error(exc: BaseException) -> bool:
+    """openai.RateLimitError（429）/ InternalServerError（503）等网关过载错误"""
+    return _status_code(exc) in OVERLOAD_STATUS_CODES
+
+
+def _is_server_error(exc: BaseException) -> bool:
+    status = _status_code(exc)
+    return status is not None and status >= 500
+
+
+def _is_connection_error(exc: BaseException) -> bool:
+    # 连接失败可以安全重试；超时（APITimeoutError）由调用方的截止时间控制，不在这里重试
+    return type(exc).__name__ == "APIConnectionError" or _status_code(exc) in (502, 504)
+
+
+class _Slot:
+    """一次请求占用的并发名额，退出时把结果（首 token 时延 / 是否被限流或服务端出错）反馈给调节器"""
+
+    def __init__(self):
+        self.started_at = time.monotonic()
+        self.first_token_at: Optional[float] = None
+        self.overloaded = False
+        self.retry_after: Optional[float] = None
+        self.server_error = False
+        self.failed = False
+
+    def first_token(self) -> None:
+        if self.first_token_at is None:
+            self.first_token_at = time.monotonic()
+
+    def ttft(self) -> Optional[float]:
+        """首 token 时延，非流式调用没有该信号，返回 None"""
+        return None if self.first_token_at is None else self.first_token_at - self.started_at
+
+    def rate_limited(self, retry_after: Optional[float] = None) -> None:
+        self.overloaded = True
+        self.retry_after = retry_after
+
+    def fail(self, server_error: bool = False) -> None:
+        self.failed = True
+        self.server_error = self.server_error or server_error
+
+
+# 当前协程/线程中正在执行的请求名额，流式调用收到首个 chunk 时据此记录首 token 时延
+_current_slot: ContextVar[Optional[_Slot]] = ContextVar("current_governor_slot", default=None)
+
+
+def mark_first_token() -> None:
+    """流式调用收到首个 chunk 时调用，记录所在名额的首 token 时延"""
+    slot = _current_slot.get()
+    if slot is not None:
+        slot.first_token()
+
+
+def _wait_budget(wait: float, deadline: Optional[Deadline], what: str) -> float:
+    """等待不能越过截止时间：剩余时间不足以等到 wait 时抛出 DeadlineExceeded"""
+    remaining = deadline.remaining() if deadline else None
+    if remaining is not None and remaining < wait:
+        raise DeadlineExceeded(f"{deadline.name} would expire while waiting {wait:.1f}s for {what}")
+    return wait
+
+
+def _call_deadline(timeout: Optional[float]) -> Optional[Deadline]:
+    """调用方传入的 timeout 为步骤剩余时间，同时作为排队与重试等待的截止时间"""
+    if timeout is None:
+        return None
+    if timeout <= 0:
+        raise DeadlineExceeded("llm call has no time budget left")
+    return Deadline(timeout, "llm call")
+
+
+class EndpointGovernor:
+    """单个模型服务地址的限流与并发调节器
+
+    - 令牌桶限制请求速率（rate 为 0 表示不限速）
+    - 并发上限按 AIMD 调整：请求成功时每次加 1/limit（约每轮加 1），收到 429/503 时减半，
+      其他 5xx 或流式调用的首 token 时延超过目标值时乘 0.9；两次减小之间有冷却时间。
+      长文本生成的总时长随输出长度增长，不作为拥塞信号
+    - 收到 Retry-After 时，在该时间内暂停该地址的所有新请求；未给出时按连续过载次数指数退避
+    - 排队等待不越过调用方的截止时间，等不到名额时抛出 DeadlineExceeded
+    """
+
+    def __init__(self, name: str, rate: float = 0, burst: Optional[float] = None, max_concurrency: int = 16,
+                 min_concurrency: int = 1, latency_target: float = 30):
+        self.name = name
+        self.rate = rate
+        self.burst = burst or max(1.0, rate)
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.latency_target = latency_target
+        self.limit = float(max_concurrency)
+        self._tokens = self.burst
+        self._refilled_at = time.monotonic()
+        self._in_flight = 0
+        self._blocked_until = 0.0
+        self._last_decrease = 0.0
+        self._overloads = 0
+        self._cond = Condition()
+
+    def _try_acquire_locked(self) -> float:
+        """获取成功返回 0，否则返回建议的等待秒数"""
+        now = time.monotonic()
+        if now < self._blocked_until:
+            return self._blocked_until - now
+        if self._in_flight >= max(self.min_concurrency, int(self.limit)):
+            return 0.1
+        if self.rate > 0:
+            self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+            self._refilled_at = now
+            if self._tokens < 1:
+                return (1 - self._tokens) / self.rate
+            self._tokens -= 1
+        self._in_flight += 1
+        return 0
+
+    def _bounded_wait_locked(self, wait: float, deadline: Optional[Deadline]) -> float:
+        """Retry-After 暂停超过剩余时间时直接放弃；等待并发名额或令牌时最多等到截止时间"""
+        if deadline is None:
+            return wait
+        deadline.check()
+        if self._blocked_until > time.monotonic():
+            _wait_budget(wait, deadline, f"{self.name} Retry-After")
+        remaining = deadline.remaining()
+        return wait if remaining is None else min(wait, remaining)
+
+    def acquire(self, deadline: Optional[Deadline] = None) -> None:
+        with self._cond:
+            while True:
+                wait = self._try_acquire_locked()
+                if not wait:
+                    return
+                self._cond.wait(self._bounded_wait_locked(wait, deadline))
+
+    async def aacquire(self, deadline: Optional[Deadline] = None) -> None:
+        # 线程条件变量不能在事件循环中阻塞等待，这里按建议的等待时间轮询
+        while True:
+            with self._cond:
+                wait = self._try_acquire_locked()
+                if wait:
+                    wait = self._bounded_wait_locked(wait, deadline)
+            if not wait:
+                return
+            await asyncio.sleep(min(wait, 0.5))
+
+    def release(self, slot: _Slot) -> None:
+        ttft = slot.ttft()
+        with self._cond:
+            self._in_flight -= 1
+            now = time.monotonic()
+            if slot.overloaded:
+                self._overloads += 1
+                delay = slot.retry_after
+                if delay is None:
+                    delay = min(30.0, 2 ** (self._overloads - 1)) * (0.5 + random.random() / 2)
+                self._blocked_until = max(self._blocked_until, now + delay)
+                self._decrease(now, 0.5, f"overloaded, pause {delay:.1f}s")
+            elif slot.server_error:
+                self._decrease(now, 0.9, "server error")
+            elif not slot.failed:
+                self._overloads = 0
+                if self.latency_target and ttft is not None and ttft > self.latency_target:
+                    self._decrease(now, 0.9, f"time to first token {ttft:.1f}s above target")
+                else:
+                    self.limit = min(float(self.max_concurrency), self.limit + 1 / max(self.limit, 1.0))
+            self._cond.notify_all()
+
+    def _decrease(self, now: float, factor: float, reason: str) -> None:
+        if now - self._last_decrease < _DECREASE_COOLDOWN:
+            return
+        self._last_decrease = now
+        self.limit = max(float(self.min_concurrency), self.limit * factor)
+        logger.warning(f"endpoint {self.name} {reason}, concurrency limit -> {self.limit:.1f}")
+
+    @staticmethod
+    def _record_error(slot: _Slot, exc: BaseException) -> None:
+        if is_overload_error(exc):
+            slot.rate_limited(retry_after_seconds(getattr(getattr(exc, "response", None), "headers", None)))
+        else:
+            slot.fail(_is_server_error(exc))
+
+    @contextmanager
+    def slot(self, deadline: Optional[Deadline] = None):
+        self.acquire(deadline)
+        slot = _Slot()
+        previous = _current_slot.get()
+        _current_slot.set(slot)
+        try:
+            yield slot
+        except BaseException as e:
+            self._record_error(slot, e)
+            raise
+        finally:
+            _current_slot.set(previous)
+            self.release(slot)
+
+    @asynccontextmanager
+    async def aslot(self, deadline: Optional[Deadline] = None):
+        await self.aacquire(deadline)
+        slot = _Slot()
+        # 恢复原值而不是 reset(token)：异步生成器中退出时可能已不在设置时的上下文
+        previous = _current_slot.get()
+        _current_slot.set(slot)
+        try:
+            yield slot
+        except BaseException as e:
+            self._record_error(slot, e)
+            raise
+        finally:
+            _current_slot.set(previous)
+            self.release(slot)
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._cond:
+            return {"limit": round(self.limit, 2), "in_flight": self._in_flight,
+                    "blocked_for": max(0.0, round(self._blocked_until - time.monotonic(), 2))}
+
+
+_governors: Dict[str, EndpointGovernor] = {}
+_governors_lock = Lock()
+
+
+def get_governor(base_url: str) -> EndpointGovernor:
+    """按服务地址（scheme + host + port）获取进程级共享的调节器"""
+    parts = urlsplit(base_url or "")
+    name = f"{parts.scheme}://{parts.netloc}".lower()
+    with _governors_lock:
+        governor = _governors.get(name)
+        if governor is None:
+            config = get_rate_limit_config()
+            governor = _governors[name] = EndpointGovernor(name, config["rate"], config["burst"],
+                                                           config["max_concurrency"], config["min_concurrency"],
+                                                           config["latency_target"])
+        return governor
+
+
+def _next_attempt(governor: EndpointGovernor, exc: Exception, attempt: int, max_retries: int,
+                  deadline: Optional[Deadline], kwargs: Dict[str, Any]) -> Optional[float]:
+    """判断是否重试，返回重试前的退避秒数；不重试时重新抛出异常，剩余时间不足时抛出 DeadlineExceeded"""
+    retryable = is_overload_error(exc) or (_is_connection_error(exc) and attempt < 2)
+    if not retryable or attempt >= max_retries:
+        raise exc
+    backoff = 0.0 if is_overload_error(exc) else min(8.0, 0.5 * 2 ** (attempt + 1))
+    if deadline:
+        try:
+            deadline.check()
+            _wait_budget(backoff, deadline, f"{governor.name} retry backoff")
+        except DeadlineExceeded as deadline_error:
+            raise deadline_error from exc
+        # 重试请求只使用剩余的时间
+        kwargs["timeout"] = max(0.001, deadline.remaining() - backoff)
+    record_retry()
+    logger.warning(f"call to {governor.name} failed with {type(exc).__name__}, retry {attempt + 1}/{max_retries}")
+    return backoff
+
+
+def call_with_governor(base_url: str, func: Callable, *args, **kwargs):
+    """在调节器控制下调用 func，过载错误按 Retry-After 等待后重试，连接错误退避后重试
+
+    kwargs 中的 timeout（调用方的剩余时间）同时限制排队、Retry-After 暂停与退避等待，不会等过截止时间
+    """
+    governor = get_governor(base_url)
+    max_retries = get_rate_limit_config()["max_retries"]
+    deadline = _call_deadline(kwargs.get("timeout"))
+    attempt = 0
+    while True:
+        try:
+            with governor.slot(deadline):
+                return func(*args, **kwargs)
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            backoff = _next_attempt(governor, e, attempt, max_retries, deadline, kwargs)
+            attempt += 1
+            if backoff:
+                time.sleep(backoff)
+
+
+async def acall_with_governor(base_url: str, func: Callable, *args, **kwargs):
+    """call_with_governor 的协程版本，func 为返回协程的函数，等待期间不阻塞事件循环"""
+    governor = get_governor(base_url)
+    max_retries = get_rate_limit_config()["max_retries"]
+    deadline = _call_deadline(kwargs.get("timeout"))
+    attempt = 0
+    while True:
+        try:
+            async with governor.aslot(deadline):
+                return await func(*args, **kwargs)
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            backoff = _next_attempt(governor, e, attempt, max_retries, deadline, kwargs)
+            attempt += 1
+            if backoff:
+                await asyncio.sleep(backoff)
@@ -0,0 +1,103 @@
+# Copyright 2025 ZTE Corporation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from typing import Any, Dict, List, Optional
+
+from openai.types.chat import ChatCompletionMessage, ChatCompletionMessageToolCall
+from openai.types.chat.chat_completion_message_tool_call import Function
+
+_THINK_START = "<think>"
+_THINK_END = "</think>"
+
+
+class StreamAccumulator:
+    """将流式返回的 chunk 拼装为与非流式调用相同的 ChatCompletionMessage
+
+    文本增量直接拼接；工具调用按 index 归并，id 与 name 取首次出现的值，arguments 逐段拼接。
+    add 返回本次可展示的文本增量（<think> 段落不展示）。
+    """
+
+    def __init__(self):
+        self._content_parts: List[str] = []
+        self._tool_calls: Dict[int, Dict[str, Any]] = {}
+        self.usage = None
+        self.finish_reason: Optional[str] = None
+        # 思考段过滤状态：pending 尚不能判断 / thinking 在 <think> 中 / visible 正常输出
+        self._think_state = "pending"
+        self._pending = ""
+
+    def add(self, chunk) -> str:
+        if getattr(chunk, "usage", None):
+            self.usage = chunk.usage
+        if not chunk.choices:
+            return ""
+        choice = chunk.choices[0]
+        if choice.finish_reason:
+            self.finish_reason = choice.finish_reason
+        delta = choice.delta
+        if delta is None:
+            return ""
+
+        for tool_call in delta.tool_calls or []:
+            entry = self._tool_calls.setdefault(tool_call.index, {"id": None, "name": None, "arguments": []})
+            if tool_call.id and not entry["id"]:
+                entry["id"] = tool_call.id
+            if tool_call.function is not None:
+                if tool_call.function.name and not entry["name"]:
+                    entry["name"] = tool_call.function.name
+                if tool_call.function.arguments:
+                    entry["arguments"].append(tool_call.function.arguments)
+
+        if not delta.content:
+            return ""
+        self._content_parts.append(delta.content)
+        return self._visible_delta(delta.content)
+
+    def _visible_delta(self, text: str) -> str:
+        if self._think_state == "visible":
+            return text
+        self._pending += text
+        if self._think_state == "pending":
+            stripped = self._pending.lstrip()
+            if len(stripped) < len(_THINK_START) and _THINK_START.startswith(stripped):
+                return ""
+            if not stripped.startswith(_THINK_START):
+                self._think_state = "visible"
+                visible, self._pending = self._pending, ""
+                return visible
+            self._think_state = "thinking"
+        if _THINK_END not in self._pending:
+            # 只保留可能构成结束标签的尾部，避免缓存整个思考过程
+            self._pending = self._pending[-len(_THINK_END):]
+            return ""
+        self._think_state = "visible"
+        visible = self._pending.split(_THINK_END, 1)[1].lstrip("\n")
+        self._pending = ""
+        return visible
+
+    @property
+    def content(self) -> str:
+        return "".join(self._content_parts)
+
+    def message(self) -> ChatCompletionMessage:
+        tool_calls = [
+            ChatCompletionMessageToolCall(
+                id=entry["id"] or f"call_{index}",
+                type="function",
+                function=Function(name=entry["name"] or "", arguments="".join(entry["arguments"]))
+            )
+            for index, entry in sorted(self._tool_calls.items())
+        ]
+        return ChatCompletionMessage(role="assistant", content=self.content or None, tool_calls=tool_calls or None)
@@ -0,0 +1,171 @@
+# Copyright 2025 ZTE Corporation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import json
+import os
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from threading import RLock
+from typing import Any, Dict, Optional
+
+from app.common.logger_util import logger
+
+USAGE_FILE_NAME = "usage.json"
+# 工作区元数据目录，与 todolist.WORKSPACE_META_DIR 一致（llm 层不依赖 task 层）
+_WORKSPACE_META_DIR = ".cosight"
+# 内存中保留统计的计划数与每个计划保留的调用明细数
+_MAX_PLANS = 200
+_MAX_CALLS_PER_PLAN = 2000
+
+# 当前调用归属的计划/步骤/智能体，由智能体执行入口设置，随线程池任务与协程传递
+_usage_scope: ContextVar[Dict[str, Any]] = ContextVar("llm_usage_scope", default={})
+# 正在进行的一次模型调用，用于在调用链深处补充 token 用量与重试次数
+_current_call: ContextVar[Optional[Dict[str, Any]]] = ContextVar("llm_current_call", default=None)
+
+
+@contextmanager
+def usage_scope(plan_id: Optional[str] = None, step_index: Optional[int] = None, agent: Optional[str] = None):
+    """在该上下文内发起的模型调用记到指定计划、步骤与智能体名下"""
+    token = _usage_scope.set({"plan_id": plan_id, "step_index": step_index, "agent": agent})
+    try:
+        yield
+    finally:
+        _usage_scope.reset(token)
+
+
+def record_usage(usage) -> None:
+    """记录当前调用的 token 用量（openai 返回的 CompletionUsage）"""
+    call = _current_call.get()
+    if call is None or usage is None:
+        return
+    call["prompt_tokens"] = getattr(usage, "prompt_tokens", 0) or 0
+    call["completion_tokens"] = getattr(usage, "completion_tokens", 0) or 0
+    call["total_tokens"] = getattr(usage, "total_tokens", 0) or call["prompt_tokens"] + call["completion_tokens"]
+
+
+def record_retry() -> None:
+    call = _current_call.get()
+    if call is not None:
+        call["retries"] += 1
+
+
+def record_cache_hit() -> None:
+    call = _current_call.get()
+    if call is not None:
+        call["cached"] = True
+
+
+def _empty_totals() -> Dict[str, Any]:
+    return {"calls": 0, "failed_calls": 0, "cached_calls": 0, "retries": 0, "prompt_tokens": 0,
+            "completion_tokens": 0, "total_tokens": 0, "latency": 0.0}
+
+
+def _accumulate(totals: Dict[str, Any], call: Dict[str, Any]) -> None:
+    totals["calls"] += 1
+    totals["failed_calls"] += 0 if call["ok"] else 1
+    totals["cached_calls"] += 1 if call["cached"] else 0
+    totals["retries"] += call["retries"]
+    for key in ("prompt_tokens", "completion_tokens", "total_tokens"):
+        totals[key] += call[key]
+    totals["latency"] = round(totals["latency"] + call["latency"], 3)
+
+
+class UsageTracker:
+    """模型调用的 token 用量与耗时统计
+
+    每次 ChatLLM 调用记录提示/生成 token、耗时与重试次数，按计划汇总，并按步骤、智能体、模型角色分组；
+    计划结束时写入工作区 .cosight/usage.json，可通过 /deep-research/usage/{plan_id} 查询。
+    """
+    _plans: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+    _lock = RLock()
+
+    @classmethod
+    @contextmanager
+    def track_call(cls, role: Optional[str], model: str):
+        """包住一次模型调用，退出时按当前 usage_scope 记账"""
+        call = {**_usage_scope.get(), "role": role, "model": model, "prompt_tokens": 0, "completion_tokens": 0,
+                "total_tokens": 0, "retries": 0, "cached": False, "ok": True, "started_at": time.time()}
+        token = _current_call.set(call)
+        start = time.monotonic()
+        try:
+            yield call
+        except BaseException:
+            call["ok"] = False
+            raise
+        finally:
+            _current_call.reset(token)
+            call["latency"] = round(time.monotonic() - start, 3)
+            cls.add(call)
+
+    @classmethod
+    def add(cls, call: Dict[str, Any]) -> None:
+        plan_id = call.get("plan_id") or "unassigned"
+        with cls._lock:
+            plan = cls._plans.get(plan_id)
+            if plan is None:
+                plan = cls._plans[plan_id] = {"totals": _empty_totals(), "by_step": {}, "by_agent": {},
+                                              "by_role": {}, "calls": []}
+                while len(cls._plans) > _MAX_PLANS:
+                    cls._plans.popitem(last=False)
+            cls._plans.move_to_end(plan_id)
+            _accumulate(plan["totals"], call)
+            step_key = str(call.get("step_index")) if call.get("step_index") is not None else "plan"
+            for group, key in (("by_step", step_key), ("by_agent", call.get("agent") or "unknown"),
+                               ("by_role", call.get("role") or "unknown")):
+                _accumulate(plan[group].setdefault(key, _empty_totals()), call)
+            plan["calls"].append(call)
+            if len(plan["calls"]) > _MAX_CALLS_PER_PLAN:
+                del plan["calls"][0]
+
+    @classmethod
+    def summary(cls, plan_id: str, include_calls: bool = False) -> Optional[Dict[str, Any]]:
+        with cls._lock:
+            plan = cls._plans.get(plan_id)
+            if plan is None:
+                return None
+            result = json.loads(json.dumps(plan, default=str))
+        if not include_calls:
+            result.pop("calls", None)
+        return {"plan_id": plan_id, **result}
+
+    @classmethod
+    def save(cls, plan_id: str, work_space_path: Optional[str]) -> Optional[str]:
+        """计划结束时将统计写入工作区"""
+        summary = cls.summary(plan_id, include_calls=True)
+        if summary is None or not work_space_path:
+            return None
+        file_path = os.path.join(work_space_path, _WORKSPACE_META_DIR, USAGE_FILE_NAME)
+        try:
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            with open(file_path, "w", encoding="utf-8") as f:
+                json.dump(summary, f, ensure_ascii=False, indent=2)
+            totals = summary["totals"]
+            logger.info(f"plan {plan_id} llm usage: {totals['calls']} calls, {totals['total_tokens']} tokens, "
+                        f"{totals['latency']:.1f}s, saved to {file_path}")
+            return file_path
+        except Exception as e:
+            logger.warning(f"failed to save llm usage of plan {plan_id}: {str(e)}")
+            return None
+
+    @classmethod
+    def load(cls, work_space_path: str) -> Optional[Dict[str, Any]]:
+        file_path = os.path.join(work_space_path, _WORKSPACE_META_DIR, USAGE_FILE_NAME)
+        if not os.path.exists(file_path):
+            return None
+        with open(file_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
@@ -0,0 +1,56 @@
+# Copyright 2025 ZTE Corporation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import time
+from typing import Optional
+
+
+class DeadlineExceeded(TimeoutError):
+    r"""Exception raised when a plan or step runs out of its time budget"""
+    pass
+
+
+class Deadline:
+    """计划/步骤的截止时间，timeout 为空或不大于 0 表示不限时
+
+    计划持有总预算，每个步骤通过 child 得到不超过计划剩余时间的时间片，
+    执行过程中在迭代和工具调用之间检查剩余时间（协作式取消）。
+    """
+
+    def __init__(self, timeout: Optional[float] = None, name: str = "plan"):
+        self.name = name
+        self.timeout = timeout if timeout and timeout > 0 else None
+        self.expires_at: Optional[float] = time.monotonic() + self.timeout if self.timeout else None
+
+    def child(self, timeout: Optional[float] = None, name: str = "step") -> "Deadline":
+        """派生一个不晚于当前截止时间的子截止时间"""
+        deadline = Deadline(timeout, name)
+        if self.expires_at is not None and (deadline.expires_at is None or self.expires_at < deadline.expires_at):
+            deadline.expires_at = self.expires_at
+            deadline.timeout = self.remaining()
+        return deadline
+
+    def remaining(self) -> Optional[float]:
+        """剩余秒数，不限时返回 None"""
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.expires_at is not None and time.monotonic() >= self.expires_at
+
+    def check(self) -> None:
+        if self.expired():
+            raise DeadlineExceeded(f"{self.name} exceeded its time budget of {self.timeout:.0f}s")
@@ -0,0 +1,172 @@
+# Copyright 2025 ZTE Corporation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import asyncio
+import atexit
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from contextvars import copy_context
+from threading import Event, Lock, Thread
+from typing import Any, Coroutine, List, Optional
+
+from app.common.logger_util import logger
+from app.cosight.llm.http_pool import close_loop_sessions
+from config.config import get_loop_runner_config
+
+
+class _LoopThread:
+    """一个常驻后台线程及其上运行的事件循环"""
+
+    def __init__(self, name: str):
+        self.name = name
+        # Windows 上 new_event_loop 默认即为 ProactorEventLoop，支持子进程（MCP stdio）
+        self.loop = asyncio.new_event_loop()
+        self.pending = 0
+        self._started = Event()
+        self.thread = Thread(target=self._run, name=name, daemon=True)
+        self.thread.start()
+        self._started.wait()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.call_soon(self._started.set)
+        self.loop.run_forever()
+
+    def stop(self, timeout: float = 5) -> None:
+        if self.loop.is_closed():
+            return
+        try:
+            # 关闭工具在该循环上创建的共享会话
+            asyncio.run_coroutine_threadsafe(close_loop_sessions(), self.loop).result(timeout)
+        except Exception as e:
+            logger.warning(f"close sessions on {self.name} failed: {str(e)}")
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout)
+
+
+class LoopRunner:
+    """供同步代码执行协程的常驻事件循环
+
+    工具、MCP 调用等同步路径不再为每次调用创建和关闭事件循环，而是把协程提交到固定数量的后台循环上执行，
+    循环上的 aiohttp 会话等异步资源可以跨调用复用。提交时复制调用方的上下文（用量统计归属等），
+    协程按待完成数量最少的循环分配。循环由所有工具共享，只能提交不阻塞的协程：
+    内部调用同步客户端、time.sleep 等阻塞操作的函数应在工具线程中直接同步调用。
+    """
+
+    def __init__(self, num_loops: Optional[int] = None, name: str = "loop-runner"):
+        self.num_loops = max(1, num_loops or get_loop_runner_config()["num_loops"])
+        self.name = name
+        self._loops: List[_LoopThread] = []
+        self._lock = Lock()
+        self._shutdown = False
+
+    def _pick_loop(self) -> _LoopThread:
+        try:
+            # 在某个后台循环内同步等待另一个协程时，不能再把协程提交到该循环上，否则会互相等待
+            current = asyncio.get_running_loop()
+        except RuntimeError:
+            current = None
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError(f"{self.name} has been shut down")
+            candidates = [loop_thread for loop_thread in self._loops if loop_thread.loop is not current]
+            idle = [loop_thread for loop_thread in candidates if loop_thread.pending == 0]
+            if idle:
+                loop_thread = idle[0]
+            elif len(self._loops) < self.num_loops or not candidates:
+                # 按需创建循环线程，直到达到上限
+                loop_thread = _LoopThread(f"{self.name}-{len(self._loops)}")
+                self._loops.append(loop_thread)
+            else:
+                loop_thread = min(candidates, key=lambda item: item.pending)
+            loop_thread.pending += 1
+            return loop_thread
+
+    def _done(self, loop_thread: _LoopThread) -> None:
+        with self._lock:
+            loop_thread.pending -= 1
+
+    def submit(self, coro: Coroutine) -> Future:
+        """提交协程，返回 concurrent.futures.Future"""
+        loop_thread = self._pick_loop()
+        context = copy_context()
+        future = Future()
+        future.add_done_callback(lambda _: self._done(loop_thread))
+
+        def start():
+            if not future.set_running_or_notify_cancel():
+                coro.close()
+                return
+            try:
+                # 在调用方上下文的副本中创建任务，任务内读取到的 ContextVar 与调用方一致
+                task = context.run(loop_thread.loop.create_task, coro)
+            except BaseException as e:
+                future.set_exception(e)
+                return
+            future.task = task
+
+            def on_done(done_task: asyncio.Task):
+                if done_task.cancelled():
+                    future.set_exception(asyncio.CancelledError())
+                elif done_task.exception() is not None:
+                    future.set_exception(done_task.exception())
+                else:
+                    future.set_result(done_task.result())
+
+            task.add_done_callback(on_done)
+
+        loop_thread.loop.call_soon_threadsafe(start)
+        return future
+
+    def run(self, coro: Coroutine, timeout: Optional[float] = None) -> Any:
+        """在后台循环上执行协程并等待结果；超时时取消协程并抛出 TimeoutError"""
+        future = self.submit(coro)
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            task = getattr(future, "task", None)
+            if task is not None:
+                task.get_loop().call_soon_threadsafe(task.cancel)
+            else:
+                future.cancel()
+            raise
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._shutdown:
+                return
+            self._shutdown = True
+            loops = list(self._loops)
+        for loop_thread in loops:
+            loop_thread.stop()
+
+
+_shared_runner: Optional[LoopRunner] = None
+_shared_lock = Lock()
+
+
+def get_loop_runner() -> LoopRunner:
+    """进程级共享的事件循环执行器"""
+    global _shared_runner
+    if _shared_runner is None:
+        with _shared_lock:
+            if _shared_runner is None:
+                _shared_runner = LoopRunner()
+                atexit.register(_shared_runner.shutdown)
+    return _shared_runner
+
+
+def run_coroutine(coro: Coroutine, timeout: Optional[float] = None) -> Any:
+    """在同步代码中执行协程，取代 asyncio.run / new_event_loop + run_until_complete"""
+    return get_loop_runner().run(coro, timeout)
@@ -0,0 +1,93 @@
+# Copyright 2025 ZTE Corporation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import json
+import os
+import time
+from threading import Lock
+from typing import Any, Dict, Optional
+
+from app.cosight.task.todolist import WORKSPACE_META_DIR
+from app.common.logger_util import logger
+
+JOURNAL_FILE_NAME = "plan_journal.jsonl"
+
+
+class PlanJournal:
+    """计划状态的追加式日志
+
+    每次 Plan.update / Plan.mark_step 追加一行 JSON 并立即落盘，进程崩溃后可通过 replay 重建计划状态。
+    记录类型：
+        task:     用户问题与输出格式
+        snapshot: 计划的完整状态（update 之后写入）
+        mark:     单个步骤的状态/备注变化
+        result:   计划最终结果
+    """
+
+    def __init__(self, work_space_path: str):
+        self.file_path = os.path.join(work_space_path, WORKSPACE_META_DIR, JOURNAL_FILE_NAME)
+        self._lock = Lock()
+
+    def exists(self) -> bool:
+        return os.path.exists(self.file_path)
+
+    def append(self, op: str, **data) -> None:
+        line = json.dumps({"op": op, "ts": time.time(), **data}, ensure_ascii=False, default=str)
+        try:
+            with self._lock:
+                os.makedirs(os.path.dirname(self.file_path), exist_ok=True)
+                with open(self.file_path, "a", encoding="utf-8") as f:
+                    f.write(line + "\n")
+                    f.flush()
+                    os.fsync(f.fileno())
+        except Exception as e:
+            logger.error(f"append plan journal failed: {str(e)}", exc_info=True)
+
+    def replay(self) -> Dict[str, Any]:
+        """按顺序回放日志，返回 {"task": {...}, "plan": {...}}，plan 结构与 Plan.to_dict 一致"""
+        task: Dict[str, Any] = {}
+        plan: Optional[Dict[str, Any]] = None
+        if not self.exists():
+            return {"task": task, "plan": plan}
+
+        with open(self.file_path, "r", encoding="utf-8") as f:
+            for line_no, line in enumerate(f, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # 崩溃时最后一行可能只写了一半
+                    logger.warning(f"skip broken plan journal line {line_no} in {self.file_path}")
+                    continue
+
+                op = record.get("op")
+                if op == "task":
+                    task = {"question": record.get("question", ""), "output_format": record.get("output_format", "")}
+                elif op == "snapshot":
+                    plan = record.get("plan")
+                elif op == "mark" and plan is not None:
+                    step_index = record.get("step_index")
+                    if step_index is None or not 0 <= step_index < len(plan["steps"]) \
+                            or plan["steps"][step_index] != record.get("step"):
+                        logger.warning(f"skip mismatched plan journal line {line_no} in {self.file_path}")
+                        continue
+                    for key, field in (("status", "step_statuses"), ("notes", "step_notes"), ("files", "step_files")):
+                        if key in record:
+                            plan[field][step_index] = record[key]
+                elif op == "result" and plan is not None:
+                    plan["result"] = record.get("result", "")
+        return {"task": task, "plan": plan}
@@ -13,8 +13,10 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import time
+import uuid
 from threading import Lock
-from typing import Callable, Dict, List, Any, Optional
+from typing import Callable, Dict, List, Any, Optional, Union
 from concurrent.futures import ThreadPoolExecutor
 
 
@@ -31,10 +33,13 @@ class EventManager:
     def subscribe(self, event_type: str, callback: Callable[[Any], None]):
         """订阅事件"""
         with self._lock:
-            self._subscribers.setdefault(event_type, []).append(callback)
+            callbacks = self._subscribers.setdefault(event_type, [])
+            # 服务端每个请求都会订阅一次，同一回调只保留一份，避免事件被重复处理
+            if callback not in callbacks:
+                callbacks.append(callback)
 
-    def publish(self, event_type: str, plan: Optional[Plan] = None):
-        """发布事件"""
+    def publish(self, event_type: str, plan: Optional[Union[Plan, Dict[str, Any]]] = None):
+        """发布事件，plan 事件的负载为 Plan，plan_stream 事件的负载为文本增量字典"""
         callbacks = []
         with self._lock:
             if event_type in self._subscribers:
@@ -43,7 +48,7 @@ class EventManager:
         for callback in callbacks:
             self._executor.submit(self._safe_callback, callback, plan)
 
-    def _safe_callback(self, callback: Callable, plan: Optional[Plan]):
+    def _safe_callback(self, callback: Callable, plan: Optional[Union[Plan, Dict[str, Any]]]):
         try:
             callback(plan)
         except Exception as e:
@@ -51,3 +56,52 @@ class EventManager:
 
 
 plan_report_event_manager = EventManager()
+
+
+class StreamReporter:
+    """将一次大模型调用的流式文本增量以 plan_stream 事件发布
+
+    首个增量立即发布以缩短首字延迟，之后按 min_interval 合并发布，避免每个 token 触发一次回调。
+    事件回调在线程池中执行、可能乱序，因此负载携带截至当前的完整文本与递增序号 seq，接收方保留 seq 最大的一条。
+    """
+
+    def __init__(self, plan_id: Optional[str], agent: str, step_index: Optional[int] = None,
+                 event_manager: EventManager = None, min_interval: float = 0.1):
+        self.plan_id = plan_id
+        self.agent = agent
+        self.step_index = step_index
+        self.event_manager = event_manager or plan_report_event_manager
+        self.min_interval = min_interval
+        self.call_id = uuid.uuid4().hex
+        self._parts: List[str] = []
+        self._pending = False
+        self._seq = 0
+        self._last_publish = 0.0
+        self._lock = Lock()
+
+    def __call__(self, delta: str) -> None:
+        with self._lock:
+            self._parts.append(delta)
+            self._pending = True
+            if time.time() - self._last_publish < self.min_interval:
+                return
+            self._flush_locked()
+
+    def flush(self) -> None:
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self) -> None:
+        if not self._pending:
+            return
+        self._pending = False
+        self._seq += 1
+        self._last_publish = time.time()
+        self.event_manager.publish("plan_stream", {
+            "plan_id": self.plan_id,
+            "agent": self.agent,
+            "step_index": self.step_index,
+            "call_id": self.call_id,
+            "seq": self._seq,
+            "content": "".join(self._parts)
+        })
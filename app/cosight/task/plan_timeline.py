@@ -0,0 +1,118 @@
+# Copyright 2025 ZTE Corporation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import json
+import os
+import time
+from threading import Lock
+from typing import Any, Dict, List, Optional
+
+from app.cosight.task.todolist import WORKSPACE_META_DIR
+from app.common.logger_util import logger
+
+
+class PlanTimeline:
+    """记录单个计划中各步骤的就绪、开始、结束时间，用于评估调度带来的空闲时间"""
+
+    def __init__(self, plan_id: str, max_concurrency: int):
+        self.plan_id = plan_id
+        self.max_concurrency = max_concurrency
+        self.started_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.steps: Dict[int, Dict[str, Any]] = {}
+        self._lock = Lock()
+
+    def step_ready(self, step_index: int, step: str = "") -> None:
+        """步骤依赖全部结束、首次可被调度的时刻"""
+        with self._lock:
+            self.steps.setdefault(step_index, {"step": step, "ready_at": time.time()})
+
+    def step_started(self, step_index: int) -> None:
+        with self._lock:
+            record = self.steps.setdefault(step_index, {"step": "", "ready_at": time.time()})
+            record["started_at"] = time.time()
+
+    def step_finished(self, step_index: int, step_status: Optional[str] = None) -> None:
+        with self._lock:
+            record = self.steps.setdefault(step_index, {"step": "", "ready_at": time.time()})
+            record["finished_at"] = time.time()
+            record["status"] = step_status
+
+    def finish(self) -> None:
+        self.finished_at = time.time()
+
+    def _durations(self) -> Dict[int, float]:
+        return {index: record["finished_at"] - record["started_at"]
+                for index, record in self.steps.items()
+                if "started_at" in record and "finished_at" in record}
+
+    def _estimate_wave_makespan(self, durations: Dict[int, float], dependencies: Dict[int, List[int]]) -> float:
+        """按旧的批次屏障方式（每批全部结束后再取下一批）估算同样耗时下的总时长"""
+        done = set()
+        makespan = 0.0
+        while len(done) < len(durations):
+            wave = [index for index in sorted(durations) if index not in done and
+                    all(int(dep) in done or int(dep) not in durations for dep in dependencies.get(index, []))]
+            if not wave:
+                break
+            # 批次内按信号量先到先得的方式占用并发槽位
+            slots = [0.0] * max(1, min(self.max_concurrency, len(wave)))
+            for index in wave:
+                slot = slots.index(min(slots))
+                slots[slot] += durations[index]
+            makespan += max(slots)
+            done.update(wave)
+        return makespan
+
+    def summary(self, dependencies: Dict[int, List[int]]) -> Dict[str, Any]:
+        finished_at = self.finished_at or time.time()
+        durations = self._durations()
+        started = [record["started_at"] for record in self.steps.values() if "started_at" in record]
+        finished = [record["finished_at"] for record in self.steps.values() if "finished_at" in record]
+        makespan = (max(finished) - min(started)) if started and finished else 0.0
+        busy_time = sum(durations.values())
+        ready_wait = sum(record["started_at"] - record["ready_at"]
+                         for record in self.steps.values() if "started_at" in record)
+        wave_makespan = self._estimate_wave_makespan(durations, dependencies)
+        return {
+            "plan_id": self.plan_id,
+            "max_concurrency": self.max_concurrency,
+            "total_time": finished_at - self.started_at,
+            "steps_makespan": makespan,
+            "steps_busy_time": busy_time,
+            "ready_wait_time": ready_wait,
+            "idle_slot_time": max(0.0, makespan * self.max_concurrency - busy_time),
+            "wave_barrier_makespan_estimate": wave_makespan,
+            "idle_time_removed": max(0.0, wave_makespan - makespan),
+            "steps": {str(index): {**record, "duration": durations.get(index)}
+                      for index, record in sorted(self.steps.items())},
+        }
+
+    def save(self, work_space_path: str, dependencies: Dict[int, List[int]]) -> Optional[str]:
+        """将时间线写入工作空间的元数据目录，返回文件路径"""
+        summary = self.summary(dependencies)
+        logger.info(f"plan {self.plan_id} timeline: makespan {summary['steps_makespan']:.2f}s, "
+                    f"wave barrier estimate {summary['wave_barrier_makespan_estimate']:.2f}s, "
+                    f"idle time removed {summary['idle_time_removed']:.2f}s")
+        try:
+            meta_dir = os.path.join(work_space_path, WORKSPACE_META_DIR)
+            os.makedirs(meta_dir, exist_ok=True)
+            file_path = os.path.join(meta_dir, "plan_timeline.json")
+            with open(file_path, "w", encoding="utf-8") as f:
+                json.dump(summary, f, ensure_ascii=False, indent=2)
+            return file_path
+        except Exception as e:
+            logger.error(f"save plan timeline failed: {str(e)}", exc_info=True)
+            return None
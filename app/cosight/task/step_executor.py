@@ -0,0 +1,137 @@
+# Copyright 2025 ZTE Corporation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import itertools
+import time
+from concurrent.futures import Future
+from queue import PriorityQueue
+from threading import Lock, Thread
+from typing import Any, Callable, Dict, Optional
+
+from app.common.logger_util import logger
+from config.config import get_step_executor_config
+
+
+class StepExecutor:
+    """常驻的步骤执行线程池
+
+    固定数量的工作线程从有界优先级队列中取任务执行，每个提交的步骤返回一个 Future。
+    队列已满时 submit 会阻塞，对调用方形成背压。
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, queue_size: Optional[int] = None,
+                 name: str = "step-worker"):
+        config = get_step_executor_config()
+        self.max_workers = max_workers or config["max_workers"]
+        self.queue_size = queue_size if queue_size is not None else config["queue_size"]
+        self.name = name
+        self._queue = PriorityQueue(maxsize=self.queue_size)
+        self._seq = itertools.count()
+        self._lock = Lock()
+        self._shutdown = False
+        self._active = 0
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+        self._workers = []
+        for i in range(self.max_workers):
+            worker = Thread(target=self._worker, name=f"{name}-{i}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def submit(self, fn: Callable, *args, priority: float = 0, **kwargs) -> Future:
+        """提交一个步骤任务，priority 越小越先执行，相同优先级按提交顺序执行"""
+        if self._shutdown:
+            raise RuntimeError(f"{self.name} executor has been shut down")
+        future = Future()
+        with self._lock:
+            self._submitted += 1
+        self._queue.put((priority, next(self._seq), time.time(), future, fn, args, kwargs))
+        return future
+
+    def _worker(self):
+        while True:
+            _, _, enqueued_at, future, fn, args, kwargs = self._queue.get()
+            if future is None:
+                # 停止信号
+                break
+            if not future.set_running_or_notify_cancel():
+                continue
+            wait_time = time.time() - enqueued_at
+            with self._lock:
+                self._active += 1
+                self._total_wait += wait_time
+                self._max_wait = max(self._max_wait, wait_time)
+            try:
+                future.set_result(fn(*args, **kwargs))
+                with self._lock:
+                    self._completed += 1
+            except BaseException as e:
+                logger.error(f"{self.name} task failed: {str(e)}", exc_info=True)
+                future.set_exception(e)
+                with self._lock:
+                    self._failed += 1
+            finally:
+                with self._lock:
+                    self._active -= 1
+
+    def metrics(self) -> Dict[str, Any]:
+        """队列深度、活跃线程数和排队等待时间等指标"""
+        with self._lock:
+            started = self._completed + self._failed + self._active
+            return {
+                "name": self.name,
+                "max_workers": self.max_workers,
+                "queue_size": self.queue_size,
+                "queue_depth": self._queue.qsize(),
+                "active": self._active,
+                "submitted": self._submitted,
+                "completed": self._completed,
+                "failed": self._failed,
+                "avg_wait_time": self._total_wait / started if started else 0.0,
+                "max_wait_time": self._max_wait,
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        if self._shutdown:
+            return
+        self._shutdown = True
+        for _ in self._workers:
+            # 停止信号排在所有已提交任务之后
+            self._queue.put((float("inf"), next(self._seq), time.time(), None, None, (), {}))
+        if wait:
+            for worker in self._workers:
+                worker.join()
+
+
+_shared_step_executor: Optional[StepExecutor] = None
+_shared_lock = Lock()
+
+
+def get_shared_step_executor() -> StepExecutor:
+    """进程级共享的步骤执行线程池，供服务端多个计划共用
+
+    线程数为 STEP_SHARED_MAX_WORKERS（全局上限）；每个计划仍只按 STEP_MAX_WORKERS 派发步骤，
+    单个计划不会占满共享线程池
+    """
+    global _shared_step_executor
+    if _shared_step_executor is None:
+        with _shared_lock:
+            if _shared_step_executor is None:
+                _shared_step_executor = StepExecutor(max_workers=get_step_executor_config()["shared_max_workers"],
+                                                     name="shared-step-worker")
+    return _shared_step_executor
@@ -0,0 +1,194 @@
+# Copyright 2025 ZTE Corporation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event, Lock
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from app.common.logger_util import logger
+from app.cosight.task.step_priority import classify_step
+from app.cosight.task.todolist import TERMINAL_STATUSES
+from app.cosight.tool.tool_cache import get_plan_tool_cache, get_tool_result_ttl, is_error_result, make_tool_call_key
+from config.config import get_prefetch_config
+
+# 步骤描述中的指令性词语，提取检索关键词时去掉
+_STOP_WORDS = {
+    "search", "find", "collect", "gather", "research", "look", "up", "use", "using", "query", "retrieve", "get",
+    "the", "a", "an", "of", "and", "or", "for", "about", "on", "in", "to", "with", "from", "by", "via", "related",
+    "relevant", "information", "data", "details", "online", "web", "internet", "latest", "step",
+}
+_CN_STOP_WORDS = ("搜索", "检索", "查找", "查询", "收集", "调研", "使用", "通过", "获取", "关于", "相关的", "相关",
+                  "信息", "资料", "数据", "网络", "互联网", "最新的", "最新", "进行", "并", "的")
+_QUOTED_PATTERN = re.compile(r'[“"《「]([^”"》」]{2,60})[”"》」]')
+_TOKEN_PATTERN = re.compile(r"[\w\u4e00-\u9fff\-\.]+")
+
+
+def extract_search_query(step: str, max_tokens: int = 8, max_length: int = 60) -> str:
+    """从步骤描述中提取检索关键词：优先使用引号/书名号中的内容，否则去掉指令性词语后截断"""
+    quoted = _QUOTED_PATTERN.findall(step or "")
+    if quoted:
+        return " ".join(quoted)[:max_length]
+    text = step or ""
+    for word in _CN_STOP_WORDS:
+        text = text.replace(word, " ")
+    tokens = [token for token in _TOKEN_PATTERN.findall(text) if token.lower() not in _STOP_WORDS]
+    return " ".join(tokens[:max_tokens])[:max_length].strip()
+
+
+class StepPrefetcher:
+    """检索类步骤的推测性预取
+
+    当某个尚未就绪步骤的依赖均已结束或正在执行时，按步骤描述提取关键词，在后台调用
+    search_baidu / tavily_search / fetch_website_content 预热计划内的工具结果缓存（与调度层使用同一个 key），
+    actor 执行该步骤时相同的调用可直接命中缓存。每个计划的预取请求数有上限，计划被更新（Plan.version 变化）时
+    取消尚未开始的预取。
+
+    关键词由步骤描述提取，未必与 actor 实际发出的检索词一致，因此默认关闭；计划结束时记录预取结果的命中率，
+    据此评估是否值得消耗检索配额。
+    """
+
+    def __init__(self, plan, plan_id: Optional[str] = None, max_requests: Optional[int] = None,
+                 workers: Optional[int] = None):
+        config = get_prefetch_config()
+        self.plan = plan
+        self.plan_id = plan_id
+        self.enabled = config["enabled"]
+        self.max_requests = max_requests if max_requests is not None else config["max_requests"]
+        self.workers = workers or config["workers"]
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._futures = []
+        self._prefetched = set()
+        # 写入缓存的预取结果 key，用于统计命中率
+        self._warmed_keys = set()
+        self._requests = 0
+        self._lock = Lock()
+        self._version = plan.version
+        self._cancelled = Event()
+
+    def _candidates(self, running: Iterable[int]) -> List[int]:
+        """依赖尚未全部结束、但都已结束或正在执行的未开始步骤"""
+        running = set(running)
+        candidates = []
+        for step_index, step in enumerate(self.plan.steps):
+            if step_index in self._prefetched or step_index in running \
+                    or self.plan.get_step_status(step_index) != "not_started":
+                continue
+            deps = self.plan.dependencies.get(step_index, [])
+            statuses = [self.plan.get_step_status(dep) for dep in deps]
+            if not deps or all(status in TERMINAL_STATUSES for status in statuses):
+                continue
+            if all(status in TERMINAL_STATUSES or status == "in_progress" or dep in running
+                   for dep, status in zip(deps, statuses)) and classify_step(step) == "research":
+                candidates.append(step_index)
+        return candidates
+
+    def schedule(self, running: Iterable[int] = ()) -> None:
+        """调度器每次派发步骤后调用，为符合条件的步骤提交预取任务"""
+        if not self.enabled:
+            return
+        if self.plan.version != self._version:
+            logger.info("plan updated, cancel speculative prefetch")
+            self.cancel()
+            self._version = self.plan.version
+            self._prefetched.clear()
+
+        for step_index in self._candidates(running):
+            if not self._acquire_budget():
+                logger.info(f"speculative prefetch budget {self.max_requests} used up")
+                return
+            query = extract_search_query(self.plan.steps[step_index])
+            self._prefetched.add(step_index)
+            if not query:
+                self._release_budget()
+                continue
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="step-prefetch")
+            logger.info(f"speculative prefetch for step {step_index}: {query}")
+            self._futures.append(self._executor.submit(self._prefetch, step_index, query, self._cancelled))
+
+    def _acquire_budget(self) -> bool:
+        with self._lock:
+            if self._requests >= self.max_requests:
+                return False
+            self._requests += 1
+            return True
+
+    def _release_budget(self) -> None:
+        with self._lock:
+            self._requests -= 1
+
+    def _prefetch(self, step_index: int, query: str, cancelled: Event) -> None:
+        # 延迟导入，避免调度模块依赖检索工具的第三方包
+        from app.cosight.tool.search_util import search_baidu
+        from app.cosight.tool.scrape_website_toolkit import fetch_website_content
+        from app.cosight.tool.search_toolkit import SearchToolkit
+
+        if cancelled.is_set():
+            return
+        try:
+            if os.environ.get("TAVILY_API_KEY", ""):
+                results = self._warm("tavily_search", SearchToolkit().tavily_search, query=query)
+                items = results.get("results", []) if isinstance(results, dict) else []
+                urls = [item["url"] for item in items if isinstance(item, dict) and item.get("url")]
+                # 检索结果中排名靠前的网页一并抓取
+                for url in urls[:2]:
+                    if cancelled.is_set() or not self._acquire_budget():
+                        return
+                    self._warm("fetch_website_content", fetch_website_content, website_url=url)
+            else:
+                # search_baidu 本身会抓取每条结果的网页内容
+                self._warm("search_baidu", search_baidu, query=query)
+            logger.info(f"speculative prefetch for step {step_index} finished")
+        except Exception as e:
+            logger.warning(f"speculative prefetch for step {step_index} failed: {str(e)}")
+
+    def _warm(self, function_name: str, function: Callable, **arguments) -> Any:
+        """以调度层相同的 key 写入计划内缓存；工具未启用缓存时预取没有意义，直接跳过"""
+        ttl = get_tool_result_ttl(function_name)
+        if ttl is None:
+            return None
+        key = make_tool_call_key(function_name, function, arguments)
+        with self._lock:
+            self._warmed_keys.add(key)
+        return get_plan_tool_cache(self.plan_id).get_or_compute(
+            key, lambda: function(**arguments), lambda result: not is_error_result(result), ttl)
+
+    def cancel(self) -> None:
+        """取消尚未开始的预取，正在执行的请求在下一个请求前停止"""
+        self._cancelled.set()
+        for future in self._futures:
+            future.cancel()
+        self._futures = []
+        self._cancelled = Event()
+
+    def metrics(self) -> Dict[str, Any]:
+        """预取请求数、写入缓存的结果数，以及其中被 actor 调用命中的数量与比例"""
+        cache = get_plan_tool_cache(self.plan_id)
+        with self._lock:
+            keys = list(self._warmed_keys)
+            requests = self._requests
+        used = sum(1 for key in keys if cache.hit_count(key) > 0)
+        return {"requests": requests, "prefetched": len(keys), "used": used,
+                "hit_rate": used / len(keys) if keys else 0.0}
+
+    def stop(self) -> None:
+        self.cancel()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+        if self._warmed_keys:
+            logger.info(f"speculative prefetch metrics: {self.metrics()}")
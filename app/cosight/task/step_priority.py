@@ -0,0 +1,181 @@
+# Copyright 2025 ZTE Corporation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import json
+import os
+from threading import Lock
+from typing import Dict, List, Optional
+
+from app.common.logger_util import logger
+from config.config import get_step_priority_config
+
+# 步骤类别及关键词（按顺序匹配，命中第一个即返回），决定该步骤参考哪一类的历史耗时
+STEP_CATEGORY_KEYWORDS = (
+    ("report", ("report", "summar", "write", "document", "报告", "总结", "汇总", "撰写", "整理")),
+    ("visualization", ("chart", "visual", "plot", "graph", "html", "可视化", "图表", "绘制")),
+    ("code", ("code", "script", "python", "calculat", "compute", "analy", "代码", "脚本", "计算", "分析")),
+    ("research", ("search", "research", "collect", "gather", "browse", "web", "搜索", "检索", "调研", "收集", "查询", "查找")),
+    ("file", ("file", "read", "save", "download", "文件", "读取", "保存", "下载")),
+)
+
+# 没有历史数据时各类步骤的默认耗时（秒）
+DEFAULT_CATEGORY_DURATIONS = {
+    "research": 120.0,
+    "code": 90.0,
+    "visualization": 90.0,
+    "report": 150.0,
+    "file": 30.0,
+    "default": 60.0,
+}
+
+
+def classify_step(step: str) -> str:
+    """根据步骤描述判断步骤类别"""
+    text = (step or "").lower()
+    for category, keywords in STEP_CATEGORY_KEYWORDS:
+        if any(keyword in text for keyword in keywords):
+            return category
+    return "default"
+
+
+class StepDurationHistory:
+    """按步骤类别记录历史耗时（指数滑动平均），可选持久化到 JSON 文件"""
+
+    def __init__(self, history_path: Optional[str] = None, ema_alpha: float = 0.3):
+        self.history_path = history_path
+        self.ema_alpha = ema_alpha
+        self._durations: Dict[str, float] = {}
+        self._counts: Dict[str, int] = {}
+        self._lock = Lock()
+        self._load()
+
+    def _load(self) -> None:
+        if not self.history_path or not os.path.exists(self.history_path):
+            return
+        try:
+            with open(self.history_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            for category, record in data.items():
+                self._durations[category] = float(record["duration"])
+                self._counts[category] = int(record.get("count", 1))
+        except Exception as e:
+            logger.warning(f"load step duration history failed: {str(e)}")
+
+    def _save(self) -> None:
+        if not self.history_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.history_path)), exist_ok=True)
+            temp_path = f"{self.history_path}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump({category: {"duration": duration, "count": self._counts.get(category, 1)}
+                           for category, duration in self._durations.items()}, f, indent=2)
+            os.replace(temp_path, self.history_path)
+        except Exception as e:
+            logger.warning(f"save step duration history failed: {str(e)}")
+
+    def record(self, step: str, duration: float) -> None:
+        """记录一个步骤的实际耗时"""
+        if duration is None or duration < 0:
+            return
+        category = classify_step(step)
+        with self._lock:
+            previous = self._durations.get(category)
+            self._durations[category] = duration if previous is None else \
+                self.ema_alpha * duration + (1 - self.ema_alpha) * previous
+            self._counts[category] = self._counts.get(category, 0) + 1
+            self._save()
+
+    def estimate(self, step: str) -> float:
+        """估计步骤耗时：优先使用该类别的历史平均值，否则使用默认值"""
+        category = classify_step(step)
+        with self._lock:
+            duration = self._durations.get(category)
+        return duration if duration is not None else DEFAULT_CATEGORY_DURATIONS[category]
+
+
+def critical_path_lengths(steps: List[str], dependencies: Dict[int, List[int]],
+                          history: "StepDurationHistory") -> List[float]:
+    """计算每个步骤到计划结束的最长剩余路径（含自身估计耗时）
+
+    remaining[i] = estimate(i) + max(remaining[j] for j 依赖 i)，按逆拓扑序 O(V+E) 计算。
+    """
+    step_count = len(steps)
+    weights = [history.estimate(step) for step in steps]
+    dependents: List[List[int]] = [[] for _ in range(step_count)]
+    in_degree = [0] * step_count
+    for step_index, deps in dependencies.items():
+        if not 0 <= step_index < step_count:
+            continue
+        for dep in deps:
+            if 0 <= dep < step_count and dep != step_index:
+                dependents[dep].append(step_index)
+                in_degree[step_index] += 1
+
+    # Kahn 拓扑排序，再逆序回推
+    order = [i for i in range(step_count) if in_degree[i] == 0]
+    for step_index in order:
+        for dependent in dependents[step_index]:
+            in_degree[dependent] -= 1
+            if in_degree[dependent] == 0:
+                order.append(dependent)
+
+    remaining = list(weights)
+    for step_index in reversed(order):
+        if dependents[step_index]:
+            remaining[step_index] = weights[step_index] + max(remaining[j] for j in dependents[step_index])
+    # 存在环时环上的步骤不在拓扑序中，退化为仅使用自身耗时
+    return remaining
+
+
+class StepPrioritizer:
+    """按关键路径长度为就绪步骤排序，计划结构变化（Plan.version）时重新计算"""
+
+    def __init__(self, plan, history: Optional[StepDurationHistory] = None):
+        self.plan = plan
+        self.history = history or get_step_duration_history()
+        self._version = None
+        self._lengths: List[float] = []
+
+    def lengths(self) -> List[float]:
+        if self._version != self.plan.version or len(self._lengths) != len(self.plan.steps):
+            self._lengths = critical_path_lengths(self.plan.steps, self.plan.dependencies, self.history)
+            self._version = self.plan.version
+            logger.info(f"critical path lengths: {[round(length, 1) for length in self._lengths]}")
+        return self._lengths
+
+    def sort(self, step_indexes: List[int]) -> List[int]:
+        """剩余链路最长的步骤排在最前，长度相同按索引"""
+        lengths = self.lengths()
+        return sorted(step_indexes, key=lambda index: (-lengths[index], index))
+
+    def priority(self, step_index: int) -> float:
+        """提交给 StepExecutor 的优先级，数值越小越先执行"""
+        return -self.lengths()[step_index]
+
+
+_step_duration_history: Optional[StepDurationHistory] = None
+_history_lock = Lock()
+
+
+def get_step_duration_history() -> StepDurationHistory:
+    """进程级共享的步骤耗时历史"""
+    global _step_duration_history
+    if _step_duration_history is None:
+        with _history_lock:
+            if _step_duration_history is None:
+                config = get_step_priority_config()
+                _step_duration_history = StepDurationHistory(config["history_path"], config["ema_alpha"])
+    return _step_duration_history
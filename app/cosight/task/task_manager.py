@@ -13,13 +13,162 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import json
+import os
+import time
+from collections import OrderedDict
+from threading import RLock
+from typing import Any, Dict, Optional
+
+from app.common.logger_util import logger
+from app.cosight.task.todolist import Plan
+from config.config import get_task_manager_config
+
+# 计划生命周期
+PLAN_CREATED = "created"
+PLAN_RUNNING = "running"
+PLAN_FINISHED = "finished"
+PLAN_ARCHIVED = "archived"
+
+
+class PlanNotFoundError(KeyError):
+    r"""Exception raised when a plan id is unknown or its plan has been evicted"""
+    pass
+
+
 class TaskManager:
-    plans = {}
+    """进程内的计划注册表
+
+    计划按 created -> running -> finished 流转，未在执行的计划（已创建未启动或已结束）超过 TTL 即淘汰，
+    内存中的计划数超过上限时再按 LRU 淘汰已结束的计划；配置了落盘目录时，淘汰的计划以 Plan.to_dict 的形式
+    写入磁盘（archived），按需再加载。执行中的计划不会被淘汰。
+    """
+    plans: "OrderedDict[str, Any]" = OrderedDict()
+    states: Dict[str, str] = {}
+    # 未在执行的计划进入当前状态（created/finished）的时间，TTL 从该时间开始计算
+    idle_since: Dict[str, float] = {}
+    _lock = RLock()
 
     @classmethod
     def set_plan(cls, id, plan):
-        cls.plans[id] = plan
+        with cls._lock:
+            cls.plans[id] = plan
+            cls.plans.move_to_end(id)
+            cls.states[id] = PLAN_CREATED
+            cls.idle_since[id] = time.time()
+            cls._evict()
 
     @classmethod
     def get_plan(cls, id):
-        return cls.plans[id]
+        with cls._lock:
+            plan = cls.plans.get(id)
+            if plan is not None:
+                cls.plans.move_to_end(id)
+                return plan
+            plan = cls._load_archived(id)
+            if plan is None:
+                raise PlanNotFoundError(f"plan {id} not found")
+            # 重新加载的计划视为已结束，按 TTL 再次淘汰
+            cls.plans[id] = plan
+            cls.states[id] = PLAN_FINISHED
+            cls.idle_since[id] = time.time()
+            cls._evict()
+            return plan
+
+    @classmethod
+    def get_state(cls, id) -> str:
+        with cls._lock:
+            state = cls.states.get(id)
+            if state is not None:
+                return state
+            archive_path = cls._archive_path(id)
+            if archive_path and os.path.exists(archive_path):
+                return PLAN_ARCHIVED
+            raise PlanNotFoundError(f"plan {id} not found")
+
+    @classmethod
+    def mark_running(cls, id):
+        with cls._lock:
+            if id not in cls.plans:
+                raise PlanNotFoundError(f"plan {id} not found")
+            cls.states[id] = PLAN_RUNNING
+            cls.idle_since.pop(id, None)
+
+    @classmethod
+    def mark_finished(cls, id):
+        with cls._lock:
+            if id not in cls.plans:
+                logger.warning(f"plan {id} finished after being evicted")
+                return
+            cls.states[id] = PLAN_FINISHED
+            cls.idle_since[id] = time.time()
+            cls._evict()
+
+    @classmethod
+    def remove_plan(cls, id):
+        with cls._lock:
+            cls.plans.pop(id, None)
+            cls.states.pop(id, None)
+            cls.idle_since.pop(id, None)
+
+    @classmethod
+    def metrics(cls) -> Dict[str, int]:
+        with cls._lock:
+            counts = {PLAN_CREATED: 0, PLAN_RUNNING: 0, PLAN_FINISHED: 0}
+            for state in cls.states.values():
+                counts[state] = counts.get(state, 0) + 1
+            return {"in_memory": len(cls.plans), **counts}
+
+    @classmethod
+    def _evict(cls):
+        """淘汰超过 TTL 的已创建未启动与已结束计划；内存中的计划数超过上限时，按最近最少使用淘汰已结束的计划"""
+        config = get_task_manager_config()
+        now = time.time()
+        expired = [plan_id for plan_id, idle_since in cls.idle_since.items()
+                   if now - idle_since > config["plan_ttl"]]
+        for plan_id in expired:
+            cls._archive(plan_id)
+
+        overflow = len(cls.plans) - config["max_plans"]
+        if overflow <= 0:
+            return
+        for plan_id in [plan_id for plan_id in cls.plans if cls.states.get(plan_id) == PLAN_FINISHED][:overflow]:
+            cls._archive(plan_id)
+        if len(cls.plans) > config["max_plans"]:
+            logger.warning(f"task manager holds {len(cls.plans)} plans, "
+                           f"exceeding {config['max_plans']} because they are running or waiting to start")
+
+    @classmethod
+    def _archive_path(cls, id) -> Optional[str]:
+        spill_dir = get_task_manager_config()["spill_dir"]
+        return os.path.join(spill_dir, f"{id}.json") if spill_dir else None
+
+    @classmethod
+    def _archive(cls, id):
+        plan = cls.plans.pop(id, None)
+        cls.states.pop(id, None)
+        cls.idle_since.pop(id, None)
+        archive_path = cls._archive_path(id)
+        if plan is None or not archive_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(archive_path), exist_ok=True)
+            with open(archive_path, "w", encoding="utf-8") as f:
+                json.dump({"work_space_path": plan.work_space_path, "plan": plan.to_dict()}, f, ensure_ascii=False)
+        except Exception as e:
+            logger.error(f"archive plan {id} failed: {str(e)}", exc_info=True)
+
+    @classmethod
+    def _load_archived(cls, id):
+        archive_path = cls._archive_path(id)
+        if not archive_path or not os.path.exists(archive_path):
+            return None
+        try:
+            with open(archive_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            plan = Plan(work_space_path=data.get("work_space_path", ""))
+            plan.restore(data["plan"])
+            return plan
+        except Exception as e:
+            logger.error(f"load archived plan {id} failed: {str(e)}", exc_info=True)
+            return None
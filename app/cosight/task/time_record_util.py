@@ -13,6 +13,7 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import inspect
 import time
 from functools import wraps
 from app.common.logger_util import logger
@@ -23,6 +24,18 @@ def time_record(func):
     :param func: 被装饰的函数
     :return: 装饰后的函数
     """
+    if inspect.iscoroutinefunction(func):
+        @wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            start_time = time.time()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                elapsed_time = time.time() - start_time
+                current_time = time.strftime("%H:%M:%S", time.localtime())
+                logger.info(f"[{current_time}] Function '{func.__name__}' called with args: {kwargs.get('function_name','') or kwargs.get('step_index','')}: executed in {elapsed_time:.4f} seconds")
+        return async_wrapper
+
     @wraps(func)
     def wrapper(*args, **kwargs):
         start_time = time.time()
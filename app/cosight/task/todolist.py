@@ -14,62 +14,268 @@
 #    under the License.
 
 import re
-from typing import List, Optional, Dict, Tuple
+from queue import Queue
+from threading import RLock
+from typing import Any, List, Optional, Dict, Tuple
 import os
 import platform
 from pathlib import PureWindowsPath, PurePosixPath
 
 from app.common.logger_util import logger
+from app.cosight.task.workspace_index import WorkspaceFileIndex
 
+# 工作空间内的内部元数据目录（时间线等），不作为步骤产出文件上报
+WORKSPACE_META_DIR = ".cosight"
+# 终态：依赖步骤进入终态后，后继步骤即可调度
+TERMINAL_STATUSES = ("completed", "blocked")
+
+class _StepRecord:
+    """单个步骤的状态记录，按步骤索引存放，相同内容的步骤互不影响"""
+    __slots__ = ("text", "status", "notes", "details", "files")
+
+    def __init__(self, text: str, status: str = "not_started", notes: str = "", details: str = "", files=""):
+        self.text = text
+        self.status = status
+        self.notes = notes
+        self.details = details
+        self.files = files
 
-# 在文件开头添加全局字典
-folder_files_map: Dict[str, List[str]] = {}
-subfolder_files_map: Dict[str, List[str]] = {}
 
 class Plan:
-    """Represents a single plan with steps, statuses, and execution details as a DAG."""
+    """Represents a single plan with steps, statuses, and execution details as a DAG.
+
+    步骤按索引存储，并维护每个步骤未结束依赖的计数（入度），就绪集合在 mark_step/update 时增量更新。
+    """
 
     def __init__(self, title: str = "", steps: List[str] = None, dependencies: Dict[int, List[int]] = None, work_space_path: str = ""):
         self.title = title
-        self.steps = steps if steps else []
-        # 使用步骤内容（中文）作为key存储状态、备注和详细信息
-        self.step_statuses = {step: "not_started" for step in self.steps}
-        self.step_notes = {step: "" for step in self.steps}
-        self.step_details = {step: "" for step in self.steps}
-        self.step_files = {step: "" for step in self.steps}
+        self._lock = RLock()
+        self._records: List[_StepRecord] = [_StepRecord(step) for step in (steps or [])]
+        self._steps: List[str] = [record.text for record in self._records]
         # 使用邻接表表示依赖关系
         if dependencies:
-            self.dependencies = dependencies
+            self._dependencies = {int(k): [int(dep) for dep in v] for k, v in dependencies.items()}
         else:
-            self.dependencies = {i: [i - 1] for i in range(1, len(self.steps))} if len(self.steps) > 1 else {}
+            self._dependencies = {i: [i - 1] for i in range(1, len(self._steps))} if len(self._steps) > 1 else {}
+        self._dependents: List[List[int]] = []
+        self._pending_deps: List[int] = []
+        self._ready: set = set()
+        self._status_counts: Dict[str, int] = {}
+        self._rebuild_index()
+        # 计划结构（步骤/依赖）的版本号，每次 update 递增
+        self.version = 0
         self.result = ""
         self.work_space_path = work_space_path if work_space_path else os.environ.get("WORKSPACE_PATH") or os.getcwd()
+        # 步骤进入终态时向订阅队列投递 (step_index, step_status)，供调度器实时感知
+        self._completion_queues: List[Queue] = []
+        # 可选的追加式日志（PlanJournal），用于崩溃后恢复
+        self.journal = None
+        # 工作空间增量文件索引，用于识别每次 mark_step 之后新增的文件，计划结束后释放
+        self._file_index: Optional[WorkspaceFileIndex] = None
+        # 计划截止后仍未退出的步骤，其后续的 mark_step 被忽略，避免覆盖已上报的状态和日志
+        self._frozen_steps: set = set()
+
+    def _rebuild_index(self) -> None:
+        """根据当前步骤和依赖重建后继表、未结束依赖计数和就绪集合，O(V+E)"""
+        step_count = len(self._records)
+        self._dependents = [[] for _ in range(step_count)]
+        self._pending_deps = [0] * step_count
+        valid_dependencies = {}
+        for step_index, deps in self._dependencies.items():
+            if not 0 <= step_index < step_count:
+                logger.warning(f"ignore dependencies of invalid step {step_index}")
+                continue
+            valid_deps = []
+            for dep in deps:
+                if not 0 <= dep < step_count or dep == step_index:
+                    logger.warning(f"ignore invalid dependency {dep} of step {step_index}")
+                    continue
+                valid_deps.append(dep)
+                self._dependents[dep].append(step_index)
+                if self._records[dep].status not in TERMINAL_STATUSES:
+                    self._pending_deps[step_index] += 1
+            valid_dependencies[step_index] = valid_deps
+        self._dependencies = valid_dependencies
+        self._ready = {i for i, record in enumerate(self._records)
+                       if record.status == "not_started" and self._pending_deps[i] == 0}
+        self._status_counts = {}
+        for record in self._records:
+            self._status_counts[record.status] = self._status_counts.get(record.status, 0) + 1
+
+    def _set_status(self, step_index: int, step_status: str) -> None:
+        """更新步骤状态，并增量维护后继步骤的未结束依赖计数与就绪集合"""
+        record = self._records[step_index]
+        old_status = record.status
+        if old_status == step_status:
+            return
+        record.status = step_status
+        self._status_counts[old_status] = self._status_counts.get(old_status, 0) - 1
+        self._status_counts[step_status] = self._status_counts.get(step_status, 0) + 1
+
+        if step_status == "not_started" and self._pending_deps[step_index] == 0:
+            self._ready.add(step_index)
+        else:
+            self._ready.discard(step_index)
+
+        was_terminal = old_status in TERMINAL_STATUSES
+        is_terminal = step_status in TERMINAL_STATUSES
+        if was_terminal == is_terminal:
+            return
+        delta = -1 if is_terminal else 1
+        for dependent in self._dependents[step_index]:
+            self._pending_deps[dependent] += delta
+            if self._pending_deps[dependent] == 0 and self._records[dependent].status == "not_started":
+                self._ready.add(dependent)
+            else:
+                self._ready.discard(dependent)
+
+    @property
+    def steps(self) -> List[str]:
+        return self._steps
+
+    @property
+    def dependencies(self) -> Dict[int, List[int]]:
+        return self._dependencies
+
+    # 以下按步骤内容为key的字典仅用于展示和序列化（兼容前端），内容相同的步骤以后者为准
+    @property
+    def step_statuses(self) -> Dict[str, str]:
+        return {record.text: record.status for record in self._records}
+
+    @property
+    def step_notes(self) -> Dict[str, str]:
+        return {record.text: record.notes for record in self._records}
+
+    @property
+    def step_details(self) -> Dict[str, str]:
+        return {record.text: record.details for record in self._records}
+
+    @property
+    def step_files(self) -> Dict[str, Any]:
+        return {record.text: record.files for record in self._records}
+
+    def get_step_status(self, step_index: int) -> str:
+        return self._records[step_index].status
+
+    def get_step_notes(self, step_index: int) -> str:
+        return self._records[step_index].notes
+
+    def get_file_index(self) -> WorkspaceFileIndex:
+        """获取当前工作空间的文件索引，工作空间变化时重新创建"""
+        with self._lock:
+            if self._file_index is None or self._file_index.workspace_path != self.work_space_path:
+                self._file_index = WorkspaceFileIndex(self.work_space_path,
+                                                      get_last_folder_name(self.work_space_path),
+                                                      exclude_dirs=(WORKSPACE_META_DIR,))
+            return self._file_index
+
+    def release_file_index(self) -> None:
+        """计划执行结束后释放文件索引"""
+        with self._lock:
+            if self._file_index is not None:
+                self._file_index.release()
+                self._file_index = None
+
+    def attach_journal(self, journal) -> None:
+        """挂载计划日志，此后每次 update/mark_step 都会追加记录"""
+        self.journal = journal
+
+    def to_dict(self) -> Dict[str, Any]:
+        """按步骤索引导出计划状态"""
+        with self._lock:
+            return {
+                "title": self.title,
+                "steps": list(self._steps),
+                "step_statuses": [record.status for record in self._records],
+                "step_notes": [record.notes for record in self._records],
+                "step_details": [record.details for record in self._records],
+                "step_files": [record.files for record in self._records],
+                "dependencies": {str(k): v for k, v in self._dependencies.items()},
+                "result": self.result
+            }
+
+    def restore(self, state: Dict[str, Any]) -> None:
+        """用 to_dict 导出的状态原地恢复计划，持有该计划引用的智能体不受影响"""
+        with self._lock:
+            self.title = state.get("title", "")
+            steps = list(state.get("steps", []))
+            statuses = state.get("step_statuses", [])
+            notes = state.get("step_notes", [])
+            details = state.get("step_details", [])
+            files = state.get("step_files", [])
+            self._records = [_StepRecord(step,
+                                         statuses[i] if i < len(statuses) else "not_started",
+                                         notes[i] if i < len(notes) else "",
+                                         details[i] if i < len(details) else "",
+                                         files[i] if i < len(files) else "")
+                             for i, step in enumerate(steps)]
+            self._steps = steps
+            self._dependencies = {int(k): [int(dep) for dep in v] for k, v in state.get("dependencies", {}).items()}
+            self._rebuild_index()
+            self.result = state.get("result", "")
+            self._frozen_steps.clear()
+            self.version += 1
+
+    def reset_unfinished_steps(self) -> List[int]:
+        """将未完成（执行中或受阻）的步骤重置为未开始，返回被重置的步骤索引"""
+        with self._lock:
+            reset_steps = []
+            for step_index, record in enumerate(self._records):
+                if record.status not in ("completed", "not_started"):
+                    self._set_status(step_index, "not_started")
+                    record.notes = ""
+                    record.files = ""
+                    reset_steps.append(step_index)
+        if reset_steps and self.journal:
+            self.journal.append("snapshot", plan=self.to_dict())
+        return reset_steps
+
+    def block_unfinished_steps(self, step_notes: str) -> List[int]:
+        """将所有未结束的步骤标记为受阻（如计划超时），返回被标记的步骤索引"""
+        with self._lock:
+            unfinished_steps = [step_index for step_index, record in enumerate(self._records)
+                                if record.status not in TERMINAL_STATUSES]
+        for step_index in unfinished_steps:
+            # 由调度器在计划结束时调用，对已冻结的步骤同样生效
+            self._mark_step(step_index, "blocked", step_notes)
+        return unfinished_steps
+
+    def freeze_steps(self, step_indices: List[int]) -> None:
+        """冻结步骤：计划结束后仍在执行的步骤不能再修改步骤状态、备注和计划日志"""
+        with self._lock:
+            self._frozen_steps.update(step_indices)
+
+    def subscribe_completion(self, queue: Queue) -> None:
+        """订阅步骤完成事件，步骤被标记为终态时会向队列投递 (step_index, step_status)"""
+        self._completion_queues.append(queue)
+
+    def unsubscribe_completion(self, queue: Queue) -> None:
+        """取消订阅步骤完成事件"""
+        if queue in self._completion_queues:
+            self._completion_queues.remove(queue)
 
     def set_plan_result(self, plan_result):
         self.result = plan_result
+        if self.journal:
+            self.journal.append("result", result=plan_result)
 
     def get_plan_result(self):
         return self.result
 
     def get_ready_steps(self) -> List[int]:
-        """获取所有前置依赖都已完成的步骤索引
+        """获取所有前置依赖都已结束（completed/blocked）的步骤索引
 
         返回:
             List[int]: 可立即执行的步骤索引列表（返回所有符合条件的步骤）
         """
-        logger.info(f"get_ready_steps dependencies: {self.dependencies}")
-        ready_steps = []
-        for step_index in range(len(self.steps)):
-            # 获取该步骤的所有依赖
-            dependencies = self.dependencies.get(step_index, [])
+        with self._lock:
+            return sorted(self._ready)
 
-            # 检查所有依赖是否都已完成
-            if all(self.step_statuses.get(self.steps[int(dep)]) != "not_started" for dep in dependencies):
-                # 检查步骤本身是否未开始
-                if self.step_statuses.get(self.steps[step_index]) == "not_started":
-                    ready_steps.append(step_index)
+    def is_step_ready(self, step_index: int) -> bool:
+        return step_index in self._ready
 
-        return ready_steps
+    def has_ready_steps(self) -> bool:
+        return bool(self._ready)
 
     def update(self, title: Optional[str] = None, steps: Optional[List[str]] = None,
                dependencies: Optional[Dict[int, List[int]]] = None) -> None:
@@ -79,46 +285,35 @@ class Plan:
         if type(steps) == str:
             tmep_str = str(steps)
             steps = tmep_str.split("\n")
-        if steps:
-            # Preserve all existing steps and their statuses
-            new_steps = []
-            new_statuses = {}
-            new_notes = {}
-            new_details = {}
-
-            # First, process all steps in the input order
-            for step in steps:
-                # If step exists in current steps and is started, preserve it
-                if step in self.steps and self.step_statuses.get(step) != "not_started":
-                    new_steps.append(step)
-                    new_statuses[step] = self.step_statuses.get(step)
-                    new_notes[step] = self.step_notes.get(step)
-                    new_details[step] = self.step_details.get(step)
-                # If step exists in current steps and is not started, preserve as not_started
-                elif step in self.steps:
-                    new_steps.append(step)
-                    new_statuses[step] = "not_started"
-                    new_notes[step] = self.step_notes.get(step)
-                    new_details[step] = self.step_details.get(step)
-                # If step is new, add as not_started
-                else:
-                    new_steps.append(step)
-                    new_statuses[step] = "not_started"
-                    new_notes[step] = ""
-                    new_details[step] = ""
-
-            self.steps = new_steps
-            self.step_statuses = new_statuses
-            self.step_notes = new_notes
-            self.step_details = new_details
-        logger.info(f"before update dependencies: {self.dependencies}")
-        if dependencies:
-            self.dependencies.clear()
-            dependencies = {int(k): v for k, v in dependencies.items()}
-            self.dependencies.update(dependencies)
-        else:
-            self.dependencies = {i: [i - 1] for i in range(1, len(steps))} if len(steps) > 1 else {}
-        logger.info(f"after update dependencies: {self.dependencies}")
+        with self._lock:
+            if steps:
+                # 按内容匹配已有步骤（相同内容按出现顺序一一对应），保留已开始步骤的状态与备注
+                old_records: Dict[str, List[_StepRecord]] = {}
+                for record in self._records:
+                    old_records.setdefault(record.text, []).append(record)
+                new_records = []
+                for step in steps:
+                    candidates = old_records.get(step)
+                    old = candidates.pop(0) if candidates else None
+                    if old is None:
+                        new_records.append(_StepRecord(step))
+                    elif old.status != "not_started":
+                        new_records.append(_StepRecord(step, old.status, old.notes, old.details, old.files))
+                    else:
+                        new_records.append(_StepRecord(step, "not_started", old.notes, old.details, old.files))
+                self._records = new_records
+                self._steps = [record.text for record in new_records]
+            logger.info(f"before update dependencies: {self._dependencies}")
+            if dependencies:
+                self._dependencies = {int(k): [int(dep) for dep in v] for k, v in dependencies.items()}
+            else:
+                step_count = len(self._steps)
+                self._dependencies = {i: [i - 1] for i in range(1, step_count)} if step_count > 1 else {}
+            self._rebuild_index()
+            self.version += 1
+            logger.info(f"after update dependencies: {self._dependencies}")
+        if self.journal:
+            self.journal.append("snapshot", plan=self.to_dict())
 
     def mark_step(self, step_index: int, step_status: Optional[str] = None, step_notes: Optional[str] = None) -> None:
         """Mark a single step with specific statuses, notes, and details.
@@ -129,36 +324,60 @@ class Plan:
             step_notes (Optional[str]): Notes for the step
         """
         # Validate step index
-        if step_index < 0 or step_index >= len(self.steps):
-            raise ValueError(f"Invalid step_index: {step_index}. Valid indices range from 0 to {len(self.steps) - 1}.")
+        if step_index < 0 or step_index >= len(self._records):
+            raise ValueError(f"Invalid step_index: {step_index}. Valid indices range from 0 to {len(self._records) - 1}.")
         logger.info(f"step_index: {step_index}, step_status is {step_status},step_notes is {step_notes}")
-        step = self.steps[step_index]
-
-        # Update step status
-        if step_status is not None:
-            self.step_statuses[step] = step_status
-
-        # Update step notes
+        if step_index in self._frozen_steps:
+            logger.warning(f"ignore mark of step {step_index}, the step was frozen after the plan finished")
+            return
+        self._mark_step(step_index, step_status, step_notes)
+
+    def _mark_step(self, step_index: int, step_status: Optional[str], step_notes: Optional[str]) -> None:
+        """更新步骤状态与备注、追加计划日志并通知调度器，不检查步骤是否已冻结"""
+        file_path_info = None
         if step_notes is not None:
-            step_notes, file_path_info = process_text_with_workspace(step_notes, self.work_space_path)
-            self.step_notes[step] = step_notes
-            self.step_files[step] = file_path_info
+            step_notes, file_path_info = process_text_with_workspace(step_notes, self.work_space_path,
+                                                                       self.get_file_index())
+
+        with self._lock:
+            record = self._records[step_index]
+            # Update step status
+            if step_status is not None:
+                self._set_status(step_index, step_status)
+
+            # Update step notes
+            if step_notes is not None:
+                record.notes = step_notes
+                record.files = file_path_info
+
+        if self.journal:
+            journal_record = {"step_index": step_index, "step": record.text}
+            if step_status is not None:
+                journal_record["status"] = step_status
+            if step_notes is not None:
+                journal_record["notes"] = step_notes
+                journal_record["files"] = file_path_info
+            self.journal.append("mark", **journal_record)
+
+        # Notify scheduler once the step reaches a terminal status
+        if step_status in TERMINAL_STATUSES:
+            for queue in list(self._completion_queues):
+                queue.put((step_index, step_status))
 
         # Validate status if marking as completed
         if step_status == "completed":
             # Check if all dependencies are completed
-            if not all(self.step_statuses[self.steps[int(dep)]] == "completed" for dep in
-                       self.dependencies.get(step_index, [])):
+            if not all(self._records[dep].status == "completed" for dep in self._dependencies.get(step_index, [])):
                 raise ValueError(f"Cannot complete step {step_index} before its dependencies are completed")
 
     def get_progress(self) -> Dict[str, int]:
         """Get progress statistics of the plan."""
         return {
-            "total": len(self.steps),
-            "completed": sum(1 for status in self.step_statuses.values() if status == "completed"),
-            "in_progress": sum(1 for status in self.step_statuses.values() if status == "in_progress"),
-            "blocked": sum(1 for status in self.step_statuses.values() if status == "blocked"),
-            "not_started": sum(1 for status in self.step_statuses.values() if status == "not_started")
+            "total": len(self._records),
+            "completed": self._status_counts.get("completed", 0),
+            "in_progress": self._status_counts.get("in_progress", 0),
+            "blocked": self._status_counts.get("blocked", 0),
+            "not_started": self._status_counts.get("not_started", 0)
         }
 
     def format(self, with_detail: bool = False) -> str:
@@ -178,30 +397,30 @@ class Plan:
         output += f"{progress['blocked']} blocked, {progress['not_started']} not started\n\n"
         output += "Steps:\n"
 
-        for i, step in enumerate(self.steps):
+        for i, record in enumerate(self._records):
             status_symbol = {
                 "not_started": "[ ]",
                 "in_progress": "[→]",
                 "completed": "[✓]",
                 "blocked": "[!]",
-            }.get(self.step_statuses.get(step), "[ ]")
+            }.get(record.status, "[ ]")
 
             # 显示依赖关系
-            deps = self.dependencies.get(i, [])
+            deps = self._dependencies.get(i, [])
             dep_str = f" (depends on: {', '.join(map(str, deps))})" if deps else ""
-            output += f"Step{i} :{status_symbol} {step}{dep_str}\n"
-            if self.step_notes.get(step):
-                output += f"   Notes: {self.step_notes.get(step)}\nDetails: {self.step_details.get(step)}\n" if with_detail else f"   Notes: {self.step_notes.get(step)}\n"
+            output += f"Step{i} :{status_symbol} {record.text}{dep_str}\n"
+            if record.notes:
+                output += f"   Notes: {record.notes}\nDetails: {record.details}\n" if with_detail else f"   Notes: {record.notes}\n"
 
         return output
 
     def has_blocked_steps(self) -> bool:
         """Check if there are any blocked steps in the plan.
-        
+
         Returns:
             bool: True if any step is blocked, False otherwise
         """
-        return any(status == "blocked" for status in self.step_statuses.values())
+        return self._status_counts.get("blocked", 0) > 0
 
 
 def get_last_folder_name(workspace_path: str) -> str:
@@ -218,7 +437,8 @@ def get_last_folder_name(workspace_path: str) -> str:
     return path_obj.name
 
 
-def extract_and_replace_paths(text: str, folder_name: str, workspace_path: str) -> Tuple[str, List[Dict[str, str]]]:
+def extract_and_replace_paths(text: str, folder_name: str, workspace_path: str,
+                              file_index: Optional[WorkspaceFileIndex] = None) -> Tuple[str, List[Dict[str, str]]]:
     # 支持的文件扩展名
     valid_extensions = r"(txt|md|pdf|docx|xlsx|csv|json|xml|html|png|jpg|jpeg|svg|py)"
 
@@ -229,88 +449,37 @@ def extract_and_replace_paths(text: str, folder_name: str, workspace_path: str)
     # ✅ 中文书名号引用的文件名（不区分平台）
     quoted_file_pattern = rf'《([^《》\s]+?\.{valid_extensions})》'
 
-    result_list: List[Dict[str, str]] = []
-
-    # 初始化该文件夹的文件列表（如果不存在）
-    if folder_name not in folder_files_map:
-        folder_files_map[folder_name] = []
-
     def replace_path_file(match):
         full_path = match.group(1)
         filename = os.path.basename(full_path.replace("\\", "/"))  # 把反斜杠变成斜杠后再提取
-        new_path = f"{folder_name}/{filename}"
-
-        # 如果文件名不在该文件夹的列表中，则添加
-        # if filename not in folder_files_map[folder_name]:
-        #     folder_files_map[folder_name].append(filename)
-        #     result_list.append({
-        #         "name": filename,
-        #         "path": new_path
-        #     })
-        return new_path
+        return f"{folder_name}/{filename}"
 
     def replace_quoted_file(match):
         filename = match.group(1)
-        new_path = f"{folder_name}/{filename}"
-
-        # 如果文件名不在该文件夹的列表中，则添加
-        # if filename not in folder_files_map[folder_name]:
-        #     folder_files_map[folder_name].append(filename)
-        #     result_list.append({
-        #         "name": filename,
-        #         "path": new_path
-        #     })
-        return new_path
+        return f"{folder_name}/{filename}"
 
     new_text = re.sub(path_file_pattern, replace_path_file, text)
     new_text = re.sub(quoted_file_pattern, replace_quoted_file, new_text)
 
     workspace_path = workspace_path if workspace_path else os.environ.get("WORKSPACE_PATH")
     logger.info(f"extract and replace paths >>>>>>>>>>>>>>>>>>>>>>>>>>>> work_space_path: {workspace_path}")
-    # 再次读取工作空间目录下的所有文件
+    result_list: List[Dict[str, str]] = []
     if workspace_path:
+        # 未传入索引时使用一次性索引，返回工作空间中的全部文件
+        if file_index is None:
+            file_index = WorkspaceFileIndex(workspace_path, folder_name, exclude_dirs=(WORKSPACE_META_DIR,))
         try:
-            # 遍历工作空间目录下的所有文件
-            for filename in os.listdir(workspace_path):
-                # 如果文件名不在该文件夹的列表中，则添加
-                if filename not in folder_files_map[folder_name]:
-                    folder_files_map[folder_name].append(filename)
-                    result_list.append({
-                        "name": filename,
-                        "path": f"{folder_name}/{filename}"
-                    })
-
-            # 遍历工作空间目录下的所有子目录
-            for root, dirs, files in os.walk(workspace_path):
-                logger.info(f"root:{root}")
-                if root != workspace_path:  # 跳过根目录，因为已经在上面处理过了
-                    # 获取相对路径
-                    rel_path = os.path.relpath(root, workspace_path)
-                    # 构建文件夹的唯一标识
-                    folder_key = f"{folder_name}/{rel_path}"
-
-                    # 初始化该文件夹的文件列表（如果不存在）
-                    if folder_key not in subfolder_files_map:
-                        subfolder_files_map[folder_key] = []
-                        logger.info(f"subfolder_files_map: {subfolder_files_map}")
-
-                    for filename in files:
-                        # 如果文件名不在该文件夹的列表中，则添加
-                        if filename not in subfolder_files_map[folder_key]:
-                            subfolder_files_map[folder_key].append(filename)
-                            # 构建完整的相对路径
-                            full_rel_path = f"{folder_name}/{rel_path}/{filename}"
-                            result_list.append({
-                                "name": filename,
-                                "path": full_rel_path
-                            })
-                            logger.info(f"dirs_result_list:{result_list}")
+            # 只列举自上次扫描以来有变化的目录，返回新增的文件
+            result_list = file_index.scan()
+            if result_list:
+                logger.info(f"new workspace files: {result_list}")
         except Exception as e:
             logger.error(f"Error reading workspace directory: {str(e)}", exc_info=True)
 
     return new_text, result_list
 
 
-def process_text_with_workspace(text: str, work_space_path: str) -> Tuple[str, List[Dict[str, str]]]:
+def process_text_with_workspace(text: str, work_space_path: str,
+                                file_index: Optional[WorkspaceFileIndex] = None) -> Tuple[str, List[Dict[str, str]]]:
     folder_name = get_last_folder_name(work_space_path)
-    return extract_and_replace_paths(text, folder_name, work_space_path)
+    return extract_and_replace_paths(text, folder_name, work_space_path, file_index)
@@ -0,0 +1,276 @@
+# Copyright 2025 ZTE Corporation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import time
+from concurrent.futures import Future, InvalidStateError, TimeoutError as FutureTimeoutError
+from queue import Queue
+from threading import Lock, Thread, Timer, current_thread
+from typing import Any, Callable, Dict, Optional, Set
+
+from app.common.logger_util import logger
+from config.config import get_tool_executor_config
+
+MCP_LANE = "mcp"
+DEFAULT_LANE = "default"
+
+# 工具名到执行类别的映射，未列出的工具（文件读写、计划管理等轻量工具）使用 default 类别
+TOOL_LANES = {
+    "browser_use": "browser",
+    "execute_code": "code",
+    "search_baidu": "network",
+    "search_google": "network",
+    "search_wiki": "network",
+    "tavily_search": "network",
+    "image_search": "network",
+    "fetch_website_content": "network",
+    "audio_recognition": "model",
+    "ask_question_about_image": "model",
+    "ask_question_about_video": "model",
+    "extract_document_content": "model",
+    "create_html_report": "model",
+}
+
+
+def get_tool_lane(function_name: str) -> str:
+    return TOOL_LANES.get(function_name, DEFAULT_LANE)
+
+
+class ToolCallTimeout(FutureTimeoutError):
+    r"""Exception raised when a tool call exceeds the time limit of its lane"""
+    pass
+
+
+class ToolLane:
+    """一个类别的工具执行线程池
+
+    固定数量的工作线程从队列中取任务执行。正在执行的调用超过本类别的时长上限，或因步骤截止时间被放弃时，
+    其 Future 立即结束，执行它的线程在调用返回后退出，同时补充一个新的工作线程，
+    卡住的调用不再占用本类别的并发名额。
+    """
+
+    def __init__(self, name: str, max_workers: int, call_timeout: float = 0):
+        self.name = name
+        self.max_workers = max_workers
+        self.call_timeout = call_timeout
+        self._queue = Queue()
+        self._lock = Lock()
+        self._shutdown = False
+        self._running: Dict[Future, Thread] = {}
+        self._retired: Set[Thread] = set()
+        self._workers = 0
+        self._active = 0
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._abandoned = 0
+        self._timed_out = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+        for _ in range(max_workers):
+            self._start_worker()
+
+    def _start_worker(self) -> None:
+        with self._lock:
+            self._workers += 1
+            index = self._workers
+        Thread(target=self._worker, name=f"{self.name}-{index}", daemon=True).start()
+
+    def submit(self, fn: Callable[[], Any]) -> Future:
+        if self._shutdown:
+            raise RuntimeError(f"{self.name} lane has been shut down")
+        future = Future()
+        with self._lock:
+            self._submitted += 1
+        self._queue.put((time.time(), future, fn))
+        return future
+
+    def _worker(self):
+        thread = current_thread()
+        while True:
+            enqueued_at, future, fn = self._queue.get()
+            if future is None:
+                # 停止信号
+                break
+            if not future.set_running_or_notify_cancel():
+                continue
+            wait_time = time.time() - enqueued_at
+            with self._lock:
+                self._active += 1
+                self._running[future] = thread
+                self._total_wait += wait_time
+                self._max_wait = max(self._max_wait, wait_time)
+            timer = None
+            if self.call_timeout > 0:
+                timer = Timer(self.call_timeout, self._expire, (future,))
+                timer.daemon = True
+                timer.start()
+            try:
+                self._settle(future, fn)
+            finally:
+                if timer:
+                    timer.cancel()
+                with self._lock:
+                    self._running.pop(future, None)
+                    retired = thread in self._retired
+                    self._retired.discard(thread)
+                    if not retired:
+                        self._active -= 1
+            if retired:
+                # 该线程的调用已被放弃，替代线程已经补上，当前线程退出
+                break
+
+    def _settle(self, future: Future, fn: Callable[[], Any]) -> None:
+        try:
+            result = fn()
+        except BaseException as e:
+            with self._lock:
+                self._failed += 1
+            self._set(future, exception=e)
+            return
+        with self._lock:
+            self._completed += 1
+        self._set(future, result=result)
+
+    @staticmethod
+    def _set(future: Future, result: Any = None, exception: Optional[BaseException] = None) -> None:
+        # 被放弃的调用其 Future 已经结束，之后返回的结果直接丢弃
+        try:
+            if exception is not None:
+                future.set_exception(exception)
+            else:
+                future.set_result(result)
+        except InvalidStateError:
+            pass
+
+    def _expire(self, future: Future) -> None:
+        if self.abandon(future):
+            with self._lock:
+                self._timed_out += 1
+            logger.warning(f"tool call on {self.name} lane exceeded {self.call_timeout:.0f}s, abandoned")
+            self._set(future, exception=ToolCallTimeout(
+                f"tool call exceeded the {self.name} lane time limit of {self.call_timeout:.0f}s"))
+
+    def abandon(self, future: Future) -> bool:
+        """放弃一个调用：排队中的直接取消；执行中的不再占用并发名额，补充一个工作线程。返回是否放弃了执行中的调用"""
+        if future.cancel():
+            return False
+        with self._lock:
+            thread = self._running.get(future)
+            if thread is None or thread in self._retired or self._shutdown:
+                return False
+            self._retired.add(thread)
+            self._active -= 1
+            self._abandoned += 1
+        self._start_worker()
+        return True
+
+    def metrics(self) -> Dict[str, Any]:
+        """队列深度、活跃线程数、排队等待时间与被放弃的调用数"""
+        with self._lock:
+            started = self._completed + self._failed + len(self._running)
+            return {
+                "name": self.name,
+                "max_workers": self.max_workers,
+                "call_timeout": self.call_timeout,
+                "queue_depth": self._queue.qsize(),
+                "active": self._active,
+                "abandoned_running": len(self._retired),
+                "submitted": self._submitted,
+                "completed": self._completed,
+                "failed": self._failed,
+                "abandoned": self._abandoned,
+                "timed_out": self._timed_out,
+                "avg_wait_time": self._total_wait / started if started else 0.0,
+                "max_wait_time": self._max_wait,
+            }
+
+    def shutdown(self) -> None:
+        if self._shutdown:
+            return
+        self._shutdown = True
+        for _ in range(self.max_workers):
+            self._queue.put((time.time(), None, None))
+
+
+class ToolExecutor:
+    """进程共享的工具执行线程池
+
+    工具调用按类别分到不同的线程池（lane）中执行，每个类别有独立的并发上限、排队队列与单次调用时长上限，
+    浏览器、代码执行等重量级工具的突发调用只在本类别中排队，不会占满文件读写等轻量工具的线程。
+    各类别的线程池在首次使用时创建。
+    """
+
+    def __init__(self, lanes: Optional[Dict[str, int]] = None, timeouts: Optional[Dict[str, float]] = None,
+                 name: str = "tool-worker"):
+        config = get_tool_executor_config()
+        self.lane_workers = lanes or config["lanes"]
+        self.lane_timeouts = config["timeouts"] if timeouts is None else timeouts
+        self.name = name
+        self._lanes: Dict[str, ToolLane] = {}
+        self._lock = Lock()
+
+    def _get_lane(self, lane: str) -> ToolLane:
+        if lane not in self.lane_workers:
+            lane = DEFAULT_LANE
+        with self._lock:
+            executor = self._lanes.get(lane)
+            if executor is None:
+                # 队列不设上限，提交工具调用时不阻塞步骤线程，排队时长由步骤截止时间约束
+                executor = self._lanes[lane] = ToolLane(f"{self.name}-{lane}",
+                                                        max(1, self.lane_workers.get(lane, 1)),
+                                                        self.lane_timeouts.get(lane, 0))
+            return executor
+
+    def submit(self, lane: str, fn: Callable[[], Any]) -> Future:
+        """在指定类别的线程池中执行 fn，返回 Future；超过类别时长上限的调用以 ToolCallTimeout 结束"""
+        executor = self._get_lane(lane)
+        future = executor.submit(fn)
+        future.lane = executor
+        return future
+
+    @staticmethod
+    def abandon(future: Future) -> None:
+        """步骤截止时放弃未完成的调用：排队中的取消，执行中的不再占用所在类别的并发名额"""
+        lane = getattr(future, "lane", None)
+        if lane is None:
+            future.cancel()
+        elif lane.abandon(future):
+            logger.warning(f"tool call on {lane.name} lane abandoned while running")
+
+    def metrics(self) -> Dict[str, Dict[str, Any]]:
+        """各类别的排队深度、活跃线程数与排队等待时间"""
+        with self._lock:
+            lanes = dict(self._lanes)
+        return {lane: executor.metrics() for lane, executor in lanes.items()}
+
+    def shutdown(self) -> None:
+        with self._lock:
+            lanes = list(self._lanes.values())
+        for executor in lanes:
+            executor.shutdown()
+
+
+_shared_tool_executor: Optional[ToolExecutor] = None
+_shared_lock = Lock()
+
+
+def get_tool_executor() -> ToolExecutor:
+    """进程级共享的工具执行线程池，所有智能体的工具调用共用"""
+    global _shared_tool_executor
+    if _shared_tool_executor is None:
+        with _shared_lock:
+            if _shared_tool_executor is None:
+                _shared_tool_executor = ToolExecutor()
+    return _shared_tool_executor
@@ -0,0 +1,112 @@
+# Copyright 2025 ZTE Corporation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import os
+import time
+from threading import Lock
+from typing import Dict, List, Optional, Set
+
+from app.common.logger_util import logger
+
+# 目录 mtime 距扫描时刻小于该值时不信任缓存，下次扫描仍重新列举（避免同一时间粒度内新增的文件被漏掉）
+_RACY_MTIME_WINDOW_NS = 2_000_000_000
+
+
+class _DirEntry:
+    __slots__ = ("mtime_ns", "files", "subdirs")
+
+    def __init__(self):
+        self.mtime_ns: Optional[int] = None
+        self.files: Set[str] = set()
+        self.subdirs: Set[str] = set()
+
+
+class WorkspaceFileIndex:
+    """单个工作空间的增量文件索引
+
+    记录每个目录的 mtime 及其中已上报的文件，scan 只重新列举 mtime 变化过的目录，
+    返回自上次 scan 以来新增的文件。索引归属于计划，计划结束后释放。
+    """
+
+    def __init__(self, workspace_path: str, folder_name: str, exclude_dirs: tuple = ()):
+        self.workspace_path = workspace_path
+        self.folder_name = folder_name
+        self.exclude_dirs = set(exclude_dirs)
+        self._dirs: Dict[str, _DirEntry] = {}
+        self._lock = Lock()
+
+    def scan(self) -> List[Dict[str, str]]:
+        """返回新增文件列表 [{"name": ..., "path": ...}]，path 以工作空间目录名开头"""
+        with self._lock:
+            new_files: List[Dict[str, str]] = []
+            scan_ns = time.time_ns()
+            pending = [""]
+            seen_dirs = set()
+            while pending:
+                rel_dir = pending.pop()
+                seen_dirs.add(rel_dir)
+                entry = self._dirs.get(rel_dir)
+                if entry is None:
+                    entry = self._dirs[rel_dir] = _DirEntry()
+                self._refresh_dir(rel_dir, entry, scan_ns, new_files)
+                pending.extend(os.path.join(rel_dir, subdir) if rel_dir else subdir for subdir in entry.subdirs)
+
+            # 已删除的目录不再跟踪
+            for rel_dir in set(self._dirs) - seen_dirs:
+                del self._dirs[rel_dir]
+            return new_files
+
+    def _refresh_dir(self, rel_dir: str, entry: _DirEntry, scan_ns: int, new_files: List[Dict[str, str]]) -> None:
+        abs_dir = os.path.join(self.workspace_path, rel_dir) if rel_dir else self.workspace_path
+        try:
+            mtime_ns = os.stat(abs_dir).st_mtime_ns
+        except OSError:
+            entry.files.clear()
+            entry.subdirs.clear()
+            return
+        if entry.mtime_ns is not None and entry.mtime_ns == mtime_ns:
+            return
+
+        try:
+            with os.scandir(abs_dir) as it:
+                children = list(it)
+        except OSError as e:
+            logger.error(f"Error reading workspace directory {abs_dir}: {str(e)}", exc_info=True)
+            return
+
+        subdirs = set()
+        for child in children:
+            try:
+                is_dir = child.is_dir()
+            except OSError:
+                is_dir = False
+            if is_dir and not (not rel_dir and child.name in self.exclude_dirs):
+                subdirs.add(child.name)
+            if not rel_dir:
+                # 根目录下的文件和文件夹都作为产出上报（与原先的 os.listdir 行为一致）
+                if child.name in self.exclude_dirs or child.name in entry.files:
+                    continue
+                entry.files.add(child.name)
+                new_files.append({"name": child.name, "path": f"{self.folder_name}/{child.name}"})
+            elif not is_dir and child.name not in entry.files:
+                entry.files.add(child.name)
+                new_files.append({"name": child.name,
+                                  "path": f"{self.folder_name}/{rel_dir.replace(os.sep, '/')}/{child.name}"})
+        entry.subdirs = subdirs
+        entry.mtime_ns = mtime_ns if scan_ns - mtime_ns > _RACY_MTIME_WINDOW_NS else None
+
+    def release(self) -> None:
+        with self._lock:
+            self._dirs.clear()
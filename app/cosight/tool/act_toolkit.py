@@ -16,7 +16,7 @@
 from typing import Optional
 
 from app.cosight.task.todolist import Plan
-from app.common.logger_util import logger
+from app.common.logger_util import logger, PAYLOAD
 
 
 class ActToolkit:
@@ -57,5 +57,5 @@ class ActToolkit:
         self.plan.mark_step(step_index, step_status, step_notes)
         result = f"Step {step_index}: step_status is {step_status}, step_notes is {step_notes} "
         logger.info(f"ActToolkit mark_step result: {result}")
-        logger.info(f"ActToolkit plan: {self.plan.format(True)}")
+        logger.info("ActToolkit plan: %s", self.plan.format(True), extra=PAYLOAD)
         return result
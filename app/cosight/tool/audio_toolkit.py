@@ -21,10 +21,11 @@ from openai import OpenAI
 import base64
 import numpy as np
 import soundfile as sf
-import asyncio
 from urllib.parse import urlparse
 
 from app.common.logger_util import logger
+from app.cosight.llm.http_pool import get_http_client
+from app.cosight.llm.rate_limiter import call_with_governor
 
 class AudioTool:
     def __init__(self, llm_config):
@@ -43,7 +44,7 @@ class AudioTool:
                       }
         """Cached ChatOpenAI client instance."""
         if self._client is None:
-            self._client = OpenAI(**llm_config)
+            self._client = OpenAI(**llm_config, max_retries=0, http_client=get_http_client(llm_config['base_url']))
         return self._client
 
     def encode_audio(self, audio_path):
@@ -59,7 +60,7 @@ class AudioTool:
         ext = os.path.splitext(path)[1].lower()
         return ext
 
-    async def audio_recognition(self, audio_path, task_prompt):
+    def audio_recognition(self, audio_path, task_prompt):
         audio_url = ''
         audio_format = ''
         if audio_path.startswith('http://') or audio_path.startswith('https://'):
@@ -69,7 +70,9 @@ class AudioTool:
             base64_audio = self.encode_audio(audio_path)
             audio_url = f"data:;base64,{base64_audio}"
             audio_format = os.path.splitext(audio_path)[-1]
-        completion = self.client.chat.completions.create(
+        completion = call_with_governor(
+            self.llm_config['base_url'],
+            self.client.chat.completions.create,
             extra_headers={'Content-Type': 'application/json',
                            'Authorization': 'Bearer %s' % self.llm_config['api_key']},
             model=self.llm_config['model'],
@@ -118,4 +121,4 @@ class AudioTool:
 
     def speech_to_text(self, audio_path: str, task_prompt: str, ):
         logger.info(f"Using Tool: {self.name}, audio_path: {audio_path}, task_prompt: {task_prompt}")
-        return asyncio.run(self.audio_recognition(audio_path, task_prompt))
+        return self.audio_recognition(audio_path, task_prompt)
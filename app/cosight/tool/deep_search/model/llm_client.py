@@ -16,12 +16,14 @@
 import asyncio
 import json
 import time
-import aiohttp
 import requests
 from functools import partial
 from typing import List, Dict, AsyncGenerator
 from lagent.schema import ModelStatusCode
 from app.common.logger_util import logger
+from app.cosight.llm.http_pool import get_aiohttp_session
+from app.cosight.llm.rate_limiter import OVERLOAD_STATUS_CODES, get_governor, retry_after_seconds
+from config.config import get_rate_limit_config
 
 class LLMClient:
     """LLM客户端基类"""
@@ -61,16 +63,27 @@ class LLMClient:
         payload = self._prepare_payload(messages, False, **kwargs)
         logger.info(f'chat to {self.api_url}, model: {self.model_name}, payload: {payload}')
 
+        governor = get_governor(self.api_url)
+        max_retries = get_rate_limit_config()["max_retries"]
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(self.api_url, json=payload, headers=self.headers, proxy=self.proxy, ssl=False) as response:
-                    if response.status != 200:
-                        error_text = await response.text()
-                        logger.error(f"API request failed with status {response.status}: {error_text}")
-                        raise Exception(f"API request failed: {error_text}")
+            session = get_aiohttp_session()
+            for attempt in range(max_retries + 1):
+                async with governor.aslot() as slot:
+                    async with session.post(self.api_url, json=payload, headers=self.headers, proxy=self.proxy, ssl=False) as response:
+                        if response.status in OVERLOAD_STATUS_CODES:
+                            # 网关过载：调节器按 Retry-After 暂停该地址的请求后重试
+                            slot.rate_limited(retry_after_seconds(response.headers))
+                            if attempt < max_retries:
+                                logger.warning(f"API overloaded with status {response.status}, retry {attempt + 1}/{max_retries}")
+                                continue
+                        if response.status != 200:
+                            error_text = await response.text()
+                            logger.error(f"API request failed with status {response.status}: {error_text}")
+                            slot.fail(response.status >= 500)
+                            raise Exception(f"API request failed: {error_text}")
 
-                    result = await response.json()
-                    return result["choices"][0]["message"]["content"]
+                        result = await response.json()
+                        return result["choices"][0]["message"]["content"]
 
         except Exception as e:
             logger.error(f"Error in chat: {str(e)}", exc_info=True)
@@ -81,47 +94,59 @@ class LLMClient:
         payload = self._prepare_payload(messages, True, **kwargs)
         logger.info(f'stream chat to {self.api_url}, model: {self.model_name}, payload: {payload}')
 
+        governor = get_governor(self.api_url)
+        max_retries = get_rate_limit_config()["max_retries"]
         start_time = time.time()
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(self.api_url, json=payload, headers=self.headers, proxy=self.proxy, ssl=False) as response:
-                    response_time = time.time() - start_time
-                    logger.info(f'LLM API response time: {response_time:.2f}s, status: {response.status}')
+            session = get_aiohttp_session()
+            for attempt in range(max_retries + 1):
+                async with governor.aslot() as slot:
+                    async with session.post(self.api_url, json=payload, headers=self.headers, proxy=self.proxy, ssl=False) as response:
+                        response_time = time.time() - start_time
+                        logger.info(f'LLM API response time: {response_time:.2f}s, status: {response.status}')
 
-                    if response.status != 200:
-                        error_text = await response.text()
-                        logger.error(f"API request failed with status {response.status}: {error_text}")
-                        yield ModelStatusCode.SERVER_ERR, f"API request failed: {error_text}", None
-                        return
-                    content = ''
-                    async for line in response.content:
-                        if line:
-                            try:
-                                line = line.decode('utf-8').strip()
-                                # 忽略所有以冒号开头的SSE注释行
-                                if line.startswith(':'):
-                                    continue
-                                if line.startswith('data: '):
-                                    line = line[6:]
-                                if line and line != '[DONE]':
-                                    chunk = json.loads(line)
-                                    if chunk["choices"][0].get("finish_reason", None):
-                                        content += self._finish_handler(line, chunk)
-                                        break
-                                    if "content" in chunk["choices"][0]["delta"]:
-                                        content += chunk["choices"][0]["delta"]["content"]
-                                        yield ModelStatusCode.STREAM_ING, content, None
-                            except json.JSONDecodeError as e:
-                                logger.warning(f"Failed to decode JSON: {line}, error: {str(e)}")
+                        if response.status in OVERLOAD_STATUS_CODES:
+                            slot.rate_limited(retry_after_seconds(response.headers))
+                            if attempt < max_retries:
+                                logger.warning(f"API overloaded with status {response.status}, retry {attempt + 1}/{max_retries}")
                                 continue
-                            except Exception as e:
-                                logger.error(f"Error processing stream chunk: {str(e)}", exc_info=True)
-                                yield ModelStatusCode.SESSION_INVALID_ARG, str(e), None
-                                return
+                        if response.status != 200:
+                            error_text = await response.text()
+                            logger.error(f"API request failed with status {response.status}: {error_text}")
+                            slot.fail(response.status >= 500)
+                            yield ModelStatusCode.SERVER_ERR, f"API request failed: {error_text}", None
+                            return
+                        content = ''
+                        async for line in response.content:
+                            slot.first_token()
+                            if line:
+                                try:
+                                    line = line.decode('utf-8').strip()
+                                    # 忽略所有以冒号开头的SSE注释行
+                                    if line.startswith(':'):
+                                        continue
+                                    if line.startswith('data: '):
+                                        line = line[6:]
+                                    if line and line != '[DONE]':
+                                        chunk = json.loads(line)
+                                        if chunk["choices"][0].get("finish_reason", None):
+                                            content += self._finish_handler(line, chunk)
+                                            break
+                                        if "content" in chunk["choices"][0]["delta"]:
+                                            content += chunk["choices"][0]["delta"]["content"]
+                                            yield ModelStatusCode.STREAM_ING, content, None
+                                except json.JSONDecodeError as e:
+                                    logger.warning(f"Failed to decode JSON: {line}, error: {str(e)}")
+                                    continue
+                                except Exception as e:
+                                    logger.error(f"Error processing stream chunk: {str(e)}", exc_info=True)
+                                    yield ModelStatusCode.SESSION_INVALID_ARG, str(e), None
+                                    return
 
-                    total_time = time.time() - start_time
-                    logger.info(f'LLM API total streaming time: {total_time:.2f}s')
-                    yield ModelStatusCode.END, content, None
+                        total_time = time.time() - start_time
+                        logger.info(f'LLM API total streaming time: {total_time:.2f}s')
+                        yield ModelStatusCode.END, content, None
+                        return
 
         except Exception as e:
             logger.error(f"Error in stream_chat: {str(e)}",exc_info=True)
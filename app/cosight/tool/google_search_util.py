@@ -22,6 +22,7 @@ import asyncio
 import aiohttp
 from .scrape_website_toolkit import is_valid_url
 from app.common.logger_util import logger
+from app.cosight.task.loop_runner import run_coroutine
 
 
 async def fetch_url_content(url: str) -> str:
@@ -96,10 +97,6 @@ def search_google(query: str, max_results: int = 5) -> List[Dict[str, Any]]:
 
             links = list(search(query, num_results=max_results, proxy=proxy, advanced=True))
 
-            # Create a new event loop for the current thread
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-
             # Format results and fetch content
             async def process_links():
                 tasks = []
@@ -117,8 +114,7 @@ def search_google(query: str, max_results: int = 5) -> List[Dict[str, Any]]:
                     }
                     responses.append(response)
 
-            loop.run_until_complete(process_links())
-            loop.close()
+            run_coroutine(process_links())
             break  # Success, exit retry loop
         except Exception as e:
             logger.error(f"Unhandled exception: {e}", exc_info=True)
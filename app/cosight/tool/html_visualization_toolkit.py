@@ -23,7 +23,7 @@ import base64
 import requests
 from urllib.parse import urlparse
 from bs4 import BeautifulSoup
-from llm import llm_for_tool
+from llm import get_llm
 import glob
 import tempfile
 import shutil
@@ -110,6 +110,7 @@ class HtmlVisualizationToolkit:
         
         # 初始化LLM配置
         try:
+            llm_for_tool = get_llm("tool")
             self.llm_base_url = llm_for_tool.base_url if hasattr(llm_for_tool, 'base_url') else None
             self.llm_api_key = llm_for_tool.api_key if hasattr(llm_for_tool, 'api_key') else None
             self.llm_model = llm_for_tool.model if hasattr(llm_for_tool, 'model') else "deepseek-chat"
@@ -164,7 +165,7 @@ class HtmlVisualizationToolkit:
             logger.info("正在向LLM发送请求...")
             messages = [{"role": "user", "content": prompt}]
             logger.info(f"调用LLM请求: {messages}")
-            result = llm_for_tool.chat_to_llm(messages)
+            result = get_llm("tool").chat_to_llm(messages)
             logger.info(f"调用LLM返回响应: {result}")
             return result
         except Exception as e:
@@ -21,9 +21,10 @@ from openai import OpenAI
 import base64
 import numpy as np
 import soundfile as sf
-import asyncio
 
 from app.common.logger_util import logger
+from app.cosight.llm.http_pool import get_http_client
+from app.cosight.llm.rate_limiter import call_with_governor
 
 class VisionTool():
     def __init__(self, llm_config):
@@ -42,7 +43,7 @@ class VisionTool():
                       }
         """Cached ChatOpenAI client instance."""
         if self._client is None:
-            self._client = OpenAI(**llm_config)
+            self._client = OpenAI(**llm_config, max_retries=0, http_client=get_http_client(llm_config['base_url']))
         return self._client
 
     #  Base64 编码格式
@@ -50,14 +51,16 @@ class VisionTool():
         with open(image_path, "rb") as image_file:
             return base64.b64encode(image_file.read()).decode("utf-8")
 
-    async def _run(self, image_path_url, task_prompt):
+    def _run(self, image_path_url, task_prompt):
         img_url = ''
         if image_path_url.startswith('http://') or image_path_url.startswith('https://'):
             img_url = image_path_url
         else:
             base64_image = self.encode_image(image_path_url)
             img_url = f"data:image/png;base64,{base64_image}"
-        completion = self.client.chat.completions.create(
+        completion = call_with_governor(
+            self.llm_config['base_url'],
+            self.client.chat.completions.create,
             extra_headers={'Content-Type': 'application/json',
                            'Authorization': 'Bearer %s' % self.llm_config['api_key']},
             model=self.llm_config['model'],
@@ -101,4 +104,4 @@ class VisionTool():
 
     def ask_question_about_image(self, image_path_url, task_prompt):
         logger.info(f"Using Tool: {self.name}, image_path_url: {image_path_url}, task_prompt： {task_prompt}")
-        return asyncio.run(self._run(image_path_url, task_prompt))
+        return self._run(image_path_url, task_prompt)
@@ -22,6 +22,7 @@ import asyncio
 import aiohttp
 import os
 from app.common.logger_util import logger
+from app.cosight.task.loop_runner import run_coroutine
 from .scrape_website_toolkit import is_valid_url
 
 async def fetch_url_content(url: str) -> str:
@@ -101,10 +102,6 @@ def search_baidu(
             # Limit results to max_results
             results = results
 
-            # Create a new event loop for the current thread
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-
             async def process_results():
                 tasks = []
                 for i, result in enumerate(results, start=1):
@@ -122,8 +119,7 @@ def search_baidu(
                     }
                     responses.append(response)
 
-            loop.run_until_complete(process_results())
-            loop.close()
+            run_coroutine(process_results())
             break  # Success, exit retry loop
         except Exception as e:
             logger.error(f'raise error: {str(e)}', exc_info=True)
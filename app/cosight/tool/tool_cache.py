@@ -0,0 +1,268 @@
+# Copyright 2025 ZTE Corporation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import asyncio
+import inspect
+import json
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from threading import Lock
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from app.common.logger_util import logger
+from app.cosight.task.deadline import Deadline, DeadlineExceeded
+from config.config import get_prefetch_config, get_tool_result_cache_config
+
+
+class TTLCache:
+    """线程安全的 LRU + TTL 缓存
+
+    同一个 key 正在计算时，其他调用方等待该次计算结果而不是重复请求（single-flight），等待不超过调用方的截止时间；
+    因此后台预取尚未完成时，actor 发起的相同调用会直接复用预取结果。
+    """
+
+    def __init__(self, max_entries: int = 512, ttl: float = 600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[str, Future] = {}
+        # 各条目被命中的次数，用于统计预取结果的使用率
+        self._hit_counts: Dict[str, int] = {}
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        with self._lock:
+            return self._get_locked(key)
+
+    def _get_locked(self, key: str) -> Tuple[bool, Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        expires_at, value = entry
+        if expires_at < time.time():
+            del self._entries[key]
+            self._hit_counts.pop(key, None)
+            return False, None
+        self._entries.move_to_end(key)
+        return True, value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """ttl 为该条目的有效期，不传时使用缓存的默认有效期"""
+        with self._lock:
+            self._entries[key] = (time.time() + (self.ttl if ttl is None else ttl), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                evicted, _ = self._entries.popitem(last=False)
+                self._hit_counts.pop(evicted, None)
+
+    def _claim(self, key: str) -> Tuple[bool, Any, Optional[Future]]:
+        """命中时返回 (True, 缓存值, None)；相同请求正在计算时返回其 Future 供调用方等待；否则登记调用方为计算方，Future 为 None"""
+        with self._lock:
+            found, value = self._get_locked(key)
+            if found:
+                self.hits += 1
+                self._hit_counts[key] = self._hit_counts.get(key, 0) + 1
+                return True, value, None
+            inflight = self._inflight.get(key)
+            if inflight is not None:
+                return False, None, inflight
+            inflight = self._inflight[key] = Future()
+            # 置为执行中，等待方取消等待时不会取消该 Future
+            inflight.set_running_or_notify_cancel()
+            self.misses += 1
+            return False, None, None
+
+    def _release(self, key: str) -> None:
+        with self._lock:
+            inflight = self._inflight.pop(key, None)
+        if inflight is not None:
+            inflight.set_result(None)
+
+    @staticmethod
+    def _wait_timeout(deadline: Optional[Deadline]) -> Optional[float]:
+        if deadline is None:
+            return None
+        deadline.check()
+        return deadline.remaining()
+
+    @staticmethod
+    def _deadline_exceeded(key: str, deadline: Deadline) -> DeadlineExceeded:
+        return DeadlineExceeded(f"{deadline.name} exceeded its time budget while waiting for in-flight call {key}")
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any],
+                       should_cache: Optional[Callable[[Any], bool]] = None, ttl: Optional[float] = None,
+                       deadline: Optional[Deadline] = None) -> Any:
+        """deadline 为调用方的截止时间，等待相同请求的计算超过截止时间时抛出 DeadlineExceeded"""
+        while True:
+            found, value, inflight = self._claim(key)
+            if found:
+                return value
+            if inflight is None:
+                break
+            # 相同请求正在执行，等待其结束后重新查缓存；若其结果不可缓存则由下一个调用方重新计算
+            try:
+                inflight.result(self._wait_timeout(deadline))
+            except FutureTimeoutError:
+                raise self._deadline_exceeded(key, deadline)
+
+        try:
+            value = compute()
+            if should_cache is None or should_cache(value):
+                self.set(key, value, ttl)
+            return value
+        finally:
+            self._release(key)
+
+    async def aget_or_compute(self, key: str, compute: Callable[[], Awaitable[Any]],
+                              should_cache: Optional[Callable[[Any], bool]] = None,
+                              ttl: Optional[float] = None, deadline: Optional[Deadline] = None) -> Any:
+        """get_or_compute 的协程版本，compute 返回 awaitable；与同步调用方共享同一个 in-flight 计算"""
+        while True:
+            found, value, inflight = self._claim(key)
+            if found:
+                return value
+            if inflight is None:
+                break
+            # 在事件循环中等待 Future 结束，不占用线程
+            try:
+                await asyncio.wait_for(asyncio.wrap_future(inflight), self._wait_timeout(deadline))
+            except asyncio.TimeoutError:
+                raise self._deadline_exceeded(key, deadline)
+
+        try:
+            value = await compute()
+            if should_cache is None or should_cache(value):
+                self.set(key, value, ttl)
+            return value
+        finally:
+            self._release(key)
+
+    def hit_count(self, key: str) -> int:
+        with self._lock:
+            return self._hit_counts.get(key, 0)
+
+    def metrics(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+def make_cache_key(args: tuple, kwargs: dict) -> str:
+    return json.dumps([args, kwargs], ensure_ascii=False, sort_keys=True, default=str)
+
+
+def make_call_key(signature: inspect.Signature, args: tuple, kwargs: dict) -> str:
+    """按函数签名归一化参数（位置参数/关键字参数/默认值）后生成缓存 key"""
+    try:
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        return make_cache_key((), dict(bound.arguments))
+    except TypeError:
+        return make_cache_key(args, kwargs)
+
+
+def is_error_result(result: Any) -> bool:
+    """检索类工具失败时返回包含 error 字段的列表/字典或错误描述字符串，这类结果不缓存"""
+    if not result:
+        return True
+    if isinstance(result, dict):
+        return "error" in result
+    if isinstance(result, list):
+        return any(isinstance(item, dict) and "error" in item for item in result)
+    if isinstance(result, str):
+        lowered = result[:200].lower()
+        return lowered.startswith(("fetch_website_content error", "current url is valid", "error", "http error",
+                                   "request timed out"))
+    return False
+
+
+class _NullCache(TTLCache):
+    """已释放计划使用的缓存：不保存结果，也不合并并发调用，每次直接计算"""
+
+    def __init__(self):
+        super().__init__(max_entries=0, ttl=0)
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        pass
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any],
+                       should_cache: Optional[Callable[[Any], bool]] = None, ttl: Optional[float] = None,
+                       deadline: Optional[Deadline] = None) -> Any:
+        return compute()
+
+    async def aget_or_compute(self, key: str, compute: Callable[[], Awaitable[Any]],
+                              should_cache: Optional[Callable[[Any], bool]] = None,
+                              ttl: Optional[float] = None, deadline: Optional[Deadline] = None) -> Any:
+        return await compute()
+
+
+_NULL_CACHE = _NullCache()
+# 最近释放的计划，计划截止后仍在执行的步骤不会为其重新创建缓存
+_MAX_RELEASED_PLANS = 1024
+_plan_caches: Dict[Optional[str], TTLCache] = {}
+_released_plans: "OrderedDict[Optional[str], None]" = OrderedDict()
+_plan_caches_lock = Lock()
+
+
+def get_plan_tool_cache(plan_id: Optional[str]) -> TTLCache:
+    """计划内各步骤共享的工具结果缓存，计划结束时由 release_plan_tool_cache 释放，之后返回不缓存的空实现"""
+    with _plan_caches_lock:
+        cache = _plan_caches.get(plan_id)
+        if cache is None:
+            if plan_id in _released_plans:
+                return _NULL_CACHE
+            cache = _plan_caches[plan_id] = TTLCache(get_tool_result_cache_config()["max_entries"],
+                                                     get_prefetch_config()["cache_ttl"])
+        return cache
+
+
+def release_plan_tool_cache(plan_id: Optional[str]) -> None:
+    with _plan_caches_lock:
+        cache = _plan_caches.pop(plan_id, None)
+        _released_plans[plan_id] = None
+        while len(_released_plans) > _MAX_RELEASED_PLANS:
+            _released_plans.popitem(last=False)
+    if cache is not None:
+        logger.info(f"tool result cache of plan {plan_id} released: {cache.metrics()}")
+
+
+def get_tool_result_ttl(function_name: str) -> Optional[float]:
+    """工具结果在计划内的有效期；不在可缓存工具列表中或未启用缓存时返回 None"""
+    config = get_tool_result_cache_config()
+    if not config["enabled"]:
+        return None
+    return config["ttls"].get(function_name)
+
+
+def _canonical_arguments(value: Any) -> Any:
+    if isinstance(value, str):
+        return value.strip()
+    if isinstance(value, dict):
+        return {str(key): _canonical_arguments(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_canonical_arguments(item) for item in value]
+    return value
+
+
+def make_tool_call_key(function_name: str, function: Callable, args_dict: dict) -> str:
+    """工具调度层的缓存 key：去掉字符串参数首尾空白，并按函数签名补全默认参数"""
+    arguments = _canonical_arguments(args_dict)
+    try:
+        signature = inspect.signature(function)
+    except (TypeError, ValueError):
+        return f"{function_name}:{make_cache_key((), arguments)}"
+    return f"{function_name}:{make_call_key(signature, (), arguments)}"
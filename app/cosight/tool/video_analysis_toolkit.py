@@ -21,8 +21,9 @@ from openai import OpenAI
 import base64
 import numpy as np
 import soundfile as sf
-import asyncio
 from app.common.logger_util import logger
+from app.cosight.llm.http_pool import get_http_client
+from app.cosight.llm.rate_limiter import call_with_governor
 
 
 class VideoTool:
@@ -42,7 +43,7 @@ class VideoTool:
                       }
         """Cached ChatOpenAI client instance."""
         if self._client is None:
-            self._client = OpenAI(**llm_config)
+            self._client = OpenAI(**llm_config, max_retries=0, http_client=get_http_client(llm_config['base_url']))
         return self._client
 
     #  Base64 编码格式
@@ -50,14 +51,16 @@ class VideoTool:
         with open(video_path, "rb") as video_file:
             return base64.b64encode(video_file.read()).decode("utf-8")
 
-    async def video_analy(self, video_path: str, question: str):
+    def video_analy(self, video_path: str, question: str):
         video_url = ''
         if video_path.startswith('http://') or video_path.startswith('https://'):
             video_url = video_path
         else:
             base64_video = self.encode_video(video_path)
             video_url = f"data:;base64,{base64_video}"
-        completion = self.client.chat.completions.create(
+        completion = call_with_governor(
+            self.llm_config['base_url'],
+            self.client.chat.completions.create,
             extra_headers={'Content-Type': 'application/json',
                            'Authorization': 'Bearer %s' % self.llm_config['api_key']},
             model=self.llm_config['model'],
@@ -103,4 +106,4 @@ class VideoTool:
 
     def ask_question_about_video(self, video_path: str, question: str, ):
         logger.info(f"Using Tool: {self.name}, video_path: {video_path}, question: {question}")
-        return asyncio.run(self.video_analy(video_path, question))
+        return self.video_analy(video_path, question)
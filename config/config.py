@@ -13,6 +13,7 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import json
 import os
 from dotenv import load_dotenv
 from typing import Optional
@@ -21,6 +22,26 @@ from typing import Optional
 load_dotenv(override=True)
 
 
+def reload_env() -> bool:
+    """重新加载.env文件，用于不重启进程更新配置"""
+    return load_dotenv(override=True)
+
+
+# ========== 日志配置 ==========
+def get_logging_config() -> dict[str, bool | int]:
+    """获取日志管道配置"""
+    max_record_chars = os.environ.get("LOG_MAX_RECORD_CHARS")
+    payload_sample_every = os.environ.get("LOG_PAYLOAD_SAMPLE_EVERY")
+    payload_head_chars = os.environ.get("LOG_PAYLOAD_HEAD_CHARS")
+    return {
+        "async": os.environ.get("LOG_ASYNC", "true").strip().lower() in ("1", "true", "yes"),
+        "max_record_chars": int(max_record_chars) if max_record_chars and max_record_chars.strip() else 20000,
+        "payload_sample_every": int(payload_sample_every) if payload_sample_every and payload_sample_every.strip()
+        else 10,
+        "payload_head_chars": int(payload_head_chars) if payload_head_chars and payload_head_chars.strip() else 500
+    }
+
+
 # ========== 大模型配置 ==========
 def get_model_config() -> dict[str, Optional[str | int | float]]:
     """获取API配置"""
@@ -37,6 +58,95 @@ def get_model_config() -> dict[str, Optional[str | int | float]]:
     }
 
 
+def is_llm_stream_enabled() -> bool:
+    """大模型调用是否使用流式输出（文本增量实时推送给前端）"""
+    return os.environ.get("LLM_STREAM", "").strip().lower() in ("1", "true", "yes")
+
+
+def get_llm_cache_config() -> dict[str, str | int | list[str] | None]:
+    """获取大模型响应缓存配置：缓存模式、启用缓存的模型角色、磁盘存储路径与大小上限"""
+    mode = os.environ.get("LLM_CACHE_MODE")
+    roles = os.environ.get("LLM_CACHE_ROLES")
+    path = os.environ.get("LLM_CACHE_PATH")
+    max_mb = os.environ.get("LLM_CACHE_MAX_MB")
+    memory_entries = os.environ.get("LLM_CACHE_MEMORY_ENTRIES")
+    return {
+        "mode": mode.strip().lower() if mode and mode.strip() else "off",
+        "roles": [role.strip() for role in roles.split(",") if role.strip()] if roles and roles.strip()
+        else ["plan", "act", "tool", "vision"],
+        "path": path.strip() if path and path.strip() else None,
+        "max_bytes": int(float(max_mb) * 1024 * 1024) if max_mb and max_mb.strip() else 512 * 1024 * 1024,
+        "memory_entries": int(memory_entries) if memory_entries and memory_entries.strip() else 256
+    }
+
+
+def get_http_pool_config() -> dict[str, bool | int | float]:
+    """获取模型客户端共享连接池配置"""
+    max_connections = os.environ.get("HTTP_MAX_CONNECTIONS")
+    max_keepalive = os.environ.get("HTTP_MAX_KEEPALIVE_CONNECTIONS")
+    keepalive_expiry = os.environ.get("HTTP_KEEPALIVE_EXPIRY")
+    timeout = os.environ.get("HTTP_TIMEOUT")
+    connect_timeout = os.environ.get("HTTP_CONNECT_TIMEOUT")
+    return {
+        "max_connections": int(max_connections) if max_connections and max_connections.strip() else 100,
+        "max_keepalive_connections": int(max_keepalive) if max_keepalive and max_keepalive.strip() else 20,
+        "keepalive_expiry": float(keepalive_expiry) if keepalive_expiry and keepalive_expiry.strip() else 60,
+        "timeout": float(timeout) if timeout and timeout.strip() else 600,
+        "connect_timeout": float(connect_timeout) if connect_timeout and connect_timeout.strip() else 10,
+        "http2": os.environ.get("HTTP2_ENABLED", "true").strip().lower() in ("1", "true", "yes")
+    }
+
+
+def get_rate_limit_config() -> dict[str, int | float | None]:
+    """获取模型调用的限流与自适应并发配置（按服务地址分别生效）"""
+    rate = os.environ.get("LLM_RATE_LIMIT")
+    burst = os.environ.get("LLM_RATE_BURST")
+    max_concurrency = os.environ.get("LLM_MAX_CONCURRENCY")
+    min_concurrency = os.environ.get("LLM_MIN_CONCURRENCY")
+    latency_target = os.environ.get("LLM_LATENCY_TARGET")
+    max_retries = os.environ.get("LLM_RATE_LIMIT_RETRIES")
+    return {
+        "rate": float(rate) if rate and rate.strip() else 0,
+        "burst": float(burst) if burst and burst.strip() else None,
+        "max_concurrency": int(max_concurrency) if max_concurrency and max_concurrency.strip() else 16,
+        "min_concurrency": int(min_concurrency) if min_concurrency and min_concurrency.strip() else 1,
+        "latency_target": float(latency_target) if latency_target and latency_target.strip() else 30,
+        "max_retries": int(max_retries) if max_retries and max_retries.strip() else 5
+    }
+
+
+def get_fallback_endpoints(role: str) -> list[dict[str, Optional[str]]]:
+    """获取模型角色（plan/act/tool/vision）的备用服务地址
+
+    {ROLE}_FALLBACK_ENDPOINTS（未配置时使用 FALLBACK_ENDPOINTS）为 JSON 数组，元素包含 base_url，
+    可选 api_key、model、proxy，缺省时沿用该角色主地址的配置
+    """
+    value = os.environ.get(f"{role.upper()}_FALLBACK_ENDPOINTS") or os.environ.get("FALLBACK_ENDPOINTS")
+    if not value or not value.strip():
+        return []
+    try:
+        endpoints = json.loads(value)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"{role.upper()}_FALLBACK_ENDPOINTS 不是合法的 JSON: {e}")
+    return [endpoint for endpoint in endpoints if isinstance(endpoint, dict) and endpoint.get("base_url")]
+
+
+def get_hedge_config() -> dict[str, int | float]:
+    """获取对冲请求与熔断配置"""
+    percentile = os.environ.get("LLM_HEDGE_PERCENTILE")
+    min_delay = os.environ.get("LLM_HEDGE_MIN_DELAY")
+    default_delay = os.environ.get("LLM_HEDGE_DEFAULT_DELAY")
+    circuit_failures = os.environ.get("LLM_CIRCUIT_FAILURES")
+    circuit_reset = os.environ.get("LLM_CIRCUIT_RESET")
+    return {
+        "percentile": float(percentile) if percentile and percentile.strip() else 95,
+        "min_delay": float(min_delay) if min_delay and min_delay.strip() else 2,
+        "default_delay": float(default_delay) if default_delay and default_delay.strip() else 20,
+        "circuit_failures": int(circuit_failures) if circuit_failures and circuit_failures.strip() else 5,
+        "circuit_reset": float(circuit_reset) if circuit_reset and circuit_reset.strip() else 30
+    }
+
+
 # ========== 规划大模型配置 ==========
 def get_plan_model_config() -> dict[str, Optional[str | int | float]]:
     """获取Plan专用API配置，如果缺少配置则退回默认"""
@@ -139,6 +249,130 @@ def get_tavily_config() -> Optional[str]:
     return os.environ.get("TAVILY_API_KEY")
 
 
+# ========== 步骤调度配置 ==========
+def get_step_executor_config() -> dict[str, int]:
+    """获取步骤执行线程池配置：单个计划的并发步骤上限，以及服务端多个计划共享线程池的总线程数"""
+    max_workers = os.environ.get("STEP_MAX_WORKERS")
+    shared_max_workers = os.environ.get("STEP_SHARED_MAX_WORKERS")
+    queue_size = os.environ.get("STEP_QUEUE_SIZE")
+    return {
+        "max_workers": int(max_workers) if max_workers and max_workers.strip() else 5,
+        "shared_max_workers": int(shared_max_workers) if shared_max_workers and shared_max_workers.strip() else 32,
+        "queue_size": int(queue_size) if queue_size and queue_size.strip() else 100
+    }
+
+
+def get_tool_executor_config() -> dict[str, dict[str, int | float]]:
+    """获取工具执行线程池配置：各类工具（浏览器、代码执行、网络检索等）各自的并发上限与单次调用时长上限（秒）"""
+    lanes = {"browser": 2, "code": 4, "model": 8, "network": 16, "mcp": 8, "default": 16}
+    # 默认不限时，单次调用只受步骤截止时间约束；需要时按类别配置
+    timeouts: dict[str, float] = {}
+    # 格式为 类别:数值，逗号分隔，未配置的类别使用默认值；时长上限为 0 表示不限时
+    for env_name, values, cast in (("TOOL_LANE_WORKERS", lanes, int), ("TOOL_LANE_TIMEOUTS", timeouts, float)):
+        value = os.environ.get(env_name)
+        if value and value.strip():
+            for item in value.split(","):
+                lane, _, number = item.partition(":")
+                if lane.strip() and number.strip():
+                    values[lane.strip()] = cast(number)
+    return {
+        "lanes": lanes,
+        "timeouts": timeouts
+    }
+
+
+def get_loop_runner_config() -> dict[str, int]:
+    """获取同步代码执行协程所用的常驻事件循环配置"""
+    num_loops = os.environ.get("EVENT_LOOP_THREADS")
+    return {
+        "num_loops": int(num_loops) if num_loops and num_loops.strip() else 4
+    }
+
+
+def get_deadline_config() -> dict[str, float]:
+    """获取计划总时长与单步骤时长上限（秒），0 表示不限时；以及计划截止后等待执行中步骤退出的时长"""
+    plan_timeout = os.environ.get("PLAN_TIMEOUT")
+    step_timeout = os.environ.get("STEP_TIMEOUT")
+    shutdown_grace = os.environ.get("PLAN_SHUTDOWN_GRACE")
+    return {
+        "plan_timeout": float(plan_timeout) if plan_timeout and plan_timeout.strip() else 3600,
+        "step_timeout": float(step_timeout) if step_timeout and step_timeout.strip() else 900,
+        "shutdown_grace": float(shutdown_grace) if shutdown_grace and shutdown_grace.strip() else 30
+    }
+
+
+def get_step_priority_config() -> dict[str, Optional[str | float]]:
+    """获取步骤优先级（关键路径）配置"""
+    history_path = os.environ.get("STEP_DURATION_HISTORY_PATH")
+    ema_alpha = os.environ.get("STEP_DURATION_EMA_ALPHA")
+    return {
+        "history_path": history_path.strip() if history_path and history_path.strip() else None,
+        "ema_alpha": float(ema_alpha) if ema_alpha and ema_alpha.strip() else 0.3
+    }
+
+
+def get_prefetch_config() -> dict[str, bool | int | float]:
+    """获取后续步骤检索预取与检索结果缓存配置"""
+    max_requests = os.environ.get("PREFETCH_MAX_REQUESTS")
+    workers = os.environ.get("PREFETCH_WORKERS")
+    cache_ttl = os.environ.get("TOOL_CACHE_TTL")
+    return {
+        "enabled": os.environ.get("PREFETCH_ENABLED", "").strip().lower() in ("1", "true", "yes"),
+        "max_requests": int(max_requests) if max_requests and max_requests.strip() else 6,
+        "workers": int(workers) if workers and workers.strip() else 2,
+        "cache_ttl": float(cache_ttl) if cache_ttl and cache_ttl.strip() else 600
+    }
+
+
+def get_tool_result_cache_config() -> dict[str, bool | int | dict[str, float]]:
+    """获取计划内工具结果缓存配置：是否启用、可缓存的幂等工具及其有效期（秒）、每个计划缓存的条数上限"""
+    tools = os.environ.get("TOOL_RESULT_CACHE_TOOLS")
+    max_entries = os.environ.get("TOOL_RESULT_CACHE_MAX_ENTRIES")
+    default_ttl = get_prefetch_config()["cache_ttl"]
+    # 格式为 工具名[:有效期]，逗号分隔，未写有效期的沿用 TOOL_CACHE_TTL
+    if not tools or not tools.strip():
+        tools = "search_baidu,tavily_search,fetch_website_content,search_google,search_wiki:3600,image_search"
+    ttls = {}
+    for item in tools.split(","):
+        name, _, ttl = item.partition(":")
+        if name.strip():
+            ttls[name.strip()] = float(ttl) if ttl.strip() else default_ttl
+    return {
+        "enabled": os.environ.get("TOOL_RESULT_CACHE", "true").strip().lower() in ("1", "true", "yes"),
+        "ttls": ttls,
+        "max_entries": int(max_entries) if max_entries and max_entries.strip() else 256
+    }
+
+
+def get_task_manager_config() -> dict[str, Optional[str | int | float]]:
+    """获取计划注册表配置：内存中保留的计划数上限、未在执行的计划的保留时长（秒）与落盘目录"""
+    max_plans = os.environ.get("TASK_MANAGER_MAX_PLANS")
+    plan_ttl = os.environ.get("TASK_MANAGER_PLAN_TTL")
+    spill_dir = os.environ.get("TASK_MANAGER_SPILL_DIR")
+    return {
+        "max_plans": int(max_plans) if max_plans and max_plans.strip() else 100,
+        "plan_ttl": float(plan_ttl) if plan_ttl and plan_ttl.strip() else 3600,
+        "spill_dir": spill_dir.strip() if spill_dir and spill_dir.strip() else None
+    }
+
+
+def get_compaction_config() -> dict[str, int]:
+    """获取智能体对话历史压缩配置：token 预算（0 表示不压缩）、压缩后保留的字符数与不压缩的最近工具调用轮数"""
+    token_budget = os.environ.get("CONTEXT_TOKEN_BUDGET")
+    digest_chars = os.environ.get("CONTEXT_DIGEST_CHARS")
+    keep_recent = os.environ.get("CONTEXT_KEEP_RECENT_ROUNDS")
+    return {
+        "token_budget": int(token_budget) if token_budget and token_budget.strip() else 32000,
+        "digest_chars": int(digest_chars) if digest_chars and digest_chars.strip() else 800,
+        "keep_recent": int(keep_recent) if keep_recent and keep_recent.strip() else 1
+    }
+
+
+def is_async_execution_enabled() -> bool:
+    """服务端是否使用 AsyncCoSight 在主事件循环中执行计划"""
+    return os.environ.get("ASYNC_EXECUTION", "").strip().lower() in ("1", "true", "yes")
+
+
 def validate_config(config: dict) -> bool:
     """验证必要配置是否存在"""
     if not config.get("api_key"):
@@ -21,6 +21,9 @@ from fastapi.params import Body
 from cosight_server.sdk.common.api_result import json_result
 from cosight_server.sdk.common.cache import Cache
 from app.common.logger_util import logger
+from app.cosight.llm.usage_tracker import UsageTracker
+from app.cosight.task.task_manager import TaskManager, PlanNotFoundError
+from llm import reload_llm_config
 
 commonRouter = APIRouter()
 
@@ -40,4 +43,28 @@ async def stop_message(body: Dict = Body(...)):
     Cache.put(f"is_message_stopped_{messageId}", True)
     return json_result(0, 'success', {
         'status': 'stopped'
-    })
\ No newline at end of file
+    })
+
+
+@commonRouter.get("/deep-research/usage/{plan_id}")
+async def get_plan_usage(plan_id: str, include_calls: bool = False):
+    """查询计划的模型调用用量：token、耗时与重试次数，按步骤、智能体与模型角色汇总"""
+    usage = UsageTracker.summary(plan_id, include_calls)
+    if usage is None:
+        # 进程内统计已淘汰时，读取计划结束时写入工作区的统计
+        try:
+            usage = UsageTracker.load(TaskManager.get_plan(plan_id).work_space_path)
+        except PlanNotFoundError:
+            usage = None
+        if usage is not None and not include_calls:
+            usage.pop("calls", None)
+    if usage is None:
+        return json_result(404, f'usage of plan {plan_id} not found', None)
+    return json_result(0, 'success', usage)
+
+
+@commonRouter.post("/deep-research/reload-config")
+async def reload_config():
+    """重新加载 .env 中的模型配置，新发起的计划使用新配置，执行中的计划不受影响"""
+    reload_llm_config()
+    return json_result(0, 'success', None)
@@ -23,14 +23,16 @@ from fastapi import APIRouter, Body
 from starlette.requests import Request
 from fastapi.responses import StreamingResponse
 
-from llm import llm_for_plan, llm_for_act, llm_for_tool, llm_for_vision
+from llm import get_llm
 from cosight_server.deep_research.services.i18n_service import i18n
 from app.common.logger_util import logger
 
 # 引入CoSight所需的依赖
 from app.cosight.task.plan_report_manager import plan_report_event_manager
+from app.cosight.task.step_executor import get_shared_step_executor
 from app.cosight.task.todolist import Plan
-from CoSight import CoSight
+from CoSight import CoSight, AsyncCoSight
+from config.config import is_async_execution_enabled
 
 searchRouter = APIRouter()
 
@@ -49,6 +51,8 @@ if not os.path.exists(LOGS_PATH):
 # 用于存储plan数据的队列和事件循环引用
 plan_queue = None
 main_loop = None
+# 异步模式下正在执行的计划任务，保持引用避免被垃圾回收
+running_tasks = set()
 
 
 def append_create_plan(data: Any):
@@ -125,6 +129,39 @@ def append_create_plan(data: Any):
         logger.error(f"未知错误: {e}", exc_info=True)
 
 
+def append_stream_delta(data: Any):
+    """将大模型流式输出（plan_stream 事件）放入队列发送给客户端，不写入plan.log"""
+    global plan_queue, main_loop
+    if plan_queue is not None and main_loop is not None and isinstance(data, dict):
+        asyncio.run_coroutine_threadsafe(plan_queue.put({"stream": data}), main_loop)
+
+
+def merge_stream(streams: dict, stream: dict) -> bool:
+    """按步骤（无步骤时按智能体）保留最新一次调用的流式文本，返回是否有更新"""
+    key = str(stream["step_index"]) if stream.get("step_index") is not None else stream.get("agent", "")
+    current = streams.get(key)
+    if current and current["call_id"] == stream["call_id"] and current["seq"] >= stream["seq"]:
+        # 事件可能乱序到达，丢弃旧的
+        return False
+    streams[key] = stream
+    return True
+
+
+def drop_finished_streams(streams: dict, plan: dict):
+    """步骤结束后不再展示其流式文本"""
+    steps = plan.get("steps") or []
+    statuses = plan.get("step_statuses") or {}
+    for key in list(streams):
+        if key.isdigit() and int(key) < len(steps) and statuses.get(steps[int(key)]) in ("completed", "blocked"):
+            del streams[key]
+
+
+def format_streams(streams: dict) -> dict:
+    return {key: {"agent": value.get("agent"), "step_index": value.get("step_index"),
+                  "content": value.get("content", "")}
+            for key, value in streams.items()}
+
+
 def validate_search_input(params: dict) -> dict | None:
     """
     验证搜索输入参数
@@ -165,37 +202,64 @@ async def search(request: Request, params: Any = Body(None)):
 
         # 保存最新的plan数据
         latest_plan = None
+        # 正在生成中的大模型输出，key 为步骤索引（规划/总结阶段为智能体名）
+        streams = {}
+
+        def prepare_workspace():
+            # 订阅事件
+            plan_report_event_manager.subscribe(event_type="plan_created", callback=append_create_plan)
+            plan_report_event_manager.subscribe(event_type="plan_updated", callback=append_create_plan)
+            plan_report_event_manager.subscribe(event_type="plan_process", callback=append_create_plan)
+            plan_report_event_manager.subscribe(event_type="plan_result", callback=append_create_plan)
+            plan_report_event_manager.subscribe(event_type="plan_stream", callback=append_stream_delta)
+
+            # 构造路径：/xxx/xxx/work_space/work_space_时间戳
+            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+            work_space_path_time = os.path.join(work_space_path, f'work_space_{timestamp}')
+            print(f"work_space_path_time:{work_space_path_time}")
+            os.makedirs(work_space_path_time, exist_ok=True)
+            os.environ['WORKSPACE_PATH'] = work_space_path_time
+            return work_space_path_time
 
         # 在子线程中执行CoSight任务
         def run_manus():
             try:
-                # 订阅事件
-                plan_report_event_manager.subscribe(event_type="plan_created", callback=append_create_plan)
-                plan_report_event_manager.subscribe(event_type="plan_updated", callback=append_create_plan)
-                plan_report_event_manager.subscribe(event_type="plan_process", callback=append_create_plan)
-                plan_report_event_manager.subscribe(event_type="plan_result", callback=append_create_plan)
-
-                # 构造路径：/xxx/xxx/work_space/work_space_时间戳
-                timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
-                work_space_path_time = os.path.join(work_space_path, f'work_space_{timestamp}')
-                print(f"work_space_path_time:{work_space_path_time}")
-                os.makedirs(work_space_path_time, exist_ok=True)
-                os.environ['WORKSPACE_PATH'] = work_space_path_time
+                work_space_path_time = prepare_workspace()
 
                 # 初始化CoSight并执行
+                # 每个请求按当前配置取客户端，配置重新加载后新请求即使用新配置
+                llm_for_plan = get_llm("plan")
                 logger.info(f"llm is {llm_for_plan.model}, {llm_for_plan.base_url}, {llm_for_plan.api_key}")
-                cosight = CoSight(llm_for_plan, llm_for_act, llm_for_tool, llm_for_vision, work_space_path=work_space_path_time)
+                cosight = CoSight(llm_for_plan, get_llm("act"), get_llm("tool"), get_llm("vision"),
+                                  work_space_path=work_space_path_time,
+                                  step_executor=get_shared_step_executor())
                 result = cosight.execute(query_content)
                 logger.info(f"final result is {result}")
 
             except Exception as e:
                 logger.error(f"CoSight执行错误: {e}", exc_info=True)
 
-        # 启动子线程执行CoSight
-        import threading
-        thread = threading.Thread(target=run_manus)
-        thread.daemon = True
-        thread.start()
+        # 在主事件循环中以协程方式执行CoSight任务
+        async def run_manus_async():
+            try:
+                work_space_path_time = prepare_workspace()
+                cosight = AsyncCoSight(get_llm("plan", is_async=True), get_llm("act", is_async=True),
+                                       get_llm("tool"), get_llm("vision"),
+                                       work_space_path=work_space_path_time)
+                result = await cosight.execute(query_content)
+                logger.info(f"final result is {result}")
+            except Exception as e:
+                logger.error(f"AsyncCoSight执行错误: {e}", exc_info=True)
+
+        if is_async_execution_enabled():
+            running_tasks.add(task := asyncio.create_task(run_manus_async()))
+            task.add_done_callback(running_tasks.discard)
+        else:
+            # 启动子线程执行CoSight
+            import threading
+            thread = threading.Thread(target=run_manus)
+            thread.daemon = True
+            thread.start()
 
         # 持续从队列获取数据并产生响应
         while True:
@@ -203,6 +267,17 @@ async def search(request: Request, params: Any = Body(None)):
                 # 等待队列中的数据，设置超时防止无限等待
                 data = await asyncio.wait_for(plan_queue.get(), timeout=60.0)
                 # logger.info(f"queue_data:{data}")
+                if isinstance(data, dict) and "stream" in data:
+                    # 流式文本附加到最新plan上推送，首个token即可到达客户端
+                    if merge_stream(streams, data["stream"]):
+                        stream_plan = dict(latest_plan) if latest_plan else {"title": "等待任务执行", "steps": []}
+                        stream_plan["status_text"] = stream_plan.get("status_text") or "正在执行中"
+                        stream_plan["streams"] = format_streams(streams)
+                        yield {"plan": stream_plan}
+                    continue
+
+                if isinstance(data, dict):
+                    drop_finished_streams(streams, data)
                 if isinstance(data, dict) and "result" in data and data['result']:
                     latest_plan = data
                     latest_plan["status_text"] = "执行完成"
@@ -213,6 +288,8 @@ async def search(request: Request, params: Any = Body(None)):
                 latest_plan = data
                 # 添加状态文本
                 latest_plan["status_text"] = "正在执行中"
+                if streams:
+                    latest_plan["streams"] = format_streams(streams)
                 # 发送完整的plan
                 yield {"plan": latest_plan}
 
@@ -12,33 +12,19 @@
 #    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
 #    License for the specific language governing permissions and limitations
 #    under the License.
-import httpx
-from openai import OpenAI
+from threading import Lock
+
+from openai import OpenAI, AsyncOpenAI
 
 from app.common.logger_util import logger
+from app.cosight.llm.async_chat_llm import AsyncChatLLM
 from app.cosight.llm.chat_llm import ChatLLM
+from app.cosight.llm.endpoint_pool import Endpoint
+from app.cosight.llm.http_pool import get_http_client, get_async_http_client
 from config.config import *
 
 
-def set_model(model_config: dict[str, Optional[str | int | float]]):
-    http_client_kwargs = {
-        "headers": {
-            'Content-Type': 'application/json',
-            'Authorization': model_config['api_key']
-        },
-        "verify": False,
-        "trust_env": False
-    }
-
-    if model_config['proxy']:
-        http_client_kwargs["proxy"] = model_config['proxy']
-
-    openai_llm = OpenAI(
-        base_url=model_config['base_url'],
-        api_key=model_config['api_key'],
-        http_client=httpx.Client(**http_client_kwargs)
-    )
-
+def _get_chat_llm_kwargs(model_config: dict[str, Optional[str | int | float]], openai_llm):
     chat_llm_kwargs = {
         "model": model_config['model'],
         "base_url": model_config['base_url'],
@@ -50,22 +36,108 @@ def set_model(model_config: dict[str, Optional[str | int | float]]):
         chat_llm_kwargs['max_tokens'] = model_config['max_tokens']
     if model_config.get('temperature') is not None:
         chat_llm_kwargs['temperature'] = model_config['temperature']
+    chat_llm_kwargs['stream'] = is_llm_stream_enabled()
+    return chat_llm_kwargs
+
+
+def _create_openai_client(base_url: str, api_key: str, proxy: Optional[str] = None) -> OpenAI:
+    return OpenAI(
+        base_url=base_url,
+        api_key=api_key,
+        # 限流与重试由 rate_limiter 按服务地址统一处理
+        max_retries=0,
+        # 模型服务沿用原有设置：不校验证书、不读取环境变量中的代理，代理只使用模型配置项
+        http_client=get_http_client(base_url, proxy, verify=False, trust_env=False)
+    )
+
+
+def _create_async_openai_client(base_url: str, api_key: str, proxy: Optional[str] = None) -> AsyncOpenAI:
+    return AsyncOpenAI(
+        base_url=base_url,
+        api_key=api_key,
+        # 限流与重试由 rate_limiter 按服务地址统一处理
+        max_retries=0,
+        http_client=get_async_http_client(base_url, proxy, verify=False, trust_env=False)
+    )
+
+
+def _get_fallback_endpoints(model_config: dict[str, Optional[str | int | float]], role: str,
+                            create_client=_create_openai_client) -> list[Endpoint]:
+    endpoints = []
+    for endpoint_config in get_fallback_endpoints(role):
+        base_url = endpoint_config["base_url"]
+        client = create_client(base_url, endpoint_config.get("api_key") or model_config['api_key'],
+                               endpoint_config.get("proxy") or model_config['proxy'])
+        endpoints.append(Endpoint(base_url, endpoint_config.get("model") or model_config['model'], client))
+    if endpoints:
+        logger.info(f"{role} model fallback endpoints: {[endpoint.base_url for endpoint in endpoints]}")
+    return endpoints
+
+
+def set_model(model_config: dict[str, Optional[str | int | float]], role: Optional[str] = None):
+    openai_llm = _create_openai_client(model_config['base_url'], model_config['api_key'], model_config['proxy'])
+    fallback_endpoints = _get_fallback_endpoints(model_config, role) if role else None
+    return ChatLLM(role=role, fallback_endpoints=fallback_endpoints, **_get_chat_llm_kwargs(model_config, openai_llm))
+
+
+def set_async_model(model_config: dict[str, Optional[str | int | float]], role: Optional[str] = None):
+    openai_llm = _create_async_openai_client(model_config['base_url'], model_config['api_key'], model_config['proxy'])
+    fallback_endpoints = _get_fallback_endpoints(model_config, role, _create_async_openai_client) if role else None
+    return AsyncChatLLM(role=role, fallback_endpoints=fallback_endpoints,
+                        **_get_chat_llm_kwargs(model_config, openai_llm))
+
+
+# 模型角色与其配置读取函数
+_MODEL_CONFIG_GETTERS = {
+    "plan": get_plan_model_config,
+    "act": get_act_model_config,
+    "tool": get_tool_model_config,
+    "vision": get_vision_model_config
+}
+# 兼容旧的模块属性（llm_for_plan 等）：首次访问时按角色创建
+_LEGACY_NAMES = {
+    "llm_for_plan": ("plan", False),
+    "llm_for_act": ("act", False),
+    "llm_for_tool": ("tool", False),
+    "llm_for_vision": ("vision", False),
+    # 异步执行模式（AsyncCoSight）使用的规划与执行模型
+    "async_llm_for_plan": ("plan", True),
+    "async_llm_for_act": ("act", True)
+}
+_clients: dict[tuple[str, bool], ChatLLM | AsyncChatLLM] = {}
+_clients_lock = Lock()
+
 
-    return ChatLLM(**chat_llm_kwargs)
+def get_llm(role: str, is_async: bool = False) -> ChatLLM | AsyncChatLLM:
+    """按模型角色（plan/act/tool/vision）获取客户端，首次使用时按当前配置创建"""
+    if role not in _MODEL_CONFIG_GETTERS:
+        raise ValueError(f"unknown model role: {role}")
+    key = (role, is_async)
+    client = _clients.get(key)
+    if client is not None:
+        return client
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            model_config = _MODEL_CONFIG_GETTERS[role]()
+            logger.info(f"{role}_model_config:{model_config}\n")
+            client = set_async_model(model_config, role) if is_async else set_model(model_config, role)
+            _clients[key] = client
+        return client
 
 
-plan_model_config = get_plan_model_config()
-logger.info(f"plan_model_config:{plan_model_config}\n")
-llm_for_plan = set_model(plan_model_config)
+def reload_llm_config() -> None:
+    """重新读取 .env 与环境变量，之后获取的模型客户端按新配置创建
 
-act_model_config = get_act_model_config()
-logger.info(f"act_model_config:{act_model_config}\n")
-llm_for_act = set_model(act_model_config)
+    已经取得客户端的调用方（执行中的计划）继续使用旧客户端，不受影响。
+    """
+    reload_env()
+    with _clients_lock:
+        _clients.clear()
+    logger.info("llm config reloaded, model clients will be recreated on next use")
 
-tool_model_config = get_tool_model_config()
-logger.info(f"tool_model_config:{tool_model_config}\n")
-llm_for_tool = set_model(tool_model_config)
 
-vision_model_config = get_vision_model_config()
-logger.info(f"vision_model_config:{vision_model_config}\n")
-llm_for_vision = set_model(vision_model_config)
+def __getattr__(name: str):
+    if name in _LEGACY_NAMES:
+        return get_llm(*_LEGACY_NAMES[name])
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
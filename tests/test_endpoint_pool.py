@@ -0,0 +1,146 @@
+# Copyright 2025 ZTE Corporation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import asyncio
+import time
+import uuid
+
+from app.cosight.llm.endpoint_pool import (CIRCUIT_CLOSED, CIRCUIT_HALF_OPEN, CIRCUIT_OPEN, CircuitBreaker,
+                                           Endpoint, EndpointPool)
+
+RESET_TIMEOUT = 0.05
+
+
+def _endpoint(name: str) -> Endpoint:
+    endpoint = Endpoint(f"http://{name}-{uuid.uuid4().hex[:8]}.test/v1", "mock", client=None)
+    endpoint.breaker = CircuitBreaker(endpoint.base_url, failure_threshold=1, reset_timeout=RESET_TIMEOUT)
+    return endpoint
+
+
+def _pool(*endpoints: Endpoint) -> EndpointPool:
+    pool = EndpointPool(list(endpoints))
+    # 主地址总是在对冲延迟内应答
+    pool.min_delay = pool.default_delay = 5
+    return pool
+
+
+def _answer(calls):
+    def func(endpoint, claim):
+        calls.append(endpoint)
+        claim.check(endpoint)
+        return endpoint.base_url
+    return func
+
+
+def test_available_does_not_take_the_probe():
+    breaker = CircuitBreaker("b", failure_threshold=1, reset_timeout=RESET_TIMEOUT)
+    breaker.record_failure()
+    time.sleep(RESET_TIMEOUT * 2)
+    assert breaker.available() and breaker.available()
+    assert breaker.state == CIRCUIT_OPEN
+    assert breaker.try_probe()
+    assert breaker.state == CIRCUIT_HALF_OPEN
+    assert not breaker.try_probe()
+
+
+def test_uncalled_fallback_is_not_stuck_half_open():
+    primary, fallback = _endpoint("primary"), _endpoint("fallback")
+    fallback.breaker.record_failure()
+    time.sleep(RESET_TIMEOUT * 2)
+
+    # 冷却结束后主地址直接应答，备用地址从未被调用
+    calls = []
+    assert _pool(primary, fallback).call(_answer(calls)) == primary.base_url
+    assert calls == [primary]
+    assert fallback.breaker.state == CIRCUIT_OPEN
+    assert fallback.breaker.available()
+
+    # 主地址失败后，备用地址仍能被探测并恢复
+    def primary_down(endpoint, claim):
+        if endpoint is primary:
+            raise ConnectionError("primary down")
+        return _answer(calls)(endpoint, claim)
+
+    assert _pool(primary, fallback).call(primary_down) == fallback.base_url
+    assert fallback.breaker.state == CIRCUIT_CLOSED
+
+
+def test_abandoned_probe_expires():
+    breaker = CircuitBreaker("b", failure_threshold=1, reset_timeout=RESET_TIMEOUT)
+    breaker.record_failure()
+    time.sleep(RESET_TIMEOUT * 2)
+    assert breaker.try_probe()
+    assert not breaker.available()
+    # 探测请求没有结果时，超过冷却时间后允许重新探测
+    time.sleep(RESET_TIMEOUT * 2)
+    assert breaker.available()
+    assert breaker.try_probe()
+
+
+def test_hedge_with_three_endpoints_waits_for_the_fastest():
+    primary, first, second = _endpoint("primary"), _endpoint("first"), _endpoint("second")
+    pool = _pool(primary, first, second)
+    pool.min_delay = pool.default_delay = 0.05
+    delays = {primary.base_url: 0.5, first.base_url: 0.2, second.base_url: 0.2}
+
+    def func(endpoint, claim):
+        time.sleep(delays[endpoint.base_url])
+        claim.check(endpoint)
+        return endpoint.base_url
+
+    # 对冲请求发出后仍有未使用的地址，此时不再对冲，只等待已发出的请求
+    assert pool.call(func) == first.base_url
+
+
+def test_async_hedge_cancels_the_losing_request():
+    primary, first, second = _endpoint("primary"), _endpoint("first"), _endpoint("second")
+    pool = _pool(primary, first, second)
+    pool.min_delay = pool.default_delay = 0.05
+    delays = {primary.base_url: 1.0, first.base_url: 0.1, second.base_url: 0.1}
+    cancelled = []
+
+    async def func(endpoint, claim):
+        try:
+            await asyncio.sleep(delays[endpoint.base_url])
+        except asyncio.CancelledError:
+            cancelled.append(endpoint)
+            raise
+        claim.check(endpoint)
+        return endpoint.base_url
+
+    async def run():
+        result = await pool.acall(func)
+        # 让被取消的任务执行到取消点
+        await asyncio.sleep(0)
+        return result
+
+    start = time.monotonic()
+    assert asyncio.run(run()) == first.base_url
+    assert time.monotonic() - start < 0.5
+    assert cancelled == [primary]
+    assert primary.breaker.state == CIRCUIT_CLOSED
+
+
+def test_async_call_fails_over():
+    primary, fallback = _endpoint("primary"), _endpoint("fallback")
+
+    async def func(endpoint, claim):
+        if endpoint is primary:
+            raise ConnectionError("primary down")
+        claim.check(endpoint)
+        return endpoint.base_url
+
+    assert asyncio.run(_pool(primary, fallback).acall(func)) == fallback.base_url
+    assert primary.breaker.state == CIRCUIT_OPEN
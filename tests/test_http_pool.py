@@ -0,0 +1,38 @@
+# Copyright 2025 ZTE Corporation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import uuid
+
+import pytest
+
+pytest.importorskip("httpx")
+pytest.importorskip("aiohttp")
+
+from app.cosight.llm.http_pool import get_http_client  # noqa: E402
+
+
+def test_default_client_keeps_httpx_defaults():
+    base_url = f"https://{uuid.uuid4().hex[:8]}.test/v1"
+    client = get_http_client(base_url)
+    # 工具客户端与 OpenAI 自建的客户端一致：读取环境变量中的代理
+    assert client.trust_env
+    assert get_http_client(base_url) is client
+
+
+def test_model_client_settings_do_not_leak_into_tool_clients():
+    base_url = f"https://{uuid.uuid4().hex[:8]}.test/v1"
+    model_client = get_http_client(base_url, verify=False, trust_env=False)
+    assert not model_client.trust_env
+    assert get_http_client(base_url) is not model_client
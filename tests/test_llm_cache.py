@@ -0,0 +1,103 @@
+# Copyright 2025 ZTE Corporation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import pytest
+
+from app.cosight.llm.llm_cache import (CACHE_READ_WRITE, CACHE_RECORD, CACHE_REPLAY, LLMCache, LLMCacheMiss,
+                                       RoleCache, make_request_key)
+
+
+def _request(work_space_path: str) -> dict:
+    return {
+        "model": "deepseek-chat",
+        "temperature": 0.0,
+        "messages": [
+            {"role": "system", "content": f"All files must be saved under {work_space_path}"},
+            {"role": "user", "content": f"Write the report to {work_space_path}/report.md"},
+        ],
+    }
+
+
+def test_workspace_timestamp_does_not_change_key():
+    # 与 __init__.py 中 work_space_%Y%m%d_%H%M%S_%f 的命名一致
+    first = _request("/opt/cosight/work_space/work_space_20250612_021806_123456")
+    second = _request("/opt/cosight/work_space/work_space_20250613_174502_987654")
+    assert make_request_key(first) == make_request_key(second)
+
+
+def test_different_prompts_keep_different_keys():
+    first = _request("/opt/cosight/work_space/work_space_20250612_021806_123456")
+    second = _request("/opt/cosight/work_space/work_space_20250612_021806_123456")
+    second["messages"][1]["content"] += " in Chinese"
+    assert make_request_key(first) != make_request_key(second)
+
+
+def test_timeout_and_stream_do_not_change_key():
+    request = _request("/tmp/work_space_20250612_021806_123456")
+    assert make_request_key(request) == make_request_key({**request, "timeout": 30, "stream": True})
+
+
+def test_read_write_mode_returns_a_fresh_copy_on_hit():
+    cache = RoleCache(LLMCache(), "act", CACHE_READ_WRITE)
+    key, cached = cache.lookup(_request("/tmp/ws"))
+    assert cached is None
+    cache.store(key, {"role": "assistant", "content": "hello"})
+
+    _, first = cache.lookup(_request("/tmp/ws"))
+    first["content"] = "changed"
+    _, second = cache.lookup(_request("/tmp/ws"))
+
+    assert second["content"] == "hello"
+    assert cache.cache.metrics()["hits"] == 2
+
+
+def test_replay_mode_raises_on_miss():
+    cache = RoleCache(LLMCache(), "plan", CACHE_REPLAY)
+    with pytest.raises(LLMCacheMiss):
+        cache.lookup(_request("/tmp/ws"))
+
+
+def test_record_mode_always_calls_model_and_overwrites():
+    shared = LLMCache()
+    recorder = RoleCache(shared, "act", CACHE_RECORD)
+    key, _ = recorder.lookup(_request("/tmp/ws"))
+    recorder.store(key, {"content": "old"})
+    key, cached = recorder.lookup(_request("/tmp/ws"))
+    assert cached is None
+    recorder.store(key, {"content": "new"})
+
+    _, replayed = RoleCache(shared, "act", CACHE_REPLAY).lookup(_request("/tmp/ws"))
+    assert replayed["content"] == "new"
+
+
+def test_empty_response_is_not_stored():
+    cache = RoleCache(LLMCache(), "act", CACHE_READ_WRITE)
+    key, _ = cache.lookup(_request("/tmp/ws"))
+    cache.store(key, {"role": "assistant", "content": ""})
+    assert cache.lookup(_request("/tmp/ws"))[1] is None
+
+
+def test_disk_store_survives_restart_and_evicts_oldest(tmp_path):
+    path = str(tmp_path / "llm_cache.sqlite")
+    cache = LLMCache(path, max_bytes=1000, memory_entries=1)
+    cache.set("a", "x" * 400)
+    cache.set("b", "y" * 400)
+    assert cache.get("a") == "x" * 400
+    cache.set("c", "z" * 400)
+
+    reopened = LLMCache(path, max_bytes=1000)
+    assert reopened.get("a") == "x" * 400
+    assert reopened.get("b") is None
+    assert reopened.get("c") == "z" * 400
@@ -0,0 +1,68 @@
+# Copyright 2025 ZTE Corporation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from app.cosight.task.plan_journal import PlanJournal
+from app.cosight.task.todolist import Plan
+
+
+def _journaled_plan(work_space_path):
+    journal = PlanJournal(work_space_path)
+    journal.append("task", question="q", output_format="md")
+    plan = Plan(work_space_path=work_space_path)
+    plan.attach_journal(journal)
+    plan.update(title="t", steps=["a", "b", "c"], dependencies={1: [0], 2: [1]})
+    return plan, journal
+
+
+def test_replay_rebuilds_task_and_step_states(tmp_path):
+    plan, journal = _journaled_plan(str(tmp_path))
+    plan.mark_step(0, step_status="completed", step_notes="done a")
+    plan.mark_step(1, step_status="in_progress")
+
+    state = journal.replay()
+
+    assert state["task"] == {"question": "q", "output_format": "md"}
+    assert state["plan"]["steps"] == ["a", "b", "c"]
+    assert state["plan"]["step_statuses"] == ["completed", "in_progress", "not_started"]
+    assert state["plan"]["step_notes"][0] == "done a"
+
+
+def test_resume_reruns_only_unfinished_steps(tmp_path):
+    plan, journal = _journaled_plan(str(tmp_path))
+    plan.mark_step(0, step_status="completed")
+    plan.mark_step(1, step_status="blocked", step_notes="failed")
+
+    resumed = Plan(work_space_path=str(tmp_path))
+    resumed.restore(journal.replay()["plan"])
+
+    assert resumed.reset_unfinished_steps() == [1]
+    assert resumed.get_step_status(0) == "completed"
+    assert resumed.get_ready_steps() == [1]
+
+
+def test_replay_skips_torn_and_mismatched_lines(tmp_path):
+    plan, journal = _journaled_plan(str(tmp_path))
+    plan.mark_step(0, step_status="completed")
+    journal.append("mark", step_index=1, step="other step", status="completed")
+    with open(journal.file_path, "a", encoding="utf-8") as f:
+        f.write('{"op": "mark", "step_index": 2, "st')
+
+    state = journal.replay()
+
+    assert state["plan"]["step_statuses"] == ["completed", "not_started", "not_started"]
+
+
+def test_replay_without_journal_returns_empty_state(tmp_path):
+    assert PlanJournal(str(tmp_path)).replay() == {"task": {}, "plan": None}
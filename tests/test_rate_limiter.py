@@ -0,0 +1,157 @@
+# Copyright 2025 ZTE Corporation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import time
+import uuid
+
+import pytest
+
+from app.cosight.llm.rate_limiter import EndpointGovernor, call_with_governor, mark_first_token, retry_after_seconds
+from app.cosight.task.deadline import Deadline, DeadlineExceeded
+
+
+class _Response:
+    def __init__(self, headers):
+        self.headers = headers
+
+
+class _RateLimited(Exception):
+    status_code = 429
+
+    def __init__(self, retry_after: str):
+        super().__init__("rate limited")
+        self.response = _Response({"retry-after": retry_after})
+
+
+def _governor() -> EndpointGovernor:
+    return EndpointGovernor("test", max_concurrency=4, latency_target=0.05)
+
+
+def test_long_generation_with_fast_first_token_is_not_congestion():
+    governor = _governor()
+    with governor.slot():
+        mark_first_token()
+        time.sleep(0.1)
+    assert governor.limit == 4
+
+
+def test_slow_first_token_decreases_limit():
+    governor = _governor()
+    with governor.slot():
+        time.sleep(0.1)
+        mark_first_token()
+    assert governor.limit < 4
+
+
+def test_server_error_decreases_limit():
+    governor = _governor()
+    error = Exception("bad gateway")
+    error.status_code = 500
+    with pytest.raises(Exception):
+        with governor.slot():
+            raise error
+    assert governor.limit < 4
+
+
+def test_acquire_does_not_wait_past_deadline():
+    governor = _governor()
+    with pytest.raises(_RateLimited):
+        with governor.slot():
+            raise _RateLimited("5")
+    start = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        governor.acquire(Deadline(0.5, "step"))
+    assert time.monotonic() - start < 0.2
+
+
+def test_retry_after_beyond_timeout_raises_deadline_exceeded():
+    calls = []
+
+    def func(timeout):
+        calls.append(timeout)
+        raise _RateLimited("5")
+
+    start = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        call_with_governor(f"http://{uuid.uuid4().hex[:8]}.test/v1", func, timeout=0.5)
+    assert len(calls) == 1
+    assert time.monotonic() - start < 0.2
+
+
+def test_overload_halves_limit_and_pauses_endpoint():
+    governor = _governor()
+    with pytest.raises(_RateLimited):
+        with governor.slot():
+            raise _RateLimited("0.2")
+
+    assert governor.limit == 2
+    assert governor.metrics()["blocked_for"] > 0
+    start = time.monotonic()
+    with governor.slot():
+        pass
+    assert time.monotonic() - start >= 0.1
+
+
+def test_decreases_within_cooldown_count_once():
+    governor = _governor()
+    for _ in range(2):
+        with pytest.raises(_RateLimited):
+            with governor.slot():
+                raise _RateLimited("0")
+
+    assert governor.limit == 2
+
+
+def test_success_increases_limit_additively_up_to_max():
+    governor = _governor()
+    with pytest.raises(_RateLimited):
+        with governor.slot():
+            raise _RateLimited("0")
+
+    with governor.slot():
+        pass
+    assert governor.limit == pytest.approx(2.5)
+    for _ in range(20):
+        with governor.slot():
+            pass
+    assert governor.limit == 4
+
+
+def test_in_flight_requests_are_capped_by_limit():
+    governor = EndpointGovernor("test", max_concurrency=1, latency_target=0)
+    with governor.slot():
+        with pytest.raises(DeadlineExceeded):
+            governor.acquire(Deadline(0.2, "step"))
+    assert governor.metrics()["in_flight"] == 0
+
+
+def test_overload_is_retried_after_retry_after():
+    calls = []
+
+    def func(timeout):
+        calls.append(timeout)
+        if len(calls) == 1:
+            raise _RateLimited("0")
+        return "ok"
+
+    assert call_with_governor(f"http://{uuid.uuid4().hex[:8]}.test/v1", func, timeout=5) == "ok"
+    assert len(calls) == 2
+
+
+def test_retry_after_header_forms():
+    assert retry_after_seconds({"retry-after-ms": "1500"}) == 1.5
+    assert retry_after_seconds({"retry-after": "3"}) == 3
+    assert retry_after_seconds({"retry-after": "soon"}) is None
+    assert retry_after_seconds(None) is None
@@ -0,0 +1,83 @@
+# Copyright 2025 ZTE Corporation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import time
+
+import pytest
+
+from app.cosight.task.task_manager import (PLAN_ARCHIVED, PLAN_CREATED, PLAN_FINISHED, PLAN_RUNNING,
+                                           PlanNotFoundError, TaskManager)
+from app.cosight.task.todolist import Plan
+
+
+@pytest.fixture(autouse=True)
+def clean_task_manager(monkeypatch, tmp_path):
+    monkeypatch.setenv("TASK_MANAGER_MAX_PLANS", "100")
+    monkeypatch.setenv("TASK_MANAGER_PLAN_TTL", "3600")
+    monkeypatch.setenv("TASK_MANAGER_SPILL_DIR", str(tmp_path / "archived"))
+    for plan_id in list(TaskManager.plans):
+        TaskManager.remove_plan(plan_id)
+    yield
+    for plan_id in list(TaskManager.plans):
+        TaskManager.remove_plan(plan_id)
+
+
+def _plan(tmp_path, title="t"):
+    return Plan(title, ["a"], work_space_path=str(tmp_path))
+
+
+def test_created_plan_that_never_starts_is_evicted_after_ttl(monkeypatch, tmp_path):
+    monkeypatch.setenv("TASK_MANAGER_PLAN_TTL", "0.05")
+    TaskManager.set_plan("idle", _plan(tmp_path))
+    time.sleep(0.1)
+
+    TaskManager.set_plan("other", _plan(tmp_path))
+
+    assert "idle" not in TaskManager.plans
+    assert TaskManager.get_state("idle") == PLAN_ARCHIVED
+    assert TaskManager.get_state("other") == PLAN_CREATED
+
+
+def test_running_plan_is_not_evicted_after_ttl(monkeypatch, tmp_path):
+    monkeypatch.setenv("TASK_MANAGER_PLAN_TTL", "0.05")
+    TaskManager.set_plan("busy", _plan(tmp_path))
+    TaskManager.mark_running("busy")
+    time.sleep(0.1)
+
+    TaskManager.set_plan("other", _plan(tmp_path))
+
+    assert TaskManager.get_state("busy") == PLAN_RUNNING
+
+
+def test_overflow_evicts_least_recently_used_finished_plan(monkeypatch, tmp_path):
+    monkeypatch.setenv("TASK_MANAGER_MAX_PLANS", "2")
+    TaskManager.set_plan("old", _plan(tmp_path, "old"))
+    TaskManager.mark_running("old")
+    TaskManager.mark_finished("old")
+    TaskManager.set_plan("busy", _plan(tmp_path))
+    TaskManager.mark_running("busy")
+
+    TaskManager.set_plan("new", _plan(tmp_path))
+
+    assert list(TaskManager.plans) == ["busy", "new"]
+    # 淘汰的计划可从磁盘重新加载，重新加载后视为已结束
+    monkeypatch.setenv("TASK_MANAGER_MAX_PLANS", "3")
+    assert TaskManager.get_plan("old").title == "old"
+    assert TaskManager.get_state("old") == PLAN_FINISHED
+
+
+def test_unknown_plan_raises(tmp_path):
+    with pytest.raises(PlanNotFoundError):
+        TaskManager.get_plan("missing")
@@ -0,0 +1,109 @@
+# Copyright 2025 ZTE Corporation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from app.cosight.task.todolist import Plan
+
+
+class _ListJournal:
+    def __init__(self):
+        self.records = []
+
+    def append(self, kind, **fields):
+        self.records.append((kind, fields))
+
+
+def test_frozen_step_cannot_overwrite_status_or_journal(tmp_path):
+    plan = Plan("t", ["a", "b"], work_space_path=str(tmp_path))
+    journal = _ListJournal()
+    plan.attach_journal(journal)
+    plan.mark_step(0, step_status="in_progress")
+
+    # 计划截止：调度器标记受阻后冻结仍在执行的步骤
+    assert plan.block_unfinished_steps("plan timeout") == [0, 1]
+    plan.freeze_steps([0])
+    journal_size = len(journal.records)
+
+    plan.mark_step(0, step_status="completed", step_notes="late result")
+
+    assert plan.get_step_status(0) == "blocked"
+    assert plan.to_dict()["step_notes"][0] == "plan timeout"
+    assert len(journal.records) == journal_size
+
+
+def test_frozen_step_is_still_blocked_by_scheduler(tmp_path):
+    plan = Plan("t", ["a"], work_space_path=str(tmp_path))
+    plan.mark_step(0, step_status="in_progress")
+    plan.freeze_steps([0])
+
+    plan.block_unfinished_steps("plan timeout")
+
+    assert plan.get_step_status(0) == "blocked"
+
+
+def test_restore_clears_frozen_steps(tmp_path):
+    plan = Plan("t", ["a"], work_space_path=str(tmp_path))
+    plan.freeze_steps([0])
+    plan.restore(plan.to_dict())
+
+    plan.mark_step(0, step_status="completed")
+
+    assert plan.get_step_status(0) == "completed"
+
+
+def test_ready_set_follows_dependency_completion(tmp_path):
+    # 0 -> 1, 0 -> 2, (1, 2) -> 3
+    plan = Plan("t", ["a", "b", "c", "d"], {1: [0], 2: [0], 3: [1, 2]}, work_space_path=str(tmp_path))
+    assert plan.get_ready_steps() == [0]
+
+    plan.mark_step(0, step_status="in_progress")
+    assert plan.get_ready_steps() == []
+
+    plan.mark_step(0, step_status="completed")
+    assert plan.get_ready_steps() == [1, 2]
+
+    plan.mark_step(1, step_status="completed")
+    assert plan.get_ready_steps() == [2]
+
+    # 受阻也是终态，同样解除后继步骤的依赖
+    plan.mark_step(2, step_status="blocked")
+    assert plan.get_ready_steps() == [3]
+
+
+def test_reopening_a_step_removes_its_dependents_from_ready_set(tmp_path):
+    plan = Plan("t", ["a", "b"], work_space_path=str(tmp_path))
+    plan.mark_step(0, step_status="completed")
+    assert plan.get_ready_steps() == [1]
+
+    plan.mark_step(0, step_status="not_started")
+
+    assert plan.get_ready_steps() == [0]
+
+
+def test_update_keeps_started_steps_and_rebuilds_ready_set(tmp_path):
+    plan = Plan("t", ["a", "b"], work_space_path=str(tmp_path))
+    plan.mark_step(0, step_status="completed")
+
+    plan.update(steps=["a", "b", "c"], dependencies={1: [0], 2: [0]})
+
+    assert plan.get_step_status(0) == "completed"
+    assert plan.get_ready_steps() == [1, 2]
+    assert plan.get_progress()["completed"] == 1
+
+
+def test_invalid_dependencies_are_ignored(tmp_path):
+    plan = Plan("t", ["a", "b"], {1: [1, 5], 7: [0]}, work_space_path=str(tmp_path))
+
+    assert plan.dependencies == {1: []}
+    assert plan.get_ready_steps() == [0, 1]
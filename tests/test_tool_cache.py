@@ -0,0 +1,139 @@
+# Copyright 2025 ZTE Corporation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import asyncio
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event
+from types import SimpleNamespace
+
+import pytest
+
+from app.cosight.task.deadline import Deadline, DeadlineExceeded
+from app.cosight.task.step_prefetcher import StepPrefetcher
+from app.cosight.tool.tool_cache import (TTLCache, get_plan_tool_cache, get_tool_result_ttl, make_tool_call_key,
+                                         release_plan_tool_cache)
+
+
+def _hung_leader(cache: TTLCache, key: str):
+    """在后台线程中发起一个迟迟不返回的计算，返回用于结束它的事件"""
+    release, started = Event(), Event()
+
+    def compute():
+        started.set()
+        release.wait(10)
+        return "leader"
+
+    executor = ThreadPoolExecutor(max_workers=1)
+    future = executor.submit(cache.get_or_compute, key, compute)
+    assert started.wait(2)
+    executor.shutdown(wait=False)
+    return release, future
+
+
+def test_concurrent_calls_share_one_computation():
+    cache = TTLCache()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.1)
+        return "value"
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(lambda _: cache.get_or_compute("k", compute), range(8)))
+    assert results == ["value"] * 8
+    assert len(calls) == 1
+
+
+def test_waiter_stops_at_its_deadline():
+    cache = TTLCache()
+    release, leader = _hung_leader(cache, "k")
+    try:
+        start = time.monotonic()
+        with pytest.raises(DeadlineExceeded):
+            cache.get_or_compute("k", lambda: "waiter", deadline=Deadline(0.1, "step"))
+        assert time.monotonic() - start < 1
+    finally:
+        release.set()
+    assert leader.result(2) == "leader"
+
+
+def test_async_waiter_stops_at_its_deadline():
+    cache = TTLCache()
+    release, _ = _hung_leader(cache, "k")
+
+    async def wait():
+        return await cache.aget_or_compute("k", lambda: asyncio.sleep(0, "waiter"), deadline=Deadline(0.1, "step"))
+
+    try:
+        with pytest.raises(DeadlineExceeded):
+            asyncio.run(wait())
+    finally:
+        release.set()
+
+
+def test_released_plan_cache_is_not_recreated():
+    plan_id = f"plan_{uuid.uuid4().hex[:8]}"
+    cache = get_plan_tool_cache(plan_id)
+    cache.get_or_compute("k", lambda: "value")
+    release_plan_tool_cache(plan_id)
+
+    # 计划结束后仍在执行的步骤得到不缓存的空实现
+    released = get_plan_tool_cache(plan_id)
+    assert released is not cache
+    released.get_or_compute("k", lambda: "value")
+    assert released.metrics()["entries"] == 0
+    assert get_plan_tool_cache(plan_id) is released
+
+
+def test_search_tools_use_the_plan_cache(monkeypatch):
+    monkeypatch.delenv("TOOL_RESULT_CACHE_TOOLS", raising=False)
+    for name in ("search_baidu", "tavily_search", "fetch_website_content"):
+        assert get_tool_result_ttl(name) is not None
+
+
+def test_prefetch_is_hit_by_the_dispatch_key():
+    plan_id = f"plan_{uuid.uuid4().hex[:8]}"
+    calls = []
+
+    def search_baidu(query):
+        calls.append(query)
+        return [{"title": query}]
+
+    prefetcher = StepPrefetcher(SimpleNamespace(version=0), plan_id)
+    prefetcher._warm("search_baidu", search_baidu, query="co-sight")
+    # actor 发起的相同调用（参数带空白）按调度层的 key 命中预取结果
+    key = make_tool_call_key("search_baidu", search_baidu, {"query": " co-sight "})
+    assert get_plan_tool_cache(plan_id).get_or_compute(key, lambda: search_baidu("co-sight")) == [{"title": "co-sight"}]
+    assert calls == ["co-sight"]
+    release_plan_tool_cache(plan_id)
+
+
+def test_prefetch_metrics_report_hit_rate():
+    plan_id = f"plan_{uuid.uuid4().hex[:8]}"
+
+    def search_baidu(query):
+        return [{"title": query}]
+
+    prefetcher = StepPrefetcher(SimpleNamespace(version=0), plan_id)
+    prefetcher._warm("search_baidu", search_baidu, query="used")
+    prefetcher._warm("search_baidu", search_baidu, query="unused")
+    key = make_tool_call_key("search_baidu", search_baidu, {"query": "used"})
+    get_plan_tool_cache(plan_id).get_or_compute(key, lambda: search_baidu("used"))
+    metrics = prefetcher.metrics()
+    assert (metrics["prefetched"], metrics["used"], metrics["hit_rate"]) == (2, 1, 0.5)
+    release_plan_tool_cache(plan_id)
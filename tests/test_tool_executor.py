@@ -0,0 +1,170 @@
+# Copyright 2025 ZTE Corporation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import time
+from threading import Event, enumerate as enumerate_threads
+
+import pytest
+
+from app.cosight.task.tool_executor import ToolCallTimeout, ToolExecutor
+from config.config import get_tool_executor_config
+
+
+@pytest.fixture
+def hang():
+    release = Event()
+    started = Event()
+
+    def fn():
+        started.set()
+        release.wait(10)
+        return "late"
+
+    fn.started = started
+    yield fn
+    release.set()
+
+
+def test_timed_out_call_does_not_block_next_submission(hang):
+    executor = ToolExecutor(lanes={"browser": 1, "default": 1}, timeouts={"browser": 0.1})
+    try:
+        hung = executor.submit("browser", hang)
+        with pytest.raises(ToolCallTimeout):
+            hung.result(timeout=2)
+        # 唯一的线程仍卡在上一个调用中，新提交的调用由补充的线程执行
+        assert executor.submit("browser", lambda: "next").result(timeout=2) == "next"
+        metrics = executor.metrics()["browser"]
+        assert metrics["timed_out"] == 1
+        assert metrics["active"] == 0
+    finally:
+        executor.shutdown()
+
+
+def test_abandoned_running_call_frees_its_lane(hang):
+    executor = ToolExecutor(lanes={"browser": 1, "default": 1}, timeouts={})
+    try:
+        hung = executor.submit("browser", hang)
+        assert hang.started.wait(2)
+        queued = executor.submit("browser", lambda: "queued")
+        # 步骤截止：执行中的调用被放弃，排队中的调用随之得到线程
+        executor.abandon(hung)
+        assert queued.result(timeout=2) == "queued"
+        assert executor.metrics()["browser"]["abandoned"] == 1
+    finally:
+        executor.shutdown()
+
+
+def test_abandoned_queued_call_is_cancelled(hang):
+    executor = ToolExecutor(lanes={"browser": 1, "default": 1}, timeouts={})
+    try:
+        executor.submit("browser", hang)
+        assert hang.started.wait(2)
+        queued = executor.submit("browser", lambda: "never")
+        executor.abandon(queued)
+        assert queued.cancelled()
+    finally:
+        executor.shutdown()
+
+
+def test_lanes_are_isolated(hang):
+    executor = ToolExecutor(lanes={"browser": 1, "default": 1}, timeouts={})
+    try:
+        executor.submit("browser", hang)
+        assert hang.started.wait(2)
+        start = time.monotonic()
+        assert executor.submit("default", lambda: "read").result(timeout=2) == "read"
+        assert time.monotonic() - start < 1
+    finally:
+        executor.shutdown()
+
+
+def test_lanes_have_no_timeout_unless_configured(monkeypatch):
+    monkeypatch.delenv("TOOL_LANE_TIMEOUTS", raising=False)
+    # 默认只受步骤截止时间约束，长时间的报告生成不会被类别时长上限打断
+    assert get_tool_executor_config()["timeouts"] == {}
+    monkeypatch.setenv("TOOL_LANE_TIMEOUTS", "browser:600")
+    assert get_tool_executor_config()["timeouts"] == {"browser": 600.0}
+
+
+def test_abandoned_thread_exits_after_its_call_returns():
+    release = Event()
+    started = Event()
+
+    def fn():
+        started.set()
+        release.wait(10)
+        return "late"
+
+    executor = ToolExecutor(lanes={"browser": 1, "default": 1}, timeouts={}, name="abandon-exit")
+    try:
+        hung = executor.submit("browser", fn)
+        assert started.wait(2)
+        executor.abandon(hung)
+        assert executor.submit("browser", lambda: "next").result(timeout=2) == "next"
+        release.set()
+        assert hung.result(timeout=2) == "late"
+        # 被放弃调用的线程在调用返回后退出，本类别只保留补充的一个工作线程
+        for _ in range(100):
+            lane_threads = [t for t in enumerate_threads() if t.name.startswith("abandon-exit-browser")]
+            if len(lane_threads) == 1:
+                break
+            time.sleep(0.02)
+        assert len(lane_threads) == 1
+        assert executor.metrics()["browser"]["abandoned_running"] == 0
+    finally:
+        release.set()
+        executor.shutdown()
+
+
+def test_abandon_is_idempotent_and_ignores_finished_calls(hang):
+    executor = ToolExecutor(lanes={"browser": 1, "default": 1}, timeouts={})
+    try:
+        done = executor.submit("browser", lambda: "done")
+        assert done.result(timeout=2) == "done"
+        executor.abandon(done)
+        assert executor.metrics()["browser"]["abandoned"] == 0
+
+        hung = executor.submit("browser", hang)
+        assert hang.started.wait(2)
+        executor.abandon(hung)
+        executor.abandon(hung)
+        metrics = executor.metrics()["browser"]
+        assert metrics["abandoned"] == 1
+        assert metrics["active"] == 0
+    finally:
+        executor.shutdown()
+
+
+def test_late_result_does_not_replace_lane_timeout():
+    release = Event()
+    returned = Event()
+
+    def fn():
+        release.wait(10)
+        returned.set()
+        return "late"
+
+    executor = ToolExecutor(lanes={"browser": 1, "default": 1}, timeouts={"browser": 0.1})
+    try:
+        hung = executor.submit("browser", fn)
+        with pytest.raises(ToolCallTimeout):
+            hung.result(timeout=2)
+        release.set()
+        assert returned.wait(2)
+        # 卡住的调用稍后返回，Future 仍以超时结束
+        assert isinstance(hung.exception(), ToolCallTimeout)
+    finally:
+        release.set()
+        executor.shutdown()
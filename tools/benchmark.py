@@ -0,0 +1,251 @@
+# Copyright 2025 ZTE Corporation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""端到端吞吐基准：在 mock_llm_server 上运行计划，度量我们自己代码的编排开销
+
+cosight 模式在进程内启动 mock 模型服务，按不同并发度运行 CoSight.execute：
+
+    python tools/benchmark.py cosight --plans 8 --concurrency 1,2,4 --latency lognormal:0.5,0.3 --steps 6
+
+server 模式对已启动的服务端 /deep-research/search 发起请求，服务端需预先指向 mock 模型服务
+（API_BASE_URL=http://127.0.0.1:8765/v1），可用 --start-mock 同时在本进程内启动：
+
+    python tools/benchmark.py server --url http://127.0.0.1:7788/api/nae-deep-research/v1 --start-mock
+
+报告每个并发度下的计划吞吐（plans/min）、计划耗时分位数、相对单并发的扩展效率；cosight 模式还根据工作区
+.cosight 下的 plan_timeline.json 与 usage.json 计算每个步骤的编排开销（步骤耗时减去其中模型调用耗时）。
+"""
+
+import argparse
+import json
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import mock_llm_server
+
+QUESTION = "Benchmark question: research the topic and write a short report."
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_mock_server(args: argparse.Namespace) -> str:
+    """在后台线程中启动 mock 模型服务，返回其 base_url"""
+    import uvicorn
+    port = args.mock_port or _free_port()
+    config = uvicorn.Config(app=mock_llm_server.create_app(args), host="127.0.0.1", port=port, log_level="warning")
+    server = uvicorn.Server(config)
+    threading.Thread(target=server.run, daemon=True, name="mock-llm-server").start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}/v1"
+
+
+def point_models_at(base_url: str) -> None:
+    """让所有模型角色使用 mock 服务；模型客户端在首次使用时按此配置创建"""
+    # config 导入时会用 .env 覆盖环境变量，先导入再覆盖
+    import config.config  # noqa: F401
+    os.environ.update({"API_BASE_URL": base_url, "API_KEY": "mock", "MODEL_NAME": "mock", "PROXY": ""})
+    for role in ("PLAN", "ACT", "TOOL", "VISION"):
+        for key in ("API_KEY", "API_BASE_URL", "MODEL_NAME", "FALLBACK_ENDPOINTS"):
+            os.environ.pop(f"{role}_{key}", None)
+    os.environ.pop("FALLBACK_ENDPOINTS", None)
+
+
+def _percentile(values: List[float], percentile: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * percentile / 100))]
+
+
+def _read_meta(work_space_path: str, file_name: str) -> Optional[Dict[str, Any]]:
+    file_path = os.path.join(work_space_path, ".cosight", file_name)
+    if not os.path.exists(file_path):
+        return None
+    with open(file_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def step_overheads(work_space_path: str) -> List[float]:
+    """每个步骤的耗时减去该步骤内模型调用的耗时"""
+    timeline = _read_meta(work_space_path, "plan_timeline.json") or {}
+    usage = _read_meta(work_space_path, "usage.json") or {}
+    by_step = usage.get("by_step", {})
+    overheads = []
+    for step_index, record in (timeline.get("steps") or {}).items():
+        if record.get("duration") is None:
+            continue
+        llm_latency = by_step.get(step_index, {}).get("latency", 0.0)
+        overheads.append(max(0.0, record["duration"] - llm_latency))
+    return overheads
+
+
+def run_cosight(args: argparse.Namespace, concurrency: int, root: str) -> Dict[str, Any]:
+    from CoSight import CoSight
+    from app.cosight.task.step_executor import get_shared_step_executor
+    from llm import get_llm
+
+    def run_one(index: int) -> Dict[str, Any]:
+        work_space_path = os.path.join(root, f"c{concurrency}", f"work_space_{index}")
+        os.makedirs(work_space_path, exist_ok=True)
+        start = time.monotonic()
+        ok = True
+        try:
+            CoSight(get_llm("plan"), get_llm("act"), get_llm("tool"), get_llm("vision"),
+                    work_space_path=work_space_path, step_executor=get_shared_step_executor()).execute(QUESTION)
+        except Exception as e:
+            print(f"plan {index} failed: {e}", file=sys.stderr)
+            ok = False
+        return {"latency": time.monotonic() - start, "ok": ok, "step_overheads": step_overheads(work_space_path),
+                "llm_calls": ((_read_meta(work_space_path, "usage.json") or {}).get("totals") or {}).get("calls", 0)}
+
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(run_one, range(args.plans)))
+    elapsed = time.monotonic() - start
+    overheads = [overhead for result in results for overhead in result["step_overheads"]]
+    return {
+        **_summarize(concurrency, elapsed, results),
+        "llm_calls_per_plan": sum(result["llm_calls"] for result in results) / max(1, len(results)),
+        "step_overhead_mean": sum(overheads) / len(overheads) if overheads else 0.0,
+        "step_overhead_p95": _percentile(overheads, 95),
+    }
+
+
+def run_server(args: argparse.Namespace, concurrency: int) -> Dict[str, Any]:
+    import asyncio
+    import aiohttp
+
+    async def run_one(session: aiohttp.ClientSession, semaphore: asyncio.Semaphore) -> Dict[str, Any]:
+        body = {"content": [{"type": "text", "value": QUESTION}], "sessionInfo": {}}
+        async with semaphore:
+            start = time.monotonic()
+            first_event = None
+            ok = False
+            try:
+                async with session.post(f"{args.url.rstrip('/')}/deep-research/search", json=body) as response:
+                    async for line in response.content:
+                        if not line.strip():
+                            continue
+                        first_event = first_event or time.monotonic() - start
+                        content = json.loads(line).get("content") or {}
+                        if isinstance(content, dict) and content.get("result"):
+                            ok = True
+                            break
+            except Exception as e:
+                print(f"search request failed: {e}", file=sys.stderr)
+            return {"latency": time.monotonic() - start, "ok": ok, "first_event": first_event or 0.0}
+
+    async def run_all() -> List[Dict[str, Any]]:
+        semaphore = asyncio.Semaphore(concurrency)
+        timeout = aiohttp.ClientTimeout(total=args.timeout)
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            return await asyncio.gather(*[run_one(session, semaphore) for _ in range(args.plans)])
+
+    start = time.monotonic()
+    results = asyncio.run(run_all())
+    elapsed = time.monotonic() - start
+    return {**_summarize(concurrency, elapsed, results),
+            "first_event_p50": _percentile([result["first_event"] for result in results], 50)}
+
+
+def _summarize(concurrency: int, elapsed: float, results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    latencies = [result["latency"] for result in results]
+    completed = sum(1 for result in results if result["ok"])
+    return {
+        "concurrency": concurrency,
+        "plans": len(results),
+        "failed": len(results) - completed,
+        "elapsed": elapsed,
+        "plans_per_minute": completed * 60 / elapsed if elapsed else 0.0,
+        "latency_p50": _percentile(latencies, 50),
+        "latency_p95": _percentile(latencies, 95),
+    }
+
+
+def print_report(reports: List[Dict[str, Any]]) -> None:
+    baseline = reports[0]["plans_per_minute"] / reports[0]["concurrency"] if reports else 0.0
+    columns = ["concurrency", "plans", "failed", "plans_per_minute", "latency_p50", "latency_p95",
+               "step_overhead_mean", "step_overhead_p95", "llm_calls_per_plan", "first_event_p50", "efficiency"]
+    columns = [column for column in columns if column == "efficiency" or any(column in report for report in reports)]
+    print("  ".join(f"{column:>18}" for column in columns))
+    for report in reports:
+        # 扩展效率：相对最低并发度的单位并发吞吐
+        report["efficiency"] = report["plans_per_minute"] / (baseline * report["concurrency"]) if baseline else 0.0
+        print("  ".join(f"{report.get(column, 0):>18.3f}" if isinstance(report.get(column, 0), float)
+                        else f"{report.get(column, 0):>18}" for column in columns))
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = mock_llm_server.build_parser()
+    parser.description = "End-to-end throughput benchmark against the mock model server"
+    parser.add_argument("mode", choices=["cosight", "server"])
+    parser.add_argument("--plans", type=int, default=8, help="plans to run at each concurrency level")
+    parser.add_argument("--concurrency", default="1,2,4", help="comma separated concurrency levels")
+    parser.add_argument("--url", default="http://127.0.0.1:7788/api/nae-deep-research/v1",
+                        help="server base url in server mode")
+    parser.add_argument("--start-mock", action="store_true", help="also start the mock model server in server mode")
+    parser.add_argument("--mock-port", type=int, default=0, help="mock server port, random by default")
+    parser.add_argument("--timeout", type=float, default=1800, help="per request timeout in server mode")
+    parser.add_argument("--work-dir", help="keep work spaces here instead of a temporary directory")
+    parser.add_argument("--output", help="write the report as JSON")
+    return parser
+
+
+def main():
+    args = build_parser().parse_args()
+    levels = [int(level) for level in args.concurrency.split(",") if level.strip()]
+
+    if args.mode == "cosight" or args.start_mock:
+        if args.mode == "server" and not args.mock_port:
+            args.mock_port = args.port
+        base_url = start_mock_server(args)
+        print(f"mock model server listening on {base_url}")
+        if args.mode == "cosight":
+            point_models_at(base_url)
+
+    root = args.work_dir or tempfile.mkdtemp(prefix="cosight_benchmark_")
+    reports = []
+    try:
+        for concurrency in levels:
+            report = run_cosight(args, concurrency, root) if args.mode == "cosight" else run_server(args, concurrency)
+            reports.append(report)
+            print(f"concurrency {concurrency}: {report['plans_per_minute']:.2f} plans/min")
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(root, ignore_errors=True)
+
+    print_report(reports)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"mode": args.mode, "latency": args.latency, "reports": reports}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+# Copyright 2025 ZTE Corporation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""离线的 OpenAI 兼容模型服务，用于在没有真实模型的情况下评估编排开销
+
+支持 /v1/chat/completions 的普通与流式（SSE）调用、工具调用，响应来源按优先级：
+1. --script：JSONL 剧本，每行 {"match": 正则, "tool": 可选的工具名, "message": {...}}，
+   正则匹配最后一条 user/tool 消息、且请求中提供了该工具时返回 message
+2. --replay-cache：LLM_CACHE_MODE=record 录制的 sqlite 缓存，按与 ChatLLM 相同的请求哈希回放
+3. 内置脚本：规划请求返回 create_plan（--steps 个步骤，每层 --fan-out 个并行步骤，依赖上一层），
+   执行请求先用 file_saver 在工作区写 --act-rounds - 1 次文件（覆盖工具分发开销且无外部依赖），再返回 mark_step，
+   无工具请求返回 --summary-chars 长度的总结
+
+时延：--latency 为首个 token 的时延分布（fixed:0.5 / uniform:0.2,1.5 / normal:1.0,0.3 / lognormal:1.0,0.5，
+lognormal 的第一个参数为中位数），--tokens-per-second 控制生成速度；--error-rate 按比例返回 429/500。
+
+    python tools/mock_llm_server.py --port 8765 --latency lognormal:1.0,0.4 --steps 5 --fan-out 3
+    API_BASE_URL=http://127.0.0.1:8765/v1 API_KEY=mock MODEL_NAME=mock python CoSight.py
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import re
+import sys
+import time
+import uuid
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+_STEP_INDEX_PATTERN = re.compile(r"(?:Current Step Index|当前步骤索引)\s*[:：]\s*(\d+)")
+
+
+class LatencyModel:
+    """时延分布：fixed:s / uniform:low,high / normal:mean,std / lognormal:median,sigma"""
+
+    def __init__(self, spec: str = "fixed:0"):
+        kind, _, params = spec.partition(":")
+        self.kind = kind.strip().lower()
+        self.params = [float(value) for value in params.split(",") if value.strip()]
+        if self.kind not in ("fixed", "uniform", "normal", "lognormal"):
+            raise ValueError(f"unknown latency distribution: {spec}")
+        self.spec = spec
+
+    def sample(self) -> float:
+        if self.kind == "fixed":
+            value = self.params[0] if self.params else 0.0
+        elif self.kind == "uniform":
+            value = random.uniform(self.params[0], self.params[1])
+        elif self.kind == "normal":
+            value = random.gauss(self.params[0], self.params[1])
+        else:
+            value = random.lognormvariate(math.log(max(self.params[0], 1e-6)), self.params[1])
+        return max(0.0, value)
+
+
+def _tool_names(request: Dict[str, Any]) -> List[str]:
+    return [tool.get("function", {}).get("name", "") for tool in request.get("tools") or []]
+
+
+def _last_content(request: Dict[str, Any]) -> str:
+    for message in reversed(request.get("messages") or []):
+        if message.get("role") in ("user", "tool") and isinstance(message.get("content"), str):
+            return message["content"]
+    return ""
+
+
+def _tool_call(name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
+    return {"id": f"call_{uuid.uuid4().hex[:12]}", "type": "function",
+            "function": {"name": name, "arguments": json.dumps(arguments, ensure_ascii=False)}}
+
+
+class Responder:
+    """按剧本、录制缓存或内置脚本生成 assistant message"""
+
+    def __init__(self, args: argparse.Namespace):
+        self.steps = args.steps
+        self.fan_out = max(1, args.fan_out)
+        self.act_rounds = max(1, args.act_rounds)
+        self.summary_chars = args.summary_chars
+        self.script = self._load_script(args.script) if args.script else []
+        self.replay = self._open_replay(args.replay_cache) if args.replay_cache else None
+
+    @staticmethod
+    def _load_script(path: str) -> List[Dict[str, Any]]:
+        entries = []
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    entry["pattern"] = re.compile(entry.get("match", ""), re.S)
+                    entries.append(entry)
+        return entries
+
+    @staticmethod
+    def _open_replay(path: str):
+        import sqlite3
+        return sqlite3.connect(path, check_same_thread=False)
+
+    def respond(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        tools = _tool_names(request)
+        content = _last_content(request)
+        for entry in self.script:
+            if (not entry.get("tool") or entry["tool"] in tools) and entry["pattern"].search(content):
+                return dict(entry["message"])
+        if self.replay is not None:
+            message = self._replayed(request)
+            if message is not None:
+                return message
+        return self._builtin(request, tools)
+
+    def _replayed(self, request: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        from app.cosight.llm.llm_cache import make_request_key
+        key = make_request_key({k: v for k, v in request.items() if k != "stream_options"})
+        row = self.replay.execute("SELECT value FROM llm_cache WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _builtin(self, request: Dict[str, Any], tools: List[str]) -> Dict[str, Any]:
+        messages = request.get("messages") or []
+        tool_rounds = sum(1 for message in messages if message.get("role") == "assistant" and message.get("tool_calls"))
+        if "create_plan" in tools:
+            if tool_rounds:
+                return {"role": "assistant", "content": "Plan created."}
+            steps = [f"Research topic {i}: collect and summarize findings" for i in range(self.steps)]
+            # 每 fan_out 个步骤为一层，依赖上一层的全部步骤
+            dependencies = {str(i): list(range((i // self.fan_out - 1) * self.fan_out, (i // self.fan_out) * self.fan_out))
+                            for i in range(self.fan_out, self.steps)}
+            return {"role": "assistant", "content": None,
+                    "tool_calls": [_tool_call("create_plan", {"title": "Mock plan", "steps": steps,
+                                                              "dependencies": dependencies})]}
+        if "mark_step" in tools:
+            match = None
+            for message in messages:
+                found = _STEP_INDEX_PATTERN.search(message.get("content") or "") \
+                    if isinstance(message.get("content"), str) else None
+                match = found or match
+            step_index = int(match.group(1)) if match else 0
+            if tool_rounds < self.act_rounds - 1 and "file_saver" in tools:
+                return {"role": "assistant", "content": None,
+                        "tool_calls": [_tool_call("file_saver", {
+                            "file_path": f"mock_step_{step_index}_{tool_rounds}.md",
+                            "content": f"# Step {step_index}\n\nNotes of round {tool_rounds + 1}.\n"})]}
+            if tool_rounds < self.act_rounds:
+                return {"role": "assistant", "content": None,
+                        "tool_calls": [_tool_call("mark_step", {"step_index": step_index, "step_status": "completed",
+                                                                "step_notes": f"Step {step_index} done by mock model."})]}
+            return {"role": "assistant", "content": f"Step {step_index} completed."}
+        text = "Mock summary. " * (self.summary_chars // 14 + 1)
+        return {"role": "assistant", "content": text[:self.summary_chars]}
+
+
+def _estimate_tokens(text: str) -> int:
+    return max(1, len(text or "") // 4)
+
+
+def _usage(request: Dict[str, Any], message: Dict[str, Any]) -> Dict[str, int]:
+    prompt = sum(_estimate_tokens(json.dumps(m, ensure_ascii=False)) for m in request.get("messages") or [])
+    completion = _estimate_tokens((message.get("content") or "") + json.dumps(message.get("tool_calls") or []))
+    return {"prompt_tokens": prompt, "completion_tokens": completion, "total_tokens": prompt + completion}
+
+
+def _chunks(message: Dict[str, Any], chunk_chars: int = 16) -> List[Dict[str, Any]]:
+    """把 message 拆成流式 delta：文本按固定长度切分，工具调用先给出 id/name，再分段给出 arguments"""
+    deltas = [{"role": "assistant", "content": ""}]
+    content = message.get("content") or ""
+    deltas.extend({"content": content[i:i + chunk_chars]} for i in range(0, len(content), chunk_chars))
+    for index, tool_call in enumerate(message.get("tool_calls") or []):
+        function = tool_call["function"]
+        deltas.append({"tool_calls": [{"index": index, "id": tool_call["id"], "type": "function",
+                                       "function": {"name": function["name"], "arguments": ""}}]})
+        arguments = function.get("arguments") or ""
+        deltas.extend({"tool_calls": [{"index": index, "function": {"arguments": arguments[i:i + chunk_chars]}}]}
+                      for i in range(0, len(arguments), chunk_chars))
+    return deltas
+
+
+def create_app(args: argparse.Namespace) -> FastAPI:
+    app = FastAPI()
+    responder = Responder(args)
+    latency = LatencyModel(args.latency)
+    stats = Counter()
+
+    def error_response() -> Optional[JSONResponse]:
+        if args.error_rate <= 0 or random.random() >= args.error_rate:
+            return None
+        stats["errors"] += 1
+        headers = {"retry-after": str(args.retry_after)} if args.error_status == 429 else {}
+        return JSONResponse(status_code=args.error_status, headers=headers,
+                            content={"error": {"message": "mock overload", "type": "mock_error"}})
+
+    @app.post("/v1/chat/completions")
+    @app.post("/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        stats["requests"] += 1
+        error = error_response()
+        if error is not None:
+            return error
+        message = responder.respond(body)
+        stats["tool_calls" if message.get("tool_calls") else "text"] += 1
+        usage = _usage(body, message)
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:16]}"
+        created = int(time.time())
+        model = body.get("model", "mock")
+        token_delay = 1.0 / args.tokens_per_second if args.tokens_per_second > 0 else 0.0
+        await asyncio.sleep(latency.sample())
+
+        if not body.get("stream"):
+            await asyncio.sleep(token_delay * usage["completion_tokens"])
+            finish_reason = "tool_calls" if message.get("tool_calls") else "stop"
+            return {"id": completion_id, "object": "chat.completion", "created": created, "model": model,
+                    "choices": [{"index": 0, "message": message, "finish_reason": finish_reason}], "usage": usage}
+
+        include_usage = (body.get("stream_options") or {}).get("include_usage", False)
+
+        async def events():
+            deltas = _chunks(message)
+            per_chunk_delay = token_delay * usage["completion_tokens"] / max(1, len(deltas))
+            for delta in deltas:
+                chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                         "choices": [{"index": 0, "delta": delta, "finish_reason": None}]}
+                yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+                if per_chunk_delay:
+                    await asyncio.sleep(per_chunk_delay)
+            finish_reason = "tool_calls" if message.get("tool_calls") else "stop"
+            chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                     "choices": [{"index": 0, "delta": {}, "finish_reason": finish_reason}]}
+            yield f"data: {json.dumps(chunk)}\n\n"
+            if include_usage:
+                chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                         "choices": [], "usage": usage}
+                yield f"data: {json.dumps(chunk)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.get("/v1/models")
+    async def models():
+        return {"object": "list", "data": [{"id": "mock", "object": "model", "owned_by": "mock"}]}
+
+    @app.get("/stats")
+    async def get_stats():
+        return dict(stats)
+
+    return app
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="OpenAI-compatible mock model server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", default="fixed:0.5", help="time to first token distribution")
+    parser.add_argument("--tokens-per-second", type=float, default=0, help="generation speed, 0 for instant")
+    parser.add_argument("--steps", type=int, default=4, help="steps in the built-in plan")
+    parser.add_argument("--fan-out", type=int, default=2, help="parallel steps per layer of the built-in plan")
+    parser.add_argument("--act-rounds", type=int, default=1, help="model rounds per step before mark_step")
+    parser.add_argument("--summary-chars", type=int, default=2000)
+    parser.add_argument("--script", help="JSONL script of {match, tool, message} entries")
+    parser.add_argument("--replay-cache", help="sqlite file recorded with LLM_CACHE_MODE=record")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=429)
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    return parser
+
+
+def main():
+    import uvicorn
+    args = build_parser().parse_args()
+    uvicorn.run(app=create_app(args), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()